@@ -0,0 +1,150 @@
+"""管理员告警的聚合与限流
+
+网络中断时一次运行可能在多个阶段连续失败，定时任务也可能每次都因同一原因失败。
+逐条发送告警会刷屏，并且占用与报告推送相同的发送额度。因此：
+
+- 告警按（任务/阶段, 错误类型）分组，每组在聚合窗口内只立即发送第一条
+- 窗口内的重复告警只计数，由定时的汇总告警统一发送（附次数、首次与最近时间、最近的错误摘要）
+- 告警发送有独立的令牌桶额度，额度用完时告警并入下一次汇总，不会挤占报告推送
+- 汇总发送失败时计数退回各分组，并入下一次汇总
+"""
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class AlertBudget:
+    """令牌桶：每小时最多发送 ``per_hour`` 条告警，可短时突发到桶容量"""
+
+    def __init__(self, per_hour: int, clock=time.monotonic):
+        self.capacity = float(per_hour)
+        self._tokens = float(per_hour)
+        self._rate = per_hour / 3600.0
+        self._clock = clock
+        self._updated = clock()
+
+    def take(self) -> bool:
+        """消耗一个令牌；额度不足时返回 False"""
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class _AlertGroup:
+    """同一（任务, 错误类型）的告警"""
+
+    __slots__ = ("task_name", "error_type", "sent_at", "suppressed", "first_time", "last_time", "last_message")
+
+    def __init__(self, task_name: str, error_type: str):
+        self.task_name = task_name
+        self.error_type = error_type
+        self.sent_at = None
+        """最近一次立即发送的时间（单调时钟）"""
+        self.suppressed = 0
+        """尚未汇总的重复告警数"""
+        self.first_time = None
+        self.last_time = None
+        self.last_message = ""
+
+
+class AlertDigest:
+    """一次汇总告警：文本与被汇总的各分组计数（发送失败时用于退回）"""
+
+    __slots__ = ("text", "groups")
+
+    def __init__(self, text: str, groups: list):
+        self.text = text
+        self.groups = groups
+        """[(key, suppressed, first_time, last_time, last_message)]"""
+
+
+class AlertAggregator:
+    """按（任务, 错误类型）聚合告警"""
+
+    def __init__(self, window: float, budget: AlertBudget, clock=time.monotonic):
+        """初始化
+
+        Args:
+            window: 聚合窗口（秒），同组告警在窗口内只立即发送一次
+            budget: 告警发送额度（立即告警与汇总共用）
+            clock: 单调时钟，便于测试
+        """
+        self.window = window
+        self.budget = budget
+        self._clock = clock
+        self._groups = {}
+
+    def record(self, task_name: str, error_type: str, message: str) -> bool:
+        """登记一条告警
+
+        Returns:
+            bool: 是否应立即发送；False 时告警已计入下一次汇总
+        """
+        now = self._clock()
+        key = (task_name, error_type)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _AlertGroup(task_name, error_type)
+        if (group.sent_at is None or now - group.sent_at >= self.window) and self.budget.take():
+            group.sent_at = now
+            return True
+        wall_time = datetime.now(timezone.utc)
+        if not group.suppressed:
+            group.first_time = wall_time
+        group.suppressed += 1
+        group.last_time = wall_time
+        group.last_message = message
+        return False
+
+    @property
+    def pending(self) -> int:
+        """尚未汇总的告警数"""
+        return sum(group.suppressed for group in self._groups.values())
+
+    def take_digest(self) -> Optional[AlertDigest]:
+        """取出汇总告警并清空计数；没有待汇总的告警或额度不足时返回 None（计数保留到下一次）
+
+        发送失败时应调用 ``restore`` 退回计数。
+        """
+        now = self._clock()
+        groups = [group for group in self._groups.values() if group.suppressed]
+        # 淘汰窗口外且没有待汇总告警的分组，分组数不随运行时间增长
+        for key in [key for key, group in self._groups.items()
+                    if not group.suppressed and (group.sent_at is None or now - group.sent_at >= self.window)]:
+            del self._groups[key]
+        if not groups or not self.budget.take():
+            return None
+
+        lines = [f"🚨 **插件告警汇总**（{len(groups)} 类，共 {sum(group.suppressed for group in groups)} 条重复告警）\n"]
+        taken = []
+        for group in sorted(groups, key=lambda group: group.suppressed, reverse=True):
+            lines.append(
+                f"- {group.task_name} / {group.error_type}: {group.suppressed} 次"
+                f"（{group.first_time:%m-%d %H:%M} ~ {group.last_time:%m-%d %H:%M} UTC）"
+            )
+            if group.last_message:
+                lines.append(f"  最近: {group.last_message[:200]}")
+            taken.append(((group.task_name, group.error_type), group.suppressed,
+                          group.first_time, group.last_time, group.last_message))
+            group.suppressed = 0
+        lines.append("\n请检查日志获取详细信息")
+        return AlertDigest("\n".join(lines), taken)
+
+    def restore(self, digest: AlertDigest):
+        """汇总发送失败：把计数退回各分组（与期间新登记的告警合并），并入下一次汇总"""
+        for key, suppressed, first_time, last_time, last_message in digest.groups:
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = _AlertGroup(*key)
+            if group.suppressed:
+                # 期间又有新的重复告警：保留较早的首次时间与最近的错误摘要
+                group.first_time = min(group.first_time, first_time)
+            else:
+                group.first_time = first_time
+                group.last_time = last_time
+                group.last_message = last_message
+            group.suppressed += suppressed
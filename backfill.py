@@ -0,0 +1,114 @@
+"""历史消息批量回填的任务状态
+
+新增频道或执行 ``/clearsummarytime`` 后，可以通过 ``/tgbackfill`` 在后台把频道的
+历史消息批量导入本地归档。任务状态（各频道游标与进度）保存在状态数据库中，
+插件重启后从游标处继续，不会重复导入已完成的部分。
+"""
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class ChannelProgress:
+    """单个频道的回填进度"""
+
+    __slots__ = ("channel", "cursor", "imported", "last_date", "done", "error")
+
+    def __init__(self, channel: str, cursor: int = 0, imported: int = 0,
+                 last_date: Optional[str] = None, done: bool = False, error: Optional[str] = None):
+        self.channel = channel
+        self.cursor = cursor
+        """已导入的最大消息ID，续传时从其后开始"""
+        self.imported = imported
+        self.last_date = last_date
+        """已导入的最新消息时间（ISO 字符串）"""
+        self.done = done
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class BackfillState:
+    """一次回填任务的可持久化状态"""
+
+    STATE_KEY: str = "backfill"
+    """状态数据库中保存任务状态的键"""
+
+    def __init__(self, channels: list, since: Optional[datetime] = None, origin: Optional[str] = None):
+        """创建回填任务
+
+        Args:
+            channels: 要回填的频道列表
+            since: 可选，只回填此时间之后的消息；None 表示全部历史
+            origin: 可选，发起命令的会话（完成时通知）
+        """
+        self.since = since
+        self.origin = origin
+        self.channels = {channel: ChannelProgress(channel) for channel in channels}
+        self.created_at = datetime.now(timezone.utc)
+        self._started = time.monotonic()
+        self._imported_at_start = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BackfillState":
+        """从状态数据库中的字典恢复任务"""
+        since = datetime.fromisoformat(data["since"]) if data.get("since") else None
+        state = cls([], since, data.get("origin"))
+        state.created_at = datetime.fromisoformat(data["created_at"])
+        state.channels = {
+            item["channel"]: ChannelProgress(**item) for item in data.get("channels", [])
+        }
+        state._imported_at_start = state.total_imported
+        return state
+
+    def to_dict(self) -> dict:
+        return {
+            "since": self.since.isoformat() if self.since else None,
+            "origin": self.origin,
+            "created_at": self.created_at.isoformat(),
+            "channels": [progress.to_dict() for progress in self.channels.values()],
+        }
+
+    @property
+    def pending(self) -> list:
+        """尚未完成的频道进度"""
+        return [progress for progress in self.channels.values() if not progress.done]
+
+    @property
+    def finished(self) -> bool:
+        return not self.pending
+
+    @property
+    def total_imported(self) -> int:
+        return sum(progress.imported for progress in self.channels.values())
+
+    @property
+    def rate(self) -> float:
+        """本次进程内的导入速度（条/秒）"""
+        elapsed = time.monotonic() - self._started
+        if elapsed <= 0:
+            return 0.0
+        return (self.total_imported - self._imported_at_start) / elapsed
+
+    def format(self, name_of=str) -> str:
+        """格式化为可读的进度文本
+
+        Args:
+            name_of: 频道标识 -> 显示名称的函数
+        """
+        done = len(self.channels) - len(self.pending)
+        lines = [
+            f"进度: {done}/{len(self.channels)} 个频道，共导入 {self.total_imported} 条消息"
+            f"（{self.rate:.1f} 条/秒）"
+        ]
+        for progress in self.channels.values():
+            if progress.error:
+                status = f"❌ {progress.error}"
+            elif progress.done:
+                status = "✅ 完成"
+            else:
+                status = "⏳ 进行中"
+            latest = f"，最新 {progress.last_date[:10]}" if progress.last_date else ""
+            lines.append(f"- {name_of(progress.channel)}: {progress.imported} 条{latest} {status}")
+        return "\n".join(lines)
@@ -0,0 +1,142 @@
+"""频道注册表
+
+将用户输入或配置中的各种频道写法（完整 URL、``t.me/xxx``、``@xxx``、频道名）
+归一化为同一个规范键，并预先计算频道名称、频道 URL 和消息链接前缀。
+查找、去重和链接生成都只需要一次字典访问。
+"""
+from typing import Iterable, Optional
+
+
+class ChannelEntry:
+    """单个已配置频道的预计算信息"""
+
+    __slots__ = ("source", "key", "name", "url", "link_prefix")
+
+    def __init__(self, source: str, key: str, name: str, url: str, link_prefix: str):
+        self.source = source
+        """配置中的原始写法（保存配置时原样写回）"""
+        self.key = key
+        """规范键（小写、去除 URL 前缀）"""
+        self.name = name
+        """频道名称（用于报告标题）"""
+        self.url = url
+        """频道完整 URL"""
+        self.link_prefix = link_prefix
+        """消息链接前缀，拼接消息ID即为消息链接"""
+
+    def message_link(self, message_id: int) -> str:
+        """生成消息链接
+
+        Args:
+            message_id: 消息ID
+
+        Returns:
+            str: 消息链接，例如 https://t.me/channel_name/12345
+        """
+        return f"{self.link_prefix}{message_id}"
+
+
+class ChannelRegistry:
+    """规范化的频道索引：规范键 -> ChannelEntry（保持配置顺序）"""
+
+    URL_PREFIXES: tuple = (
+        "https://t.me/s/", "http://t.me/s/",
+        "https://t.me/", "http://t.me/",
+        "https://telegram.me/", "http://telegram.me/",
+        "t.me/s/", "t.me/", "telegram.me/",
+    )
+    """归一化时依次尝试剥离的 URL 前缀"""
+
+    def __init__(self, channels: Iterable[str], url_prefix: str):
+        """初始化频道注册表
+
+        Args:
+            channels: 配置中的频道列表
+            url_prefix: 生成频道 URL 使用的前缀（如 https://t.me/）
+        """
+        self.url_prefix = url_prefix
+        self._entries: dict = {}
+        for channel in channels:
+            self.add(channel)
+
+    @classmethod
+    def normalize(cls, identifier: str) -> str:
+        """将频道标识符归一化为规范键
+
+        Args:
+            identifier: 频道标识符（URL、@用户名或频道名）
+
+        Returns:
+            str: 规范键；无法识别时返回空字符串
+
+        Examples:
+            >>> ChannelRegistry.normalize("https://t.me/Channel_Name/")
+            'channel_name'
+            >>> ChannelRegistry.normalize("@channel_name")
+            'channel_name'
+        """
+        key = identifier.strip()
+        lowered = key.lower()
+        for prefix in cls.URL_PREFIXES:
+            if lowered.startswith(prefix):
+                key = key[len(prefix):]
+                break
+        key = key.split("?", 1)[0].strip("/").lstrip("@")
+        return key.lower()
+
+    def _build_entry(self, source: str, key: str) -> ChannelEntry:
+        name = source.strip().rstrip("/").split("/")[-1].lstrip("@")
+        url = f"{self.url_prefix}{key}"
+        return ChannelEntry(source, key, name, url, f"{self.url_prefix}{name}/")
+
+    def lookup(self, identifier: str) -> Optional[ChannelEntry]:
+        """按任意写法查找已配置的频道
+
+        Args:
+            identifier: 频道标识符
+
+        Returns:
+            ChannelEntry | None: 匹配的频道，未配置时返回 None
+        """
+        return self._entries.get(self.normalize(identifier))
+
+    def add(self, source: str) -> Optional[ChannelEntry]:
+        """添加频道
+
+        Args:
+            source: 频道原始写法
+
+        Returns:
+            ChannelEntry | None: 新增的频道；已存在（任意写法）或无效时返回 None
+        """
+        key = self.normalize(source)
+        if not key or key in self._entries:
+            return None
+        entry = self._build_entry(source.strip(), key)
+        self._entries[key] = entry
+        return entry
+
+    def remove(self, identifier: str) -> Optional[ChannelEntry]:
+        """删除频道
+
+        Args:
+            identifier: 频道标识符（任意写法）
+
+        Returns:
+            ChannelEntry | None: 被删除的频道，未配置时返回 None
+        """
+        return self._entries.pop(self.normalize(identifier), None)
+
+    @property
+    def sources(self) -> list:
+        """按配置顺序返回所有频道的原始写法"""
+        return [entry.source for entry in self._entries.values()]
+
+    def __contains__(self, identifier: str) -> bool:
+        return self.normalize(identifier) in self._entries
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,244 @@
+"""归档消息的压缩冷存储
+
+长期运行、频道较多时，``archive.db`` 中的消息会无限增长。归档按时间分层：
+
+- 最近若干周的消息留在归档库中，享有 FTS5 全文索引
+- 更早的消息按（频道, ISO 周）打包，压缩后追加写入每个频道一个的段文件，
+  并在旁边的小型偏移索引中记录每个数据块的位置、条数与时间范围
+
+检索时只需按偏移读取并解压时间范围与检索条件重叠的数据块，无需解压整个文件。
+数据块优先使用 zstd 压缩（可选依赖 ``zstandard``），未安装时使用标准库 zlib；
+每个数据块在索引中记录自己的压缩方式，两种格式可以混合存在。
+"""
+import json
+import os
+import re
+import threading
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from .message_archive import SearchHit
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+
+SEGMENT_FILE = "messages.seg"
+INDEX_FILE = "index.json"
+
+_CHANNEL_DIR_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def week_key(date: datetime) -> str:
+    """消息所属的 ISO 周，例如 ``2026-W07``"""
+    year, week, _ = date.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def week_start(now: datetime, weeks_ago: int) -> datetime:
+    """``weeks_ago`` 周前那一周的周一 00:00（UTC）"""
+    monday = (now - timedelta(days=now.weekday() + 7 * weeks_ago)).astimezone(timezone.utc)
+    return monday.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _compress(data: bytes) -> tuple:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("冷存储中有 zstd 压缩的数据块，请安装 zstandard 后再读取")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class ColdStorage:
+    """按频道追加写入的压缩段文件
+
+    所有方法都是同步的，在异步代码中应通过 ``asyncio.to_thread`` 调用。
+    """
+
+    ROLL_BATCH: int = 5000
+    """从归档库迁出消息时每批读取的条数"""
+
+    def __init__(self, root: Path):
+        """初始化
+
+        Args:
+            root: 冷存储根目录，每个频道一个子目录
+        """
+        self.root = Path(root)
+        self._indexes = {}
+        self._lock = threading.RLock()
+
+    # ========== 索引 ==========
+
+    def _channel_dir(self, channel: str) -> Path:
+        name = _CHANNEL_DIR_RE.sub("_", channel).strip("_")[:64]
+        return self.root / f"{name}-{zlib.crc32(channel.encode('utf-8')):08x}"
+
+    def _index(self, channel: str) -> dict:
+        index = self._indexes.get(channel)
+        if index is None:
+            path = self._channel_dir(channel) / INDEX_FILE
+            if path.exists():
+                index = json.loads(path.read_text(encoding="utf-8"))
+            else:
+                index = {"channel": channel, "blocks": []}
+            self._indexes[channel] = index
+        return index
+
+    def _save_index(self, channel: str, index: dict):
+        path = self._channel_dir(channel) / INDEX_FILE
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(path)
+
+    def channels(self) -> list:
+        """有冷存储数据的频道"""
+        with self._lock:
+            if not self.root.exists():
+                return []
+            channels = []
+            for path in sorted(self.root.glob(f"*/{INDEX_FILE}")):
+                channels.append(json.loads(path.read_text(encoding="utf-8"))["channel"])
+            return channels
+
+    # ========== 读写 ==========
+
+    def append_week(self, channel: str, week: str, rows: list) -> int:
+        """追加一个数据块（同一周可以有多个数据块，读取时合并）
+
+        先写段文件并落盘，再原子替换索引；中途崩溃只会在段文件末尾留下未被索引的字节。
+
+        Args:
+            channel: 频道标识
+            week: ISO 周
+            rows: (message_id, date, text, link) 元组列表，date 为 UTC ISO 字符串
+
+        Returns:
+            int: 压缩后的字节数
+        """
+        payload = "\n".join(json.dumps(row, ensure_ascii=False) for row in rows).encode("utf-8")
+        codec, data = _compress(payload)
+        with self._lock:
+            index = self._index(channel)
+            directory = self._channel_dir(channel)
+            directory.mkdir(parents=True, exist_ok=True)
+            with open(directory / SEGMENT_FILE, "ab") as f:
+                offset = f.tell()
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            dates = [row[1] for row in rows]
+            index["blocks"].append({
+                "week": week, "offset": offset, "length": len(data), "count": len(rows),
+                "codec": codec, "first": min(dates), "last": max(dates),
+            })
+            self._save_index(channel, index)
+        return len(data)
+
+    def _read_blocks(self, channel: str, blocks: list) -> list:
+        rows = {}
+        with open(self._channel_dir(channel) / SEGMENT_FILE, "rb") as f:
+            for block in blocks:
+                f.seek(block["offset"])
+                payload = _decompress(block["codec"], f.read(block["length"]))
+                for line in payload.decode("utf-8").split("\n"):
+                    row = json.loads(line)
+                    # 同一消息重复迁出时以最后写入的为准
+                    rows[row[0]] = tuple(row)
+        return sorted(rows.values())
+
+    def disk_usage(self) -> int:
+        """段文件与索引占用的字节数"""
+        if not self.root.exists():
+            return 0
+        return sum(path.stat().st_size for path in self.root.glob("*/*") if path.is_file())
+
+    # ========== 迁移与检索 ==========
+
+    def roll(self, archive, cutoff: datetime) -> int:
+        """将归档库中早于 ``cutoff`` 的消息迁入冷存储，并从归档库删除
+
+        迁出后归档库只在空闲页足够多时才执行 VACUUM（见 ``MessageArchive.compact``）。
+
+        Args:
+            archive: MessageArchive
+            cutoff: 分层边界（一般为某周周一 00:00），早于此时间的消息迁出
+
+        Returns:
+            int: 迁出的消息条数
+        """
+        moved = 0
+        for channel in archive.message_channels_before(cutoff):
+            while True:
+                rows = archive.messages_before(channel, cutoff, self.ROLL_BATCH)
+                if not rows:
+                    break
+                by_week = {}
+                for doc_id, message_id, date, text, link in rows:
+                    week = week_key(datetime.fromisoformat(date))
+                    by_week.setdefault(week, []).append((message_id, date, text, link))
+                for week, week_rows in by_week.items():
+                    self.append_week(channel, week, week_rows)
+                archive.delete_documents([row[0] for row in rows])
+                moved += len(rows)
+        if moved:
+            archive.compact()
+        return moved
+
+    def search(self, keywords: list, channel: Optional[str] = None, since: Optional[datetime] = None,
+               until: Optional[datetime] = None, limit: int = 10) -> list:
+        """在冷存储中检索消息（子串匹配，全部关键词命中）
+
+        只解压时间范围与检索条件重叠的数据块，从最近的周开始，找到足够的结果即停止。
+
+        Returns:
+            list[SearchHit]: 按时间倒序的检索结果
+        """
+        keywords = [k.lower() for k in keywords if k]
+        if not keywords:
+            return []
+        since_iso = since.astimezone(timezone.utc).isoformat() if since else None
+        until_iso = until.astimezone(timezone.utc).isoformat() if until else None
+        with self._lock:
+            candidates = []
+            for name in ([channel] if channel else self.channels()):
+                for block in self._index(name)["blocks"]:
+                    if since_iso and block["last"] < since_iso:
+                        continue
+                    if until_iso and block["first"] >= until_iso:
+                        continue
+                    candidates.append((block["week"], name, block))
+            candidates.sort(key=lambda item: item[0], reverse=True)
+
+            hits = []
+            for _, name, block in candidates:
+                rows = sorted(self._read_blocks(name, [block]), key=lambda row: row[1], reverse=True)
+                for message_id, date, text, link in rows:
+                    if since_iso and date < since_iso or until_iso and date >= until_iso:
+                        continue
+                    lowered = text.lower()
+                    if all(keyword in lowered for keyword in keywords):
+                        hits.append(SearchHit("message", name, date, _snippet(text, lowered, keywords[0]), link, 0.0))
+                        if len(hits) >= limit:
+                            return hits
+            return hits
+
+
+def _snippet(text: str, lowered: str, keyword: str, context: int = 30) -> str:
+    """关键词前后的摘要片段，关键词以【】标出"""
+    start = lowered.find(keyword)
+    end = start + len(keyword)
+    prefix = "…" if start > context else ""
+    suffix = "…" if len(text) - end > context else ""
+    return (f"{prefix}{text[max(start - context, 0):start]}【{text[start:end]}】"
+            f"{text[end:end + context]}{suffix}")
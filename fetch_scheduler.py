@@ -0,0 +1,313 @@
+"""FloodWait 感知的抓取调度
+
+Telegram 对分页请求有频率限制，超限时返回 FloodWait 并要求等待一段时间。
+抓取阶段不再让单个频道的 FloodWait 阻塞或丢弃整个频道：
+
+- 触发 FloodWait 的频道被暂停（parked），到期前先抓取其他频道
+- 已抓取的消息按游标保留，恢复后从游标处继续，不会重复或遗漏
+- ``AdaptivePacer`` 根据观测到的 FloodWait 调整每页条数与请求间隔，
+  学习到的参数保存在状态数据库中，供下一次运行使用
+- ``FetchCache`` 在短时间内缓存各频道的抓取结果，反复调整提示词重新总结时不必重新抓取
+- 配置了多个账号时，``ShardPlanner`` 按频道把抓取分配给各账号并行执行；
+  某个账号触发 FloodWait 时，其频道转交给未受限的账号，空闲账号也会接手其他账号积压的频道
+"""
+import asyncio
+import heapq
+import itertools
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class ChannelFetch:
+    """单个频道在一次抓取中的累积状态（可跨多次 FloodWait 续传）"""
+
+    __slots__ = (
+        "channel", "start_time", "cursor", "processed",
+        "messages", "archive_rows", "filter_stats", "waited", "error", "failed_accounts", "delta", "fetched_time",
+    )
+
+    def __init__(self, channel: str, start_time, filter_stats):
+        self.channel = channel
+        self.start_time = start_time
+        self.fetched_time = datetime.now(timezone.utc)
+        """开始抓取时的 UTC 时间；此后发布的消息可能不在本次抓取结果中"""
+        self.cursor = 0
+        """已处理的最大消息ID，续传时从其后开始"""
+        self.processed = 0
+        self.messages = []
+        """通过过滤的消息（MessageRecord）；启用抽样时为 ReservoirSampler"""
+        self.archive_rows = []
+        """尚未写入归档的消息行（每页抓取后写入）"""
+        self.filter_stats = filter_stats
+        self.waited = 0
+        """本次抓取中该频道累计的 FloodWait 秒数"""
+        self.error = None
+        """抓取失败原因；非 None 时该频道数据不完整，不能标记为已总结"""
+        self.failed_accounts = set()
+        """抓取出错过的账号（例如未加入私有频道），不再分配给这些账号"""
+        self.delta = None
+        """与已总结消息相比的增量（ChannelDelta）；录制/回放时为 None，不做增量识别"""
+
+
+class CachedFetch:
+    """缓存的单个频道抓取结果（已完成过滤、抽样与排序）"""
+
+    __slots__ = ("messages", "filter_stats", "ranking", "sampling", "cursor", "delta", "fetched_time", "fetched_at")
+
+    def __init__(self, messages: list, filter_stats, ranking: Optional[tuple], sampling: Optional[tuple], cursor: int,
+                 fetched_time: datetime, delta=None):
+        self.messages = messages
+        self.filter_stats = filter_stats
+        self.ranking = ranking
+        """(保留数, 总数)，未做重要度筛选时为 None"""
+        self.sampling = sampling
+        """(样本数, 总数)，未抽样时为 None"""
+        self.cursor = cursor
+        self.delta = delta
+        """抓取时的消息增量（ChannelDelta），复用时其指纹随总结时间一并落盘"""
+        self.fetched_time = fetched_time
+        """开始抓取时的 UTC 时间；复用时以此作为总结时间，之后发布的消息留给下一次抓取"""
+        self.fetched_at = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        """距抓取的秒数"""
+        return time.monotonic() - self.fetched_at
+
+
+class FetchCache:
+    """按频道缓存抓取结果，超过有效期的条目在访问时淘汰"""
+
+    def __init__(self, ttl: int):
+        """初始化
+
+        Args:
+            ttl: 有效期（秒），0 表示禁用缓存
+        """
+        self.ttl = ttl
+        self._entries = {}
+
+    def get(self, channel: str) -> Optional[CachedFetch]:
+        entry = self._entries.get(channel)
+        if entry is not None and entry.age > self.ttl:
+            del self._entries[channel]
+            return None
+        return entry
+
+    def put(self, channel: str, entry: CachedFetch):
+        if self.ttl <= 0:
+            return
+        # 顺带淘汰过期条目，缓存大小不超过有效期内抓取过的频道数
+        for expired in [key for key, cached in self._entries.items() if cached.age > self.ttl]:
+            del self._entries[expired]
+        self._entries[channel] = entry
+
+    def discard(self, channel: str):
+        self._entries.pop(channel, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class AdaptivePacer:
+    """自适应分页参数：触发 FloodWait 时减小页大小、增大间隔，持续成功后逐步恢复"""
+
+    MIN_PAGE_SIZE: int = 50
+    MAX_PAGE_SIZE: int = 500
+    DEFAULT_PAGE_SIZE: int = 200
+    MAX_WAIT_TIME: float = 5.0
+    RECOVER_AFTER: int = 10
+    """连续成功多少页后放宽一次限速"""
+
+    STATE_KEY: str = "fetch_pacer"
+    """状态数据库中保存学习参数的键"""
+
+    def __init__(self, page_size: Optional[int] = None, wait_time: float = 0.0):
+        self.page_size = min(max(int(page_size or self.DEFAULT_PAGE_SIZE), self.MIN_PAGE_SIZE), self.MAX_PAGE_SIZE)
+        self.wait_time = min(max(float(wait_time), 0.0), self.MAX_WAIT_TIME)
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0
+        self._streak = 0
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "AdaptivePacer":
+        data = data or {}
+        return cls(data.get("page_size"), data.get("wait_time", 0.0))
+
+    def to_dict(self) -> dict:
+        return {"page_size": self.page_size, "wait_time": round(self.wait_time, 3)}
+
+    @classmethod
+    def state_key(cls, account: Optional[str] = None) -> str:
+        """账号对应的状态键（各账号的频率限制相互独立，分别学习）"""
+        return f"{cls.STATE_KEY}:{account}" if account else cls.STATE_KEY
+
+    def on_page(self):
+        """记录一页成功抓取"""
+        self._streak += 1
+        if self._streak >= self.RECOVER_AFTER:
+            self._streak = 0
+            self.page_size = min(self.page_size + 50, self.MAX_PAGE_SIZE)
+            self.wait_time = 0.0 if self.wait_time < 0.1 else self.wait_time * 0.8
+
+    def on_flood_wait(self, seconds: int):
+        """记录一次 FloodWait"""
+        self._streak = 0
+        self.flood_waits += 1
+        self.flood_wait_seconds += seconds
+        self.page_size = max(self.page_size // 2, self.MIN_PAGE_SIZE)
+        self.wait_time = min(max(self.wait_time * 2, 0.5), self.MAX_WAIT_TIME)
+
+
+class ParkingQueue:
+    """按恢复时间排序的频道队列（同一时间按加入顺序）"""
+
+    def __init__(self, items=()):
+        self._heap = []
+        self._counter = itertools.count()
+        for item in items:
+            self.push(item)
+
+    def push(self, item, resume_at: float = 0.0):
+        """加入队列
+
+        Args:
+            item: 频道抓取状态
+            resume_at: 可恢复抓取的 ``time.monotonic()`` 时间，0 表示立即
+        """
+        heapq.heappush(self._heap, (resume_at, next(self._counter), item))
+
+    def pop(self) -> tuple:
+        """取出最早可恢复的项
+
+        Returns:
+            tuple: (item, delay) delay 为距离可恢复还需等待的秒数（可能为 0）
+        """
+        resume_at, _, item = heapq.heappop(self._heap)
+        return item, max(resume_at - time.monotonic(), 0.0)
+
+    def peek(self) -> tuple:
+        """查看最早可恢复的项（不取出），返回值同 ``pop()``"""
+        resume_at, _, item = self._heap[0]
+        return item, max(resume_at - time.monotonic(), 0.0)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class ShardPlanner:
+    """多账号抓取调度：每个账号一个待抓取队列，各账号的抓取协程并发取任务
+
+    - 频道按名称哈希分配到固定的主账号，同一频道每次运行由同一账号抓取
+    - 账号触发 FloodWait 时，该频道转交给当前未受限、队列最短的账号；
+      所有账号都受限时，频道在原账号队列中暂停到 FloodWait 结束（与单账号行为一致）
+    - 队列已空、且未受限的账号从最长的队列中接手可立即抓取的频道
+    - 频道在某账号上出错时，改由尚未尝试过的账号重试
+    """
+
+    def __init__(self, accounts: list, fetches: list):
+        self.accounts = list(accounts)
+        self._queues = {account: ParkingQueue() for account in self.accounts}
+        self._flooded_until = dict.fromkeys(self.accounts, 0.0)
+        self._in_flight = 0
+        self._cond = asyncio.Condition()
+        for fetch in fetches:
+            self._queues[self.home_account(fetch.channel)].push(fetch)
+
+    def home_account(self, channel: str) -> str:
+        """频道的主账号（稳定哈希）"""
+        return self.accounts[zlib.crc32(channel.encode("utf-8")) % len(self.accounts)]
+
+    def is_flooded(self, account: str) -> bool:
+        return self._flooded_until[account] > time.monotonic()
+
+    async def take(self, account: str):
+        """取出该账号下一个要抓取的频道
+
+        Returns:
+            tuple | None: (fetch, delay) delay 为需要先等待的 FloodWait 秒数；所有频道都已完成时返回 None
+        """
+        async with self._cond:
+            while True:
+                if not self._in_flight and not any(self._queues.values()):
+                    return None
+                own = self._queues[account]
+                if own and own.peek()[1] == 0:
+                    return self._start(own.pop())
+                stolen = None if self.is_flooded(account) else self._steal(account)
+                if stolen is not None:
+                    return self._start((stolen, 0.0))
+                if own:
+                    return self._start(own.pop())
+                await self._cond.wait()
+
+    def _start(self, entry: tuple) -> tuple:
+        self._in_flight += 1
+        return entry
+
+    def _steal(self, account: str):
+        """从其他账号最长的队列中接手一个可立即抓取的频道"""
+        sources = sorted(
+            (source for source in self.accounts if source != account and self._queues[source]),
+            key=lambda source: len(self._queues[source]), reverse=True
+        )
+        for source in sources:
+            fetch, delay = self._queues[source].peek()
+            if delay == 0 and account not in fetch.failed_accounts:
+                return self._queues[source].pop()[0]
+        return None
+
+    def _least_loaded(self, candidates) -> Optional[str]:
+        candidates = list(candidates)
+        if not candidates:
+            return None
+        return min(candidates, key=lambda account: len(self._queues[account]))
+
+    async def park(self, account: str, fetch, seconds: int) -> Optional[str]:
+        """账号触发 FloodWait：将频道转交给其他账号或在原账号上暂停
+
+        Returns:
+            str | None: 接手的账号；没有可用账号（在原账号上暂停）时为 None
+        """
+        async with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            self._flooded_until[account] = max(self._flooded_until[account], now + seconds)
+            target = self._least_loaded(
+                other for other in self.accounts
+                if other != account and not self.is_flooded(other) and other not in fetch.failed_accounts
+            )
+            if target is None:
+                self._queues[account].push(fetch, now + seconds)
+            else:
+                self._queues[target].push(fetch)
+            self._cond.notify_all()
+            return target
+
+    async def retry(self, account: str, fetch) -> Optional[str]:
+        """频道在该账号上出错：改由尚未出错的账号重试（优先主账号）
+
+        Returns:
+            str | None: 重试的账号；所有账号都已出错时为 None，由调用方按失败处理
+        """
+        async with self._cond:
+            self._in_flight -= 1
+            fetch.failed_accounts.add(account)
+            candidates = [other for other in self.accounts if other not in fetch.failed_accounts]
+            home = self.home_account(fetch.channel)
+            target = home if home in candidates else self._least_loaded(candidates)
+            if target is None:
+                # 仍计为进行中，由调用方收尾后调用 done()
+                self._in_flight += 1
+            else:
+                self._queues[target].push(fetch)
+            self._cond.notify_all()
+            return target
+
+    async def done(self, fetch):
+        """频道抓取结束（完成或放弃）"""
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
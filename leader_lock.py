@@ -0,0 +1,237 @@
+"""跨实例主节点租约（Leader Lease）
+
+多个 AstrBot 实例共享同一数据目录时，通过锁文件 + 心跳选出唯一的主节点，
+保证每个定时总结时段只由一个实例执行。主节点失联（心跳超时）后，
+其他实例会在下一次心跳时接管租约。
+
+实现只依赖原子创建文件（O_CREAT | O_EXCL）与原子替换（os.replace），
+在本地磁盘和常见的共享文件系统（NFS v3+/SMB）上均可工作。
+"""
+import json
+import os
+import socket
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from astrbot.api import logger
+
+
+class LeaderLease:
+    """基于锁文件与心跳的主节点租约
+
+    租约文件内容（JSON）::
+
+        {
+            "owner": "host:pid:xxxx",   # 当前持有者实例ID
+            "heartbeat": 1700000000.0,  # 最近一次心跳时间戳
+            "expires": 1700000090.0,    # 租约过期时间戳
+            "slot": "2026-W07",         # 最近一次被认领的执行时段
+            "slot_status": "done"       # 时段状态：running / done
+        }
+
+    所有读改写操作都在一个短暂持有的互斥文件（``<lock>.mutex``）保护下进行，
+    互斥文件本身也带有过期时间，避免持有者崩溃后永久死锁。
+    """
+
+    MUTEX_STALE_SECONDS: float = 10.0
+    """互斥文件过期时间（秒）
+
+    读改写租约文件通常在毫秒级完成，超过此时间仍存在的互斥文件
+    视为持有者已崩溃留下的残留，可以安全删除。
+    """
+
+    MUTEX_RETRY_INTERVAL: float = 0.05
+    """获取互斥文件失败时的重试间隔（秒）"""
+
+    MUTEX_ACQUIRE_TIMEOUT: float = 2.0
+    """获取互斥文件的最长等待时间（秒）"""
+
+    def __init__(self, lock_file: Path, ttl: float, instance_id: Optional[str] = None):
+        """初始化租约
+
+        Args:
+            lock_file: 租约文件路径（需位于各实例共享的目录中）
+            ttl: 租约有效期（秒），持有者必须在此时间内续约
+            instance_id: 当前实例ID，默认由主机名、进程号和随机后缀组成
+        """
+        self.lock_file = Path(lock_file)
+        self.mutex_file = self.lock_file.with_name(self.lock_file.name + ".mutex")
+        self.ttl = float(ttl)
+        self.instance_id = instance_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.orphaned_slot: Optional[str] = None
+        """接管租约时发现的、前任主节点未完成的时段（由调用方决定是否补跑）"""
+
+    # ========== 内部工具 ==========
+
+    def _acquire_mutex(self) -> bool:
+        """获取租约文件的读改写互斥
+
+        Returns:
+            bool: 是否在超时时间内成功获取
+        """
+        deadline = time.monotonic() + self.MUTEX_ACQUIRE_TIMEOUT
+        while True:
+            try:
+                fd = os.open(str(self.mutex_file), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(self.instance_id)
+                return True
+            except FileExistsError:
+                try:
+                    age = time.time() - self.mutex_file.stat().st_mtime
+                    if age > self.MUTEX_STALE_SECONDS:
+                        logger.warning(f"检测到残留的租约互斥文件（{age:.1f}秒），已清理: {self.mutex_file}")
+                        self.mutex_file.unlink(missing_ok=True)
+                        continue
+                except FileNotFoundError:
+                    continue
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.MUTEX_RETRY_INTERVAL)
+
+    def _release_mutex(self):
+        """释放读改写互斥"""
+        try:
+            self.mutex_file.unlink(missing_ok=True)
+        except Exception as e:
+            logger.warning(f"释放租约互斥文件失败: {type(e).__name__}: {e}")
+
+    def _read(self) -> dict:
+        """读取租约文件，文件不存在或损坏时返回空字典"""
+        try:
+            with open(self.lock_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"租约文件读取失败，视为无主: {type(e).__name__}: {e}")
+            return {}
+
+    def _write(self, data: dict):
+        """原子写入租约文件（临时文件 + os.replace）"""
+        tmp_file = self.lock_file.with_name(f"{self.lock_file.name}.{self.instance_id.replace(':', '_')}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.lock_file)
+
+    # ========== 公共接口 ==========
+
+    def try_acquire(self) -> bool:
+        """获取或续约主节点租约（心跳）
+
+        - 租约无主或已过期：接管租约；若前任留下 running 状态的时段，记录到 ``orphaned_slot``
+        - 租约属于自己：续约
+        - 租约属于其他存活实例：保持从节点身份
+
+        Returns:
+            bool: 当前实例是否为主节点
+        """
+        if not self._acquire_mutex():
+            logger.warning("获取租约互斥超时，本次心跳保持原有身份")
+            return self.is_leader
+
+        try:
+            now = time.time()
+            data = self._read()
+            owner = data.get("owner")
+            expired = float(data.get("expires", 0)) <= now
+
+            if owner == self.instance_id or not owner or expired:
+                if owner and owner != self.instance_id:
+                    logger.info(f"主节点 {owner} 租约已过期，实例 {self.instance_id} 接管")
+                    if data.get("slot_status") == "running":
+                        self.orphaned_slot = data.get("slot")
+                elif not self.is_leader:
+                    logger.info(f"实例 {self.instance_id} 成为主节点")
+
+                data.update({
+                    "owner": self.instance_id,
+                    "heartbeat": now,
+                    "expires": now + self.ttl,
+                })
+                self._write(data)
+                self.is_leader = True
+            else:
+                if self.is_leader:
+                    logger.warning(f"主节点租约已被实例 {owner} 持有，当前实例降级为从节点")
+                self.is_leader = False
+            return self.is_leader
+        except Exception as e:
+            logger.error(f"租约心跳失败: {type(e).__name__}: {e}")
+            return self.is_leader
+        finally:
+            self._release_mutex()
+
+    def claim_slot(self, slot: str, resume: bool = False) -> bool:
+        """认领一个执行时段
+
+        只有主节点可以认领；同一时段只能被认领一次，
+        除非 ``resume=True`` 且该时段仍处于 running 状态（前任主节点中途失联）。
+
+        Args:
+            slot: 时段标识
+            resume: 是否为接管后的补跑
+
+        Returns:
+            bool: 是否认领成功（成功则应执行该时段的任务）
+        """
+        if not self.try_acquire():
+            return False
+        if not self._acquire_mutex():
+            return False
+
+        try:
+            data = self._read()
+            if data.get("owner") != self.instance_id:
+                return False
+            if data.get("slot") == slot and not (resume and data.get("slot_status") == "running"):
+                logger.info(f"时段 {slot} 已被执行过，跳过")
+                return False
+            data.update({"slot": slot, "slot_status": "running"})
+            self._write(data)
+            if self.orphaned_slot == slot:
+                self.orphaned_slot = None
+            return True
+        finally:
+            self._release_mutex()
+
+    def finish_slot(self, slot: str):
+        """标记时段执行完成
+
+        Args:
+            slot: 时段标识
+        """
+        if not self._acquire_mutex():
+            logger.warning(f"标记时段 {slot} 完成时获取租约互斥超时")
+            return
+        try:
+            data = self._read()
+            if data.get("owner") == self.instance_id and data.get("slot") == slot:
+                data["slot_status"] = "done"
+                self._write(data)
+        finally:
+            self._release_mutex()
+
+    def release(self):
+        """主动释放租约（插件卸载时调用），让其他实例可以立即接管"""
+        if not self.is_leader:
+            return
+        if not self._acquire_mutex():
+            return
+        try:
+            data = self._read()
+            if data.get("owner") == self.instance_id:
+                data["expires"] = 0
+                self._write(data)
+                logger.info(f"实例 {self.instance_id} 已释放主节点租约")
+        except Exception as e:
+            logger.warning(f"释放主节点租约失败: {type(e).__name__}: {e}")
+        finally:
+            self.is_leader = False
+            self._release_mutex()
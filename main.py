@@ -1,13 +1,17 @@
 """AstrBot Telegram频道消息总结插件"""
 import asyncio
+import contextlib
+import functools
+import importlib
 import json
 import os
+import re
+import shutil
 import stat
+import time
+import uuid
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from telethon import TelegramClient
-from telethon.errors import SessionPasswordNeededError
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 # AstrBot 插件 API
 from astrbot.api.event import filter, AstrMessageEvent
@@ -15,6 +19,46 @@ from astrbot.api.star import Context, Star, register, StarTools
 from astrbot.api import logger
 from astrbot.api import AstrBotConfig
 
+from .admin_alerts import AlertAggregator, AlertBudget
+from .backfill import BackfillState
+from .channel_registry import ChannelRegistry
+from .cold_storage import ColdStorage, week_start
+from .fetch_scheduler import AdaptivePacer, CachedFetch, ChannelFetch, FetchCache, ShardPlanner
+from .leader_lock import LeaderLease
+from .message_archive import MessageArchive
+from .message_delta import ChannelDelta
+from .message_filter import FilterStats, MessageFilterEngine, estimate_tokens
+from .message_record import MessageRecord, render_messages
+from .prompt_layout import CONTEXT_HEADER, TokenUsage, TokenUsageStats, build_system_prompt
+from .ranking import Engagement, select_top
+from . import replay
+from .replay import ReplaySession, RunRecorder
+from .sampling import ReservoirSampler
+from . import run_progress
+from .run_progress import RunProgress
+from . import run_state
+from .state_store import StateStore
+from .telegram_client import SessionPool
+from . import tracing
+from .tracing import Tracer
+
+
+@functools.lru_cache(maxsize=None)
+def _lazy_import(module_name: str):
+    """按需导入重量级依赖
+    
+    Telethon、APScheduler 等依赖只在首次使用时导入，
+    避免拖慢 AstrBot 启动时的插件加载。导入结果会被缓存。
+    
+    Args:
+        module_name: 模块名，例如 "telethon"
+    
+    Returns:
+        module: 已导入的模块
+    """
+    return importlib.import_module(module_name)
+
+
 @register("telegram_summary", "Sakura520222", "一个 Telegram 频道消息总结插件，每周自动生成指定频道的消息汇总报告，支持自动推送到QQ群组和用户。", "1.2.2", "https://github.com/Sakura520222/astrbot_plugin_telegram_summary")
 class TelegramSummaryPlugin(Star):
     """Telegram 频道消息总结插件
@@ -47,6 +91,32 @@ class TelegramSummaryPlugin(Star):
     每条 Telegram 消息文本超过此长度时将被截断。
     """
     
+    SEARCH_RESULT_LIMIT: int = 10
+    """/tgsearch 单次返回的最大结果数"""
+    
+    DEFAULT_COLD_STORAGE_HOT_WEEKS: int = 12
+    """归档库中保留最近多少周的消息，更早的消息迁入压缩冷存储"""
+    
+    TOPIC_DIGEST_NAME: str = "跨频道话题摘要"
+    """话题聚类模式下报告标题与归档使用的名称"""
+    
+    DEFAULT_TOPIC_SIMILARITY: float = 0.35
+    """话题聚类默认余弦相似度阈值"""
+    
+    DEFAULT_TOPIC_BATCH_CHARS: int = 12000
+    """话题聚类模式下单次 AI 调用的默认上下文字符预算"""
+    
+    PERIODIC_REPORT_LABELS: dict = {'monthly': "月报", 'quarterly': "季报"}
+    """报告类型与显示名称"""
+    
+    PERIODIC_REPORT_PROMPT: str = (
+        "以下是同一频道在{label}内的各期周报。请将它们合并为一份{kind_label}：\n"
+        "1. 合并重复或延续的事件，按主题归类，突出整个周期内的重要进展和趋势；\n"
+        "2. 沿用周报的排版格式（主标题\"一、xxx\"，层级符号 ●、○、-），禁止使用 Markdown；\n"
+        "3. 直接输出报告内容，不要添加前言或后语，不要编造周报中没有的内容。\n\n"
+    )
+    """月报/季报合并提示词（只包含周报文本，体积很小）"""
+    
     # 推送相关常量
     PUSH_DELAY_MIN: int = 1
     """推送延迟最小值（秒）
@@ -78,6 +148,83 @@ class TelegramSummaryPlugin(Star):
     可以在插件配置中修改此值。
     """
     
+    FLOOD_WAIT_BUDGET: int = 600
+    """单个频道在一次抓取中允许累计等待 FloodWait 的最长时间（秒）
+    
+    超过后该频道本次放弃，保留上次总结时间，下次运行时重新抓取，
+    不会在数据缺失的情况下被标记为已总结。
+    """
+    
+    DEFAULT_FETCH_CACHE_TTL: int = 600
+    """手动总结复用抓取结果的默认有效期（秒）
+    
+    管理员调整提示词后重新执行 /summary 时，有效期内的频道直接使用上次的抓取结果，
+    只需重新调用 AI；``--refresh`` 强制重新抓取。
+    """
+    
+    DEFAULT_EDIT_RECHECK_DAYS: int = 7
+    """默认复查最近多少天内已总结的消息是否被编辑或删除"""
+    
+    # 阶段超时相关常量（可通过 timeouts 配置覆盖）
+    DEFAULT_FETCH_CHANNEL_TIMEOUT: int = 600
+    """单个频道一次抓取尝试的默认超时（秒）
+    
+    超时的频道按抓取不完整处理：已抓取的部分照常归档，但保留上次总结时间，
+    不会长时间占用 Telegram 会话。
+    """
+    
+    DEFAULT_AI_CALL_TIMEOUT: int = 300
+    """单次 AI 调用的默认超时（秒）"""
+    
+    DEFAULT_PUSH_TARGET_TIMEOUT: int = 60
+    """推送到单个目标的默认超时（秒）"""
+    
+    CANCEL_WAIT_SECONDS: float = 10.0
+    """/summary cancel 等待被取消任务收尾（释放锁、保存进度）的最长时间（秒）"""
+    
+    # 历史回填相关常量
+    BACKFILL_BATCH_SIZE: int = 500
+    """历史回填每批写入归档的消息条数（每批提交后保存一次游标）"""
+    
+    BACKFILL_WAIT_TIME: float = 1.0
+    """历史回填时两次分页请求之间的等待时间（秒）
+    
+    takeout 会话的频率限制比普通会话宽松，但大量分页请求仍可能触发 FloodWait，
+    遇到 FloodWait 时会按要求等待后从游标处继续。
+    """
+    
+    SESSION_SLOT_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+    """额外账号的槽位名格式（用作 accounts/ 目录下的 session 文件名）"""
+    
+    DEFAULT_CATCH_UP_GRACE_HOURS: int = 48
+    """启动时补跑错过的定时任务的默认宽限期（小时）
+    
+    插件在 ``auto_summary_time`` 停机时，APScheduler 的 cron 会直接错过当周的任务。
+    启动时若距最近一次应执行时刻不超过宽限期、且该时刻之后没有成功的定时运行，
+    立即在后台补跑；超过宽限期则等待下一次定时任务。
+    """
+    
+    DEFAULT_ALERT_WINDOW_MINUTES: int = 30
+    """同类告警（任务 + 错误类型）的默认聚合窗口（分钟）
+    
+    窗口内同类告警只立即发送第一条，其余计数后由每个窗口一次的汇总告警发送。
+    """
+    
+    DEFAULT_ALERTS_PER_HOUR: int = 6
+    """管理员告警的默认发送额度（条/小时，立即告警与汇总共用，与报告推送互不影响）"""
+    
+    DEFAULT_CATCH_UP_CONCURRENCY: int = 2
+    """补跑时并行执行的任务数（待补跑的频道平均分配到各任务）"""
+    
+    # 多实例相关常量
+    DEFAULT_LEADER_LEASE_TTL: int = 90
+    """主节点租约默认有效期（秒）
+    
+    多个实例共享数据目录时，主节点需要在此时间内续约，
+    超时未续约视为失联，由其他实例接管定时任务。
+    心跳间隔为有效期的三分之一。
+    """
+    
     def __init__(self, context: Context, config: AstrBotConfig):
         """初始化插件
         
@@ -85,29 +232,99 @@ class TelegramSummaryPlugin(Star):
             context: AstrBot 上下文对象
             config: 插件配置对象
         """
+        construct_start = time.perf_counter()
         super().__init__(context)
         self.config = config
         
-        # 按职责拆分初始化流程
+        # 按职责拆分初始化流程（仅内存操作，I/O 推迟到 initialize）
         self._init_data_directory()
         self._init_file_paths()
         self._init_constants()
         self._load_configurations(config)
         self._init_concurrent_safety()
         self._init_runtime_state()
-        self._setup_scheduler()
+        
+        # 启动耗时只做记录：构造函数只做配置校验等纯内存操作，文件 I/O 放在异步初始化中经线程池执行
+        construct_ms = (time.perf_counter() - construct_start) * 1000
+        self.startup_timings = {'construct_ms': construct_ms}
+        logger.debug(f"插件构造耗时 {construct_ms:.1f}ms")
+    
+    async def initialize(self):
+        """异步初始化插件
+        
+        AstrBot 在实例化插件后自动调用。所有阻塞 I/O（数据目录、
+        session 文件权限、状态数据库）都在线程池中执行，完成后再启动调度器。
+        方法是幂等的，命令处理中也可以通过 ``_ensure_initialized`` 触发。
+        """
+        async with self._init_lock:
+            if self._initialized:
+                return
+            init_start = time.perf_counter()
+            
+            await asyncio.to_thread(self._init_storage)
+            # 以下步骤在事件循环上同步执行，单独计时，确认没有阻塞 I/O
+            loop_start = time.perf_counter()
+            self._setup_scheduler()
+            if self.backfill_state is not None and not self.backfill_state.finished:
+                logger.info(f"发现未完成的历史回填任务（{len(self.backfill_state.pending)} 个频道），后台继续执行")
+                self._start_backfill()
+            if self.catch_up_grace_hours:
+                # 在后台检查错过的定时任务，不延迟插件加载
+                self._catch_up_task = asyncio.create_task(self._catch_up_missed_runs())
+            
+            self._initialized = True
+            now = time.perf_counter()
+            init_ms = (now - init_start) * 1000
+            loop_blocked_ms = (now - loop_start) * 1000
+            self.startup_timings['initialize_ms'] = init_ms
+            self.startup_timings['loop_blocked_ms'] = loop_blocked_ms
+            logger.info(
+                f"插件初始化完成：构造 {self.startup_timings['construct_ms']:.1f}ms，"
+                f"异步初始化 {init_ms:.1f}ms（其中占用事件循环 {loop_blocked_ms:.1f}ms，不阻塞 AstrBot 启动）"
+            )
+    
+    async def _ensure_initialized(self):
+        """确保异步初始化已完成（兼容未调用 initialize 的框架版本）"""
+        if not self._initialized:
+            await self.initialize()
+    
+    def _init_storage(self):
+        """初始化存储（在线程池中执行的阻塞 I/O）
+        
+        创建数据目录、收紧 session 文件权限、打开状态数据库并迁移旧版文件，
+        最后加载各频道上次总结时间。
+        """
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        logger.info(f"数据目录已准备: {self.data_dir}")
+        
+        # 检查并设置 session 文件权限
+        self._ensure_session_file_security()
+        
+        # 打开状态数据库，并一次性迁移旧版 JSON/文本文件
+        self.state_store.open()
+        self.state_store.migrate_legacy_files(self.PROMPT_FILE, self.CONFIG_FILE, self.LAST_SUMMARY_FILE)
+        
+        self.last_summary_times = self.load_last_summary_times()
+        logger.info(f"已加载各频道上次总结时间: {self.last_summary_times}")
+        
+        # 打开全文检索归档库
+        if self.archive_enabled:
+            self.message_archive.open()
+            
+            # 恢复上次未完成的历史回填任务
+            saved_backfill = self.state_store.get_value(BackfillState.STATE_KEY)
+            if saved_backfill:
+                self.backfill_state = BackfillState.from_dict(saved_backfill)
     
     def _init_data_directory(self):
         """初始化数据目录
         
         使用 AstrBot 框架提供的 StarTools 获取标准的数据存储目录。
         这是框架推荐的数据持久化方式，能够确保插件在不同环境下
-        都能正确访问数据目录。
+        都能正确访问数据目录。目录的创建在异步初始化中完成。
         """
         # 使用 StarTools 获取数据目录（框架标准方式）
         self.data_dir = StarTools.get_data_dir("astrbot_plugin_telegram_summary")
-        self.data_dir.mkdir(parents=True, exist_ok=True)
-        logger.info(f"数据目录已准备: {self.data_dir}")
     
     def _init_file_paths(self):
         """初始化文件路径配置"""
@@ -115,15 +332,21 @@ class TelegramSummaryPlugin(Star):
         self.CONFIG_FILE = str(self.data_dir / "config.json")
         self.RESTART_FLAG_FILE = str(self.data_dir / ".restart_flag")
         self.LAST_SUMMARY_FILE = str(self.data_dir / "last_summary_time.json")
+        self.STATE_DB_FILE = str(self.data_dir / "state.db")
+        self.ARCHIVE_DB_FILE = str(self.data_dir / "archive.db")
+        self.COLD_STORAGE_DIR = self.data_dir / "cold"  # 按频道的压缩段文件（<频道>/messages.seg + index.json）
         self.USER_SESSION_FILE = str(self.data_dir / "user_session.session")
+        self.LEADER_LOCK_FILE = str(self.data_dir / "leader.lock")
+        self.BACKFILL_SESSION_FILE = str(self.data_dir / "backfill_session.session")
+        self.ACCOUNTS_DIR = self.data_dir / "accounts"  # 额外账号的 session 文件（<槽位名>.session）
+        self.FIXTURES_DIR = self.data_dir / "fixtures"
+        self.TRACE_FILE = self.data_dir / "traces.jsonl"
         
         logger.debug(f"配置文件路径: 提示词={self.PROMPT_FILE}, "
                     f"配置={self.CONFIG_FILE}, "
                     f"上次总结={self.LAST_SUMMARY_FILE}, "
+                    f"状态数据库={self.STATE_DB_FILE}, "
                     f"会话={self.USER_SESSION_FILE}")
-        
-        # 检查并设置 session 文件权限
-        self._ensure_session_file_security()
     
     def _ensure_session_file_security(self):
         """确保 session 文件的安全性
@@ -131,21 +354,37 @@ class TelegramSummaryPlugin(Star):
         检查 session 文件权限，确保只有文件所有者可以读写。
         在 Windows 上，chmod 的功能受限，但仍会尝试设置。
         """
-        session_file = Path(self.USER_SESSION_FILE)
-        
-        if session_file.exists():
+        for slot in self._session_slots():
+            session_file = self._session_file_for(slot)
             try:
                 # 尝试设置文件权限为 600 (仅所有者可读写)
                 # Windows: 设置为只读属性
                 # Unix/Linux: 设置为 rw-------
-                os.chmod(self.USER_SESSION_FILE, 0o600)
-                logger.debug(f"已设置 session 文件权限: {self.USER_SESSION_FILE}")
+                os.chmod(session_file, 0o600)
+                logger.debug(f"已设置 session 文件权限: {session_file}")
             except Exception as e:
                 logger.warning(
                     f"无法设置 session 文件权限: {type(e).__name__}: {e}\n"
                     "建议手动检查文件权限，确保只有所有者可以访问"
                 )
     
+    def _session_file_for(self, slot: str = SessionPool.DEFAULT_SLOT) -> str:
+        """账号槽位对应的 session 文件路径（默认槽位为原有的 user_session.session）"""
+        if slot == SessionPool.DEFAULT_SLOT:
+            return self.USER_SESSION_FILE
+        return str(self.ACCOUNTS_DIR / f"{slot}.session")
+    
+    def _session_slots(self) -> list:
+        """已登录（存在 session 文件）的账号槽位，默认槽位在前
+        
+        Returns:
+            list[str]: 槽位名列表
+        """
+        slots = [SessionPool.DEFAULT_SLOT] if os.path.exists(self.USER_SESSION_FILE) else []
+        if self.ACCOUNTS_DIR.is_dir():
+            slots.extend(sorted(path.stem for path in self.ACCOUNTS_DIR.glob("*.session")))
+        return slots
+    
     def _init_constants(self):
         """初始化常量配置"""
         self.DEFAULT_PROMPT = (
@@ -188,6 +427,7 @@ class TelegramSummaryPlugin(Star):
         
         # 频道配置（带验证）
         self.channels = self._validate_channels(config.get('channels', []))
+        self.channel_registry = ChannelRegistry(self.channels, self.TELEGRAM_URL_PREFIX)
         logger.info(f"已加载频道列表: {self.channels}")
         
         # 提示词配置
@@ -209,6 +449,15 @@ class TelegramSummaryPlugin(Star):
         if self.admin_id:
             logger.info(f"已配置管理员ID: {self.admin_id}")
         
+        # 管理员告警聚合与限流
+        alert_config = config.get('alerts', {}) or {}
+        self.alert_window_minutes = self._validate_positive_int(
+            alert_config.get('window_minutes'), self.DEFAULT_ALERT_WINDOW_MINUTES, 'alerts.window_minutes'
+        )
+        self.alerts_per_hour = self._validate_positive_int(
+            alert_config.get('max_per_hour'), self.DEFAULT_ALERTS_PER_HOUR, 'alerts.max_per_hour'
+        )
+        
         # 自动推送目标配置
         self.auto_push_groups = config.get('auto_push_groups', [])
         self.auto_push_users = config.get('auto_push_users', [])
@@ -221,6 +470,111 @@ class TelegramSummaryPlugin(Star):
         # 消息模板配置
         self.message_templates = config.get('message_templates', {})
         logger.info(f"已加载消息模板配置: {len(self.message_templates)} 项")
+        
+        # 消息过滤规则配置（JSON）
+        self.message_filter_engine = self._load_message_filters(config.get('message_filters'))
+        
+        # 月报/季报配置
+        periodic_config = config.get('periodic_reports', {}) or {}
+        self.monthly_report_enabled = bool(periodic_config.get('monthly', False))
+        self.quarterly_report_enabled = bool(periodic_config.get('quarterly', False))
+        
+        # 互动重要度排序配置（0 表示不限制）
+        ranking_config = config.get('ranking', {}) or {}
+        self.rank_max_messages = self._validate_non_negative_int(
+            ranking_config.get('max_messages_per_channel'), 'ranking.max_messages_per_channel'
+        )
+        self.rank_max_tokens = self._validate_non_negative_int(
+            ranking_config.get('max_tokens_per_channel'), 'ranking.max_tokens_per_channel'
+        )
+        if self.rank_max_messages or self.rank_max_tokens:
+            logger.info(f"已启用互动重要度筛选: 每频道最多 {self.rank_max_messages or '不限'} 条，"
+                       f"{self.rank_max_tokens or '不限'} tokens")
+        
+        # 高频频道抽样配置（0 表示不抽样）
+        sampling_config = config.get('sampling', {}) or {}
+        self.sample_max_messages = self._validate_non_negative_int(
+            sampling_config.get('max_messages_per_channel'), 'sampling.max_messages_per_channel'
+        )
+        self.sample_stratify_by_day = bool(sampling_config.get('stratify_by_day', False))
+        if self.sample_max_messages:
+            logger.info(f"已启用高频频道抽样: 每频道最多保留 {self.sample_max_messages} 条消息"
+                       f"{'（按天分层）' if self.sample_stratify_by_day else ''}")
+        
+        # 跨频道话题聚类配置（可选依赖 numpy/scipy）
+        topic_config = config.get('topic_clustering', {}) or {}
+        self.topic_clustering_enabled = bool(topic_config.get('enabled', False))
+        try:
+            self.topic_similarity_threshold = float(topic_config.get('similarity_threshold', self.DEFAULT_TOPIC_SIMILARITY))
+            if not 0 < self.topic_similarity_threshold <= 1:
+                raise ValueError("必须在 (0, 1] 之间")
+        except (ValueError, TypeError) as e:
+            logger.warning(f"话题聚类相似度阈值无效，使用默认值: {self.DEFAULT_TOPIC_SIMILARITY}（{e}）")
+            self.topic_similarity_threshold = self.DEFAULT_TOPIC_SIMILARITY
+        self.topic_batch_chars = self._validate_positive_int(
+            topic_config.get('batch_chars'), self.DEFAULT_TOPIC_BATCH_CHARS, 'topic_clustering.batch_chars'
+        )
+        if self.topic_clustering_enabled:
+            logger.info(f"已启用跨频道话题聚类，相似度阈值: {self.topic_similarity_threshold}")
+        
+        # 消息归档配置
+        self.archive_enabled = bool(config.get('archive_enabled', True))
+        logger.info(f"消息与总结归档: {'已启用' if self.archive_enabled else '已禁用'}")
+        cold_config = config.get('cold_storage', {}) or {}
+        hot_weeks = cold_config.get('hot_weeks')
+        self.cold_storage_hot_weeks = (
+            self.DEFAULT_COLD_STORAGE_HOT_WEEKS if hot_weeks is None
+            else self._validate_non_negative_int(hot_weeks, 'cold_storage.hot_weeks')
+        )
+        
+        # 运行追踪配置
+        self.tracing_enabled = bool(config.get('tracing_enabled', True))
+        
+        # 手动总结的抓取结果缓存有效期（秒，0 表示禁用）
+        fetch_cache_ttl = config.get('fetch_cache_ttl')
+        self.fetch_cache_ttl = (
+            self.DEFAULT_FETCH_CACHE_TTL if fetch_cache_ttl is None
+            else self._validate_non_negative_int(fetch_cache_ttl, 'fetch_cache_ttl')
+        )
+        
+        # 编辑/删除复查窗口（天，0 表示只识别抓取窗口内的变化）
+        edit_recheck_days = config.get('edit_recheck_days')
+        self.edit_recheck_days = (
+            self.DEFAULT_EDIT_RECHECK_DAYS if edit_recheck_days is None
+            else self._validate_non_negative_int(edit_recheck_days, 'edit_recheck_days')
+        )
+        
+        # 阶段超时配置（秒）
+        timeout_config = config.get('timeouts', {}) or {}
+        self.fetch_channel_timeout = self._validate_positive_int(
+            timeout_config.get('fetch_channel'), self.DEFAULT_FETCH_CHANNEL_TIMEOUT, 'timeouts.fetch_channel'
+        )
+        self.ai_call_timeout = self._validate_positive_int(
+            timeout_config.get('ai_call'), self.DEFAULT_AI_CALL_TIMEOUT, 'timeouts.ai_call'
+        )
+        self.push_target_timeout = self._validate_positive_int(
+            timeout_config.get('push_target'), self.DEFAULT_PUSH_TARGET_TIMEOUT, 'timeouts.push_target'
+        )
+        
+        # 错过的定时任务补跑配置（宽限期 0 表示不补跑）
+        catch_up_config = config.get('catch_up', {}) or {}
+        grace_hours = catch_up_config.get('grace_hours')
+        self.catch_up_grace_hours = (
+            self.DEFAULT_CATCH_UP_GRACE_HOURS if grace_hours is None
+            else self._validate_non_negative_int(grace_hours, 'catch_up.grace_hours')
+        )
+        self.catch_up_concurrency = self._validate_positive_int(
+            catch_up_config.get('max_concurrency'), self.DEFAULT_CATCH_UP_CONCURRENCY, 'catch_up.max_concurrency'
+        )
+        
+        # 多实例高可用配置
+        ha_config = config.get('high_availability', {}) or {}
+        self.ha_enabled = bool(ha_config.get('enabled', False))
+        self.leader_lease_ttl = self._validate_positive_int(
+            ha_config.get('lease_ttl'), self.DEFAULT_LEADER_LEASE_TTL, 'high_availability.lease_ttl'
+        )
+        if self.ha_enabled:
+            logger.info(f"已启用多实例主节点选举，租约有效期: {self.leader_lease_ttl}秒")
     
     def _validate_api_id(self, api_id) -> int:
         """验证 Telegram API ID
@@ -321,6 +675,7 @@ class TelegramSummaryPlugin(Star):
             )
         
         validated_channels = []
+        seen_keys = set()
         for channel in channels:
             if not isinstance(channel, str):
                 logger.warning(f"跳过非字符串频道配置: {channel} (类型: {type(channel).__name__})")
@@ -335,6 +690,13 @@ class TelegramSummaryPlugin(Star):
             if channel.startswith('http'):
                 if not ('t.me/' in channel or 'telegram.me/' in channel):
                     logger.warning(f"频道URL格式可能不正确: {channel}")
+            
+            # 不同写法指向同一频道时只保留第一个
+            key = ChannelRegistry.normalize(channel)
+            if key in seen_keys:
+                logger.warning(f"跳过重复的频道配置: {channel}")
+                continue
+            seen_keys.add(key)
             validated_channels.append(channel)
         
         if not validated_channels:
@@ -391,6 +753,69 @@ class TelegramSummaryPlugin(Star):
             )
             return self.DEFAULT_AUTO_SUMMARY_TIME
     
+    def _load_message_filters(self, raw_rules) -> MessageFilterEngine:
+        """解析并编译消息过滤规则
+        
+        Args:
+            raw_rules: JSON 字符串或字典形式的过滤规则配置
+        
+        Returns:
+            MessageFilterEngine: 编译后的过滤引擎；配置无效时返回空规则引擎
+        """
+        try:
+            if isinstance(raw_rules, str):
+                raw_rules = json.loads(raw_rules) if raw_rules.strip() else {}
+            engine = MessageFilterEngine(raw_rules)
+            if not engine.is_empty:
+                logger.info("已加载消息过滤规则")
+            return engine
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.warning(f"消息过滤规则配置无效，已禁用过滤: {e}")
+            return MessageFilterEngine()
+    
+    def _validate_positive_int(self, value, default: int, name: str) -> int:
+        """验证正整数配置项
+        
+        Args:
+            value: 配置值
+            default: 配置缺失或无效时使用的默认值
+            name: 配置项名称（用于日志）
+        
+        Returns:
+            int: 验证后的正整数
+        """
+        if value is None or value == '':
+            return default
+        try:
+            value_int = int(value)
+            if value_int <= 0:
+                raise ValueError("必须为正整数")
+            return value_int
+        except (ValueError, TypeError) as e:
+            logger.warning(f"配置项 {name} 无效: {value}，使用默认值: {default}（{e}）")
+            return default
+    
+    def _validate_non_negative_int(self, value, name: str) -> int:
+        """验证非负整数配置项（0 表示不限制）
+        
+        Args:
+            value: 配置值
+            name: 配置项名称（用于日志）
+        
+        Returns:
+            int: 验证后的非负整数，无效时返回 0
+        """
+        if value is None or value == '':
+            return 0
+        try:
+            value_int = int(value)
+            if value_int < 0:
+                raise ValueError("不能为负数")
+            return value_int
+        except (ValueError, TypeError) as e:
+            logger.warning(f"配置项 {name} 无效: {value}，已禁用该限制（{e}）")
+            return 0
+    
     def _validate_push_targets(self):
         """验证推送目标配置
         
@@ -437,44 +862,222 @@ class TelegramSummaryPlugin(Star):
         添加多个锁以保护关键资源：
         - _setting_prompt_lock: 保护提示词设置流程
         - _login_states_lock: 保护登录状态
-        - _telegram_client_lock: 保护 Telegram Client 实例，防止 session 文件并发冲突
+        - _session_pool: 各账号 session 文件的读写锁与共享 Client，抓取共享、登录独占，防止 session 文件并发冲突
         """
         self._setting_prompt_lock = asyncio.Lock()
         self._login_states_lock = asyncio.Lock()
-        self._telegram_client_lock = asyncio.Lock()  # 新增：防止 Telegram Client 并发冲突
+        self._session_pool = SessionPool(self._create_fetch_client)
+        self._init_lock = asyncio.Lock()  # 保证异步初始化只执行一次
         logger.debug("并发安全锁已初始化")
     
     def _init_runtime_state(self):
         """初始化运行时状态"""
         self.setting_prompt_users = set()
         self.login_states = {}
-        self.last_summary_times = self.load_last_summary_times()
-        logger.info(f"已加载各频道上次总结时间: {self.last_summary_times}")
+        
+        # 状态数据库在异步初始化中打开（见 _init_storage）
+        self.state_store = StateStore(self.STATE_DB_FILE)
+        self.message_archive = MessageArchive(self.ARCHIVE_DB_FILE)
+        self.cold_storage = ColdStorage(self.COLD_STORAGE_DIR)
+        self.last_summary_times = {}
+        self.tracer = Tracer(self.TRACE_FILE if self.tracing_enabled else None)
+        self.token_usage = TokenUsageStats()  # 插件运行期间累计的 AI token 用量
+        self._system_prompts = {}  # 指令 -> 固定前缀
+        self.fetch_cache = FetchCache(self.fetch_cache_ttl)  # 手动总结复用的各频道抓取结果
+        self.backfill_state = None  # 当前或未完成的历史回填任务（BackfillState）
+        self.active_runs = {}  # 运行中任务的实时进度 {run_id: RunProgress}
+        self._run_states = {}  # 运行中任务的抓取结果状态 {run_id: RunState}
+        self._run_tasks = {}  # 运行中任务的 asyncio.Task {run_id: Task}，供 /summary cancel 取消
+        self.last_run_progress = None  # 最近一次结束的运行的进度
+        self.alerts = AlertAggregator(  # 管理员告警的聚合与独立发送额度
+            self.alert_window_minutes * 60, AlertBudget(self.alerts_per_hour)
+        )
+        self._backfill_task = None
+        self._catch_up_task = None
+        self._initialized = False
     
     def _setup_scheduler(self):
         """设置定时任务调度器"""
+        AsyncIOScheduler = _lazy_import('apscheduler.schedulers.asyncio').AsyncIOScheduler
         self.scheduler = AsyncIOScheduler()
         day_of_week, hour, minute = self.parse_summary_time(self.auto_summary_time)
         self.scheduler.add_job(self.main_job, 'cron', day_of_week=day_of_week, hour=hour, minute=minute)
         logger.info(f"定时任务已配置：{self.auto_summary_time}")
+        
+        # 月报/季报：在每月（季度）第一天、与周报相同的时刻执行
+        if self.monthly_report_enabled:
+            self.scheduler.add_job(self.periodic_report_job, 'cron', args=['monthly'], day=1, hour=hour, minute=minute)
+            logger.info(f"月报定时任务已配置：每月1日 {hour:02d}:{minute:02d}")
+        if self.quarterly_report_enabled:
+            self.scheduler.add_job(self.periodic_report_job, 'cron', args=['quarterly'], month='1,4,7,10', day=1, hour=hour, minute=minute)
+            logger.info(f"季报定时任务已配置：每季度首日 {hour:02d}:{minute:02d}")
+        
+        # 每个聚合窗口汇总一次被合并的重复告警
+        self.scheduler.add_job(
+            self._flush_alert_digest, 'interval', minutes=self.alert_window_minutes,
+            max_instances=1, coalesce=True
+        )
+        
+        # 多实例部署：通过租约文件选举主节点，只有主节点执行定时任务
+        self._leader_lease = None
+        if self.ha_enabled:
+            self._leader_lease = LeaderLease(self.LEADER_LOCK_FILE, self.leader_lease_ttl)
+            self.scheduler.add_job(
+                self._leader_heartbeat, 'interval',
+                seconds=max(1, self.leader_lease_ttl // 3),
+                next_run_time=datetime.now(),
+                max_instances=1, coalesce=True
+            )
+            logger.info(f"主节点心跳已配置，实例ID: {self._leader_lease.instance_id}")
+        
         self.scheduler.start()
         logger.info("调度器已启动")
     
+    async def _leader_heartbeat(self):
+        """主节点租约心跳
+        
+        定期续约或尝试接管租约。若接管时发现前任主节点有未完成的时段，
+        立即补跑该时段的定时任务。
+        """
+        await asyncio.to_thread(self._leader_lease.try_acquire)
+        
+        orphaned_slot = self._leader_lease.orphaned_slot
+        if orphaned_slot:
+            self._leader_lease.orphaned_slot = None
+            logger.warning(f"前任主节点未完成时段 {orphaned_slot}，当前实例开始补跑")
+            self.scheduler.add_job(self.main_job, kwargs={'resume_slot': orphaned_slot})
+    
+    def _current_job_slot(self, when: datetime = None) -> str:
+        """计算当前定时任务所属的执行时段标识
+        
+        定时任务每周执行一次，因此使用 ISO 周作为时段标识，
+        不受各实例触发时间的秒级偏差影响。
+        
+        Args:
+            when: 可选，计算指定时刻所属的时段，默认为当前时间
+        
+        Returns:
+            str: 时段标识，例如 "2026-W07"
+        """
+        iso_year, iso_week, _ = (when or datetime.now()).isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    
+    def _last_scheduled_time(self, now: datetime) -> datetime:
+        """不晚于 ``now`` 的最近一次定时任务应执行时刻（与调度器一致，使用本地时区）
+        
+        Args:
+            now: 带时区的当前本地时间
+        """
+        day_of_week, hour, minute = self.parse_summary_time(self.auto_summary_time)
+        weekday = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun').index(day_of_week)
+        scheduled = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        scheduled -= timedelta(days=(now.weekday() - weekday) % 7)
+        if scheduled > now:
+            scheduled -= timedelta(days=7)
+        return scheduled
+    
+    async def _catch_up_missed_runs(self):
+        """启动时补跑停机期间错过的定时任务
+        
+        比较最近一次应执行时刻、最近一次成功的定时运行与各频道的上次总结时间：
+        应执行时刻在宽限期内、之后没有成功（或被取消）的定时运行时，上次总结时间早于该时刻的频道
+        平均分配到至多 ``catch_up.max_concurrency`` 个任务并行补跑。连续错过多周时合并为一次补跑，
+        抓取窗口本就从各频道的上次总结时间开始。全新安装（没有任何运行记录和总结时间）不补跑。
+        """
+        try:
+            now = datetime.now().astimezone()
+            scheduled = self._last_scheduled_time(now)
+            grace = timedelta(hours=self.catch_up_grace_hours)
+            if now - scheduled > grace:
+                logger.debug(f"最近一次定时任务时刻 {scheduled:%Y-%m-%d %H:%M} 已超出补跑宽限期，等待下一次定时任务")
+                return
+            
+            last_done = await asyncio.to_thread(
+                self.state_store.last_run_started, ('scheduled', 'catch_up'), ('success', 'cancelled')
+            )
+            if last_done is not None and last_done >= scheduled:
+                return
+            if last_done is None and not self.last_summary_times:
+                if await asyncio.to_thread(self.state_store.last_run_started) is None:
+                    logger.debug("尚无任何运行记录，不补跑定时任务")
+                    return
+            if not self._session_slots():
+                logger.warning("检测到错过的定时任务，但没有已登录的账号，无法补跑")
+                return
+            
+            missed = 0
+            slot_time = scheduled
+            while now - slot_time <= grace and (last_done is None or slot_time > last_done):
+                missed += 1
+                slot_time -= timedelta(days=7)
+            lagging = [
+                channel for channel in self.channels
+                if (last_time := self.last_summary_times.get(channel)) is None or last_time < scheduled
+            ]
+            if not lagging:
+                logger.info(f"定时任务时刻 {scheduled:%Y-%m-%d %H:%M} 之后所有频道都已总结，无需补跑")
+                return
+            
+            slot = self._current_job_slot(scheduled)
+            if self._leader_lease is not None:
+                if not await asyncio.to_thread(self._leader_lease.claim_slot, slot):
+                    logger.info(f"当前实例未认领时段 {slot}（非主节点或已执行），不补跑")
+                    return
+            
+            # 话题聚类需要所有频道的消息合并成一份摘要，只能在一个任务中执行
+            workers = 1 if self._topic_clustering_active() else min(self.catch_up_concurrency, len(lagging))
+            groups = [lagging[i::workers] for i in range(workers)]
+            logger.warning(
+                f"检测到错过的定时任务（{scheduled:%Y-%m-%d %H:%M}"
+                f"{f'，连续 {missed} 次' if missed > 1 else ''}），"
+                f"开始补跑 {len(lagging)} 个频道，并行 {workers} 个任务"
+            )
+            try:
+                await asyncio.gather(*(
+                    self.main_job(resume_slot=slot, channels=group, kind='catch_up') for group in groups
+                ))
+            finally:
+                if self._leader_lease is not None:
+                    await asyncio.to_thread(self._leader_lease.finish_slot, slot)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"补跑错过的定时任务时出错: {type(e).__name__}: {e}", exc_info=True)
+    
     def _extract_channel_name(self, channel: str) -> str:
         """从频道标识符中提取频道名称
         
+        已配置的频道直接使用注册表中预计算的名称。
+        
         Args:
             channel: 频道标识符（可能是完整URL或频道名）
         
         Returns:
             str: 提取后的频道名称
         """
-        return channel.split('/')[-1]
+        entry = self.channel_registry.lookup(channel)
+        if entry:
+            return entry.name
+        return channel.rstrip('/').split('/')[-1]
+    
+    def _channel_link_prefix(self, channel: str) -> str:
+        """获取频道消息链接前缀
+        
+        Args:
+            channel: 频道标识符
+        
+        Returns:
+            str: 消息链接前缀，拼接消息ID即为消息链接
+        """
+        entry = self.channel_registry.lookup(channel)
+        if entry:
+            return entry.link_prefix
+        return f"{self.TELEGRAM_URL_PREFIX}{self._extract_channel_name(channel)}/"
     
     def _match_channel(self, user_input: str, config_channel: str) -> bool:
         """匹配用户输入的频道与配置中的频道
         
-        支持多种匹配方式：完全匹配、频道名匹配、URL转换匹配
+        两者归一化为同一规范键即视为匹配（忽略 URL 前缀、@ 符号、大小写和末尾斜杠）。
         
         Args:
             user_input: 用户输入的频道标识符
@@ -488,28 +1091,10 @@ class TelegramSummaryPlugin(Star):
             True
             >>> _match_channel("https://t.me/channel_name", "channel_name")
             True
-            >>> _match_channel("https://t.me/channel_name", "https://t.me/channel_name")
+            >>> _match_channel("@Channel_Name", "https://t.me/channel_name")
             True
         """
-        # 提取频道名称
-        config_channel_name = self._extract_channel_name(config_channel)
-        user_channel_name = self._extract_channel_name(user_input)
-        
-        # 构建配置频道的所有可能标识符（使用集合提高查找效率）
-        config_identifiers = {
-            config_channel,  # 原始配置（可能是URL或频道名）
-            config_channel_name  # 提取后的频道名
-        }
-        
-        # 如果配置是URL，添加URL格式
-        if not config_channel.startswith('http'):
-            config_identifiers.add(f"{self.TELEGRAM_URL_PREFIX}{config_channel}")
-        
-        # 检查用户输入的任何形式是否匹配配置的标识符
-        return (
-            user_input in config_identifiers or  # 直接匹配
-            user_channel_name in config_identifiers  # 提取后的频道名匹配
-        )
+        return ChannelRegistry.normalize(user_input) == ChannelRegistry.normalize(config_channel)
     
     def _init_login_state(self, sender_id: str) -> bool:
         """初始化用户登录状态
@@ -544,7 +1129,14 @@ class TelegramSummaryPlugin(Star):
                 logger.warning(f"断开Telegram客户端时出错: {type(e).__name__}: {e}")
         
         if sender_id in self.login_states:
-            del self.login_states[sender_id]
+            login_state = self.login_states.pop(sender_id)
+            # 未完成的登录新建的 session 文件没有授权，删除以免被当作已登录的账号
+            if login_state.get('new_session') and not login_state.get('completed'):
+                await asyncio.to_thread(self._remove_session_file, login_state['session_file'])
+                logger.info(f"登录未完成，已删除账号 {login_state['slot']} 未授权的 session 文件")
+            if login_state.get('session_locked'):
+                await self._session_pool.lock(login_state['slot']).release_exclusive()
+                logger.debug("登录流程结束，已释放 session 独占锁")
     
     async def _handle_phone_stage(self, event, user_input: str, login_state: dict, sender_id: str):
         """处理登录流程的手机号输入阶段
@@ -574,48 +1166,60 @@ class TelegramSummaryPlugin(Star):
         # 提示正在连接
         await event.send(event.plain_result("📡 正在连接到 Telegram 服务器并请求验证码..."))
         
-        # 使用锁防止与定时任务中的 Telegram Client 发生 session 文件冲突
-        async with self._telegram_client_lock:
-            try:
-                # 创建Telegram客户端（使用固定的session文件）
-                session_file = self.USER_SESSION_FILE
-                api_id = int(self.api_id)
-                
-                client = TelegramClient(session_file, api_id, self.api_hash)
-                await client.connect()
-                
-                logger.info(f"为用户 {sender_id} 创建Telegram客户端，会话文件: {session_file}")
-                
-                # 发送验证码
-                await client.send_code_request(phone)
-                
-                logger.info(f"验证码已发送到用户 {sender_id} 的手机/Telegram应用")
-                
-                # 更新登录状态
-                login_state['stage'] = 'code'
-                login_state['phone'] = phone
-                login_state['client'] = client
+        # 登录会改写 session 文件：获取独占锁，等待进行中的抓取结束，
+        # 并一直持有到登录流程结束（见 _cleanup_login_session）
+        session_lock = self._session_pool.lock(login_state['slot'])
+        if not login_state.get('session_locked'):
+            if session_lock.locked():
+                await event.send(event.plain_result("⏳ 正在等待进行中的消息抓取结束..."))
+            await session_lock.acquire_exclusive()
+            login_state['session_locked'] = True
+        
+        try:
+            # 创建Telegram客户端（使用账号槽位对应的session文件）
+            session_file = self._session_file_for(login_state['slot'])
+            await asyncio.to_thread(os.makedirs, os.path.dirname(session_file), exist_ok=True)
+            if 'new_session' not in login_state:
+                login_state['new_session'] = not os.path.exists(session_file)
                 login_state['session_file'] = session_file
-                
-                # 提示用户输入验证码
-                await event.send(event.plain_result(
-                    "📩 **验证码已发送**\n\n"
-                    "验证码已发送到您的 Telegram 应用或短信\n"
-                    "请输入您收到的验证码\n\n"
-                    "⏱️ 会话将在 120 秒后超时，或发送 `退出` 取消登录"
-                ))
-                
-                return True, False
-                
-            except Exception as e:
-                logger.error(f"发送验证码失败: {type(e).__name__}: {e}")
-                await event.send(event.plain_result(
-                    f"❌ **发送验证码失败**\n\n"
-                    f"错误：{e}\n\n"
-                    "请检查手机号和网络连接后重试"
-                ))
-                await self._cleanup_login_session(sender_id)
-                return False, True
+            api_id = int(self.api_id)
+            
+            TelegramClient = _lazy_import('telethon').TelegramClient
+            client = TelegramClient(session_file, api_id, self.api_hash)
+            await client.connect()
+            
+            logger.info(f"为用户 {sender_id} 创建Telegram客户端，会话文件: {session_file}")
+            
+            # 发送验证码
+            await client.send_code_request(phone)
+            
+            logger.info(f"验证码已发送到用户 {sender_id} 的手机/Telegram应用")
+            
+            # 更新登录状态
+            login_state['stage'] = 'code'
+            login_state['phone'] = phone
+            login_state['client'] = client
+            login_state['session_file'] = session_file
+            
+            # 提示用户输入验证码
+            await event.send(event.plain_result(
+                "📩 **验证码已发送**\n\n"
+                "验证码已发送到您的 Telegram 应用或短信\n"
+                "请输入您收到的验证码\n\n"
+                "⏱️ 会话将在 120 秒后超时，或发送 `退出` 取消登录"
+            ))
+            
+            return True, False
+            
+        except Exception as e:
+            logger.error(f"发送验证码失败: {type(e).__name__}: {e}")
+            await event.send(event.plain_result(
+                f"❌ **发送验证码失败**\n\n"
+                f"错误：{e}\n\n"
+                "请检查手机号和网络连接后重试"
+            ))
+            await self._cleanup_login_session(sender_id)
+            return False, True
     
     async def _handle_code_stage(self, event, user_input: str, login_state: dict, sender_id: str):
         """处理登录流程的验证码输入阶段
@@ -634,6 +1238,7 @@ class TelegramSummaryPlugin(Star):
         client = login_state['client']
         
         logger.info(f"用户 {sender_id} 输入验证码")
+        SessionPasswordNeededError = _lazy_import('telethon.errors').SessionPasswordNeededError
         
         try:
             # 尝试使用验证码登录
@@ -647,6 +1252,7 @@ class TelegramSummaryPlugin(Star):
                 "Session 已保存，后续将自动使用此账号"
             ))
             
+            login_state['completed'] = True
             # 保持连接一小段时间确保session正确保存
             await asyncio.sleep(2)
             await self._cleanup_login_session(sender_id)
@@ -713,6 +1319,7 @@ class TelegramSummaryPlugin(Star):
                 "Session 已保存，后续将自动使用此账号"
             ))
             
+            login_state['completed'] = True
             # 保持连接一小段时间确保session正确保存
             await asyncio.sleep(2)
             await self._cleanup_login_session(sender_id)
@@ -729,214 +1336,893 @@ class TelegramSummaryPlugin(Star):
             return False, True
     
     def load_prompt(self):
-        """从文件中读取提示词，如果文件不存在则使用默认提示词"""
-        logger.info(f"开始读取提示词文件: {self.PROMPT_FILE}")
+        """从状态数据库读取提示词，如果不存在则使用默认提示词"""
+        logger.info("开始读取已保存的提示词")
         try:
-            with open(self.PROMPT_FILE, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                logger.info(f"成功读取提示词文件，长度: {len(content)}字符")
-                return content
-        except FileNotFoundError:
-            logger.warning(f"提示词文件 {self.PROMPT_FILE} 不存在，将使用默认提示词并创建文件")
-            # 如果文件不存在，使用默认提示词并创建文件
-            self.save_prompt(self.DEFAULT_PROMPT)
-            return self.DEFAULT_PROMPT
+            content = self.state_store.get_value('prompt')
+            if content is None:
+                logger.warning("状态数据库中没有已保存的提示词，将使用默认提示词并保存")
+                self.save_prompt(self.DEFAULT_PROMPT)
+                return self.DEFAULT_PROMPT
+            logger.info(f"成功读取提示词，长度: {len(content)}字符")
+            return content
         except Exception as e:
-            logger.error(f"读取提示词文件 {self.PROMPT_FILE} 时出错: {type(e).__name__}: {e}")
+            logger.error(f"读取提示词时出错: {type(e).__name__}: {e}")
             # 如果读取失败，使用默认提示词
             return self.DEFAULT_PROMPT
     
     def save_prompt(self, prompt):
-        """将提示词保存到文件中"""
-        logger.info(f"开始保存提示词到文件: {self.PROMPT_FILE}")
+        """将提示词保存到状态数据库"""
+        logger.info("开始保存提示词")
         try:
-            with open(self.PROMPT_FILE, "w", encoding="utf-8") as f:
-                f.write(prompt)
-            logger.info(f"成功保存提示词到文件，长度: {len(prompt)}字符")
+            self.state_store.set_value('prompt', prompt)
+            logger.info(f"成功保存提示词，长度: {len(prompt)}字符")
         except Exception as e:
-            logger.error(f"保存提示词到文件 {self.PROMPT_FILE} 时出错: {type(e).__name__}: {e}")
+            logger.error(f"保存提示词时出错: {type(e).__name__}: {e}")
     
     def load_config(self):
-        """从配置文件读取AI配置"""
-        logger.info(f"开始读取配置文件: {self.CONFIG_FILE}")
+        """从状态数据库读取AI配置"""
+        logger.info("开始读取AI配置")
         try:
-            with open(self.CONFIG_FILE, "r", encoding="utf-8") as f:
-                config = json.load(f)
-                logger.info(f"成功读取配置文件，配置项数量: {len(config)}")
-                return config
-        except FileNotFoundError:
-            logger.warning(f"配置文件 {self.CONFIG_FILE} 不存在，返回空配置")
-            return {}
-        except json.JSONDecodeError as e:
-            logger.error(f"配置文件 {self.CONFIG_FILE} 格式错误: {e}")
-            return {}
+            config = self.state_store.get_value('config', {})
+            logger.info(f"成功读取AI配置，配置项数量: {len(config)}")
+            return config
         except Exception as e:
-            logger.error(f"读取配置文件 {self.CONFIG_FILE} 时出错: {type(e).__name__}: {e}")
+            logger.error(f"读取AI配置时出错: {type(e).__name__}: {e}")
             return {}
     
     def save_config(self, config):
-        """保存AI配置到文件"""
-        logger.info(f"开始保存配置到文件: {self.CONFIG_FILE}")
+        """保存AI配置到状态数据库"""
+        logger.info("开始保存AI配置")
         try:
-            with open(self.CONFIG_FILE, "w", encoding="utf-8") as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
-            logger.info(f"成功保存配置到文件，配置项数量: {len(config)}")
+            self.state_store.set_value('config', config)
+            logger.info(f"成功保存AI配置，配置项数量: {len(config)}")
         except Exception as e:
-            logger.error(f"保存配置到文件 {self.CONFIG_FILE} 时出错: {type(e).__name__}: {e}")
+            logger.error(f"保存AI配置时出错: {type(e).__name__}: {e}")
     
     def load_last_summary_times(self):
-        """从文件中读取各频道的上次总结时间，如果文件不存在则返回空字典"""
-        logger.info(f"开始读取各频道上次总结时间文件: {self.LAST_SUMMARY_FILE}")
+        """从状态数据库读取各频道的上次总结时间，读取失败时返回空字典"""
+        logger.info("开始读取各频道上次总结时间")
         try:
-            with open(self.LAST_SUMMARY_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                last_times = {}
-                for channel, time_str in data.items():
-                    if time_str:
-                        from datetime import datetime, timezone
-                        last_time = datetime.fromisoformat(time_str).replace(tzinfo=timezone.utc)
-                        last_times[channel] = last_time
-                logger.info(f"成功读取各频道上次总结时间，共 {len(last_times)} 个频道")
-                return last_times
-        except FileNotFoundError:
-            logger.warning(f"上次总结时间文件 {self.LAST_SUMMARY_FILE} 不存在，将使用默认值")
-            return {}
-        except json.JSONDecodeError as e:
-            logger.error(f"上次总结时间文件 {self.LAST_SUMMARY_FILE} 格式错误: {e}")
-            return {}
+            last_times = self.state_store.get_last_summary_times()
+            logger.info(f"成功读取各频道上次总结时间，共 {len(last_times)} 个频道")
+            return last_times
         except Exception as e:
-            logger.error(f"读取上次总结时间文件 {self.LAST_SUMMARY_FILE} 时出错: {type(e).__name__}: {e}")
+            logger.error(f"读取各频道上次总结时间时出错: {type(e).__name__}: {e}")
             return {}
     
-    def save_last_summary_times(self, times):
-        """保存各频道的上次总结时间到文件"""
-        logger.info(f"开始保存各频道上次总结时间到文件: {self.LAST_SUMMARY_FILE}")
+    async def _mark_channel_summarized(self, channel: str, summary_time: datetime = None):
+        """更新并原子持久化单个频道的上次总结时间
+        
+        每个频道处理完成后立即落盘，任务中途崩溃时
+        已完成的频道不会丢失进度，未完成的频道也不会被误标记。
+        
+        Args:
+            channel: 频道标识
+            summary_time: 总结时间，默认为复用缓存时的抓取时间，否则为当前 UTC 时间
+        """
+        run_progress.current().done(channel)
+        if replay.is_replaying():
+            return
+        state = run_state.current()
+        summary_time = summary_time or state.summary_times.pop(channel, None) or datetime.now(timezone.utc)
+        if not state.use_cache:
+            # 不复用缓存的运行（定时任务、--refresh）总结后，此前缓存的抓取结果已被总结过
+            self.fetch_cache.discard(channel)
+        self.last_summary_times[channel] = summary_time
+        last_message_id = state.cursors.pop(channel, None)
         try:
-            time_dict = {}
-            for channel, time_obj in times.items():
-                time_dict[channel] = time_obj.isoformat()
-            with open(self.LAST_SUMMARY_FILE, "w", encoding="utf-8") as f:
-                json.dump(time_dict, f, ensure_ascii=False, indent=2)
-            logger.info(f"成功保存各频道上次总结时间，共 {len(times)} 个频道")
+            await asyncio.to_thread(self.state_store.set_last_summary_time, channel, summary_time, last_message_id)
+            logger.info(f"已更新频道 {channel} 的上次总结时间: {summary_time}")
         except Exception as e:
-            logger.error(f"保存各频道上次总结时间到文件 {self.LAST_SUMMARY_FILE} 时出错: {type(e).__name__}: {e}")
+            logger.error(f"保存频道 {channel} 的上次总结时间时出错: {type(e).__name__}: {e}")
+        
+        delta = state.deltas.pop(channel, None)
+        if delta is None:
+            return
+        keep_days = max(self.edit_recheck_days, self.DEFAULT_SUMMARY_DAYS)
+        try:
+            await asyncio.to_thread(
+                self.state_store.update_message_hashes, channel, delta.hashes, delta.deleted,
+                summary_time - timedelta(days=keep_days)
+            )
+        except Exception as e:
+            logger.error(f"保存频道 {channel} 的消息指纹时出错: {type(e).__name__}: {e}")
     
-    async def fetch_last_week_messages(self, channels_to_fetch=None):
+    async def fetch_last_week_messages(self, channels_to_fetch=None, use_cache: bool = False):
         """抓取从上次总结时间至今的频道消息
         
         使用锁机制确保不会与登录流程中的 Telegram Client 发生并发冲突。
         
+        触发 FloodWait 的频道会被暂停，先抓取其他频道，等待结束后从游标处继续。
+        仍未能完整抓取的频道记录在本次运行状态的 ``fetch_failures`` 中，不会出现在返回结果里，
+        因此不会被总结，也不会更新上次总结时间。
+        
+        回放模式下消息来自夹具文件，不访问 Telegram；录制模式下同时记录抓取到的消息。
+        
         Args:
             channels_to_fetch: 可选，要抓取的频道列表。如果为None，则抓取所有配置的频道。
+            use_cache: 是否复用有效期内的抓取结果（仅手动总结使用；录制/回放时忽略）
         
         Returns:
-            dict: 按频道分组的消息字典 {channel: [messages]}
+            dict: 按频道分组的消息记录 {channel: [MessageRecord]}（只包含完整抓取的频道）
         
         Raises:
             Exception: 网络中断、认证失败等异常会向上传播
         """
-        # 使用锁防止与登录流程中的 Client 发生 session 文件冲突
-        async with self._telegram_client_lock:
-            logger.info("开始抓取频道消息（已获取 Telegram Client 锁）")
-            
-            try:
-                async with TelegramClient(self.USER_SESSION_FILE, int(self.api_id), self.api_hash) as client:
-                    current_time = datetime.now(timezone.utc)
-                    
-                    messages_by_channel = {}  # 按频道分组的消息字典
-                    
-                    # 确定要抓取的频道
-                    if channels_to_fetch and isinstance(channels_to_fetch, list):
-                        # 只抓取指定的频道
-                        channels = channels_to_fetch
-                        logger.info(f"正在抓取指定的 {len(channels)} 个频道的消息")
-                    else:
-                        # 抓取所有配置的频道
-                        if not self.channels:
-                            logger.warning("没有配置任何频道，无法抓取消息")
-                            return messages_by_channel
-                        channels = self.channels
-                        logger.info(f"正在抓取所有 {len(channels)} 个频道的消息")
-                    
-                    total_message_count = 0
-                    
-                    # 遍历所有要抓取的频道
-                    for channel in channels:
-                        channel_messages = []
-                        channel_message_count = 0
-                        logger.info(f"开始抓取频道: {channel}")
-                        
-                        try:
-                            # 为每个频道确定独立的起始时间
-                            if channel in self.last_summary_times and self.last_summary_times[channel]:
-                                start_time = self.last_summary_times[channel]
-                                logger.info(f"频道 {channel} 使用上次总结时间作为起始时间: {start_time}")
-                            else:
-                                start_time = current_time - timedelta(days=self.DEFAULT_SUMMARY_DAYS)
-                                logger.info(f"频道 {channel} 没有上次总结时间，使用默认时间范围: 过去{self.DEFAULT_SUMMARY_DAYS}天 ({start_time})")
-                            
-                            # 异步迭代消息，添加网络中断保护
-                            async for message in client.iter_messages(channel, offset_date=start_time, reverse=True):
-                                total_message_count += 1
-                                channel_message_count += 1
-                                if message.text:
-                                    # 动态获取频道名用于生成链接
-                                    channel_part = self._extract_channel_name(channel)
-                                    msg_link = f"{self.TELEGRAM_URL_PREFIX}{channel_part}/{message.id}"
-                                    channel_messages.append(f"内容: {message.text[:self.MESSAGE_TRUNCATE_LENGTH]}\n链接: {msg_link}")
-                                    
-                                    # 每抓取10条消息记录一次日志
-                                    if len(channel_messages) % 10 == 0:
-                                        logger.debug(f"频道 {channel} 已抓取 {len(channel_messages)} 条有效消息")
-                        
-                        except Exception as channel_error:
-                            logger.error(f"抓取频道 {channel} 时出错: {type(channel_error).__name__}: {channel_error}")
-                            # 继续处理其他频道，不中断整个流程
-                            channel_messages = []
-                        
-                        # 将当前频道的消息添加到字典中
-                        messages_by_channel[channel] = channel_messages
-                        logger.info(f"频道 {channel} 抓取完成，共处理 {channel_message_count} 条消息，其中 {len(channel_messages)} 条包含文本内容")
-                    
-                    logger.info(f"所有指定频道消息抓取完成，共处理 {total_message_count} 条消息")
-                    return messages_by_channel
-            
-            except Exception as e:
-                logger.error(f"Telegram客户端连接失败: {type(e).__name__}: {e}")
-                raise Exception(f"无法连接到Telegram: 请检查网络连接和登录状态") from e
+        session = replay.current()
+        fetch_started = time.perf_counter()
+        with tracing.span('fetch', replay=isinstance(session, ReplaySession)) as fetch_span:
+            if isinstance(session, ReplaySession):
+                messages_by_channel = await self._fetch_from_fixture(session, channels_to_fetch)
+            elif use_cache and session is None and self.fetch_cache_ttl:
+                run_state.current().use_cache = True
+                messages_by_channel = await self._fetch_with_cache(channels_to_fetch)
+            else:
+                messages_by_channel = await self._fetch_from_telegram(channels_to_fetch)
+            fetch_span.set(
+                channels=len(messages_by_channel),
+                messages=sum(len(messages) for messages in messages_by_channel.values()),
+                incomplete=len(run_state.current().fetch_failures),
+            )
+        if session is not None:
+            session.add_timing('fetch', time.perf_counter() - fetch_started)
+            if isinstance(session, RunRecorder):
+                session.fetch_failures = dict(run_state.current().fetch_failures)
+        return messages_by_channel
     
-    async def analyze_with_ai(self, messages):
-        """调用 AI 进行总结"""
-        logger.info("开始调用AI进行消息总结")
+    async def _fetch_with_cache(self, channels_to_fetch=None) -> dict:
+        """有效期内抓取过的频道直接使用缓存，其余频道从 Telegram 抓取
         
-        if not messages:
-            logger.info("没有需要分析的消息，返回空结果")
+        Args:
+            channels_to_fetch: 可选，要抓取的频道列表，默认所有配置的频道
+        
+        Returns:
+            dict: 按频道分组的消息记录（按请求的频道顺序）
+        """
+        channels = channels_to_fetch or self.channels
+        cached = {}
+        for channel in channels:
+            entry = self.fetch_cache.get(channel)
+            if entry is not None:
+                cached[channel] = entry
+        
+        fetched = {}
+        missing = [channel for channel in channels if channel not in cached]
+        if missing:
+            fetched = await self._fetch_from_telegram(missing)
+        if not cached:
+            return fetched
+        
+        logger.info(f"{len(cached)} 个频道使用缓存的抓取结果: {list(cached)}")
+        tracing.current_span().set(cached=len(cached))
+        progress = run_progress.current()
+        state = run_state.current()
+        messages_by_channel = {}
+        for channel in channels:
+            entry = cached.get(channel)
+            if entry is None:
+                if channel in fetched:
+                    messages_by_channel[channel] = fetched[channel]
+                continue
+            # 还原统计信息与游标，报告与上次总结时间的更新和重新抓取时一致
+            state.fetch_failures.pop(channel, None)
+            state.filter_stats[channel] = entry.filter_stats
+            for stats, value in ((state.ranking_stats, entry.ranking), (state.sampling_stats, entry.sampling)):
+                if value is None:
+                    stats.pop(channel, None)
+                else:
+                    stats[channel] = value
+            if entry.cursor:
+                state.cursors[channel] = entry.cursor
+            if entry.delta is not None:
+                state.deltas[channel] = entry.delta
+            # 缓存之后发布的消息不在结果中，总结时间只推进到抓取时间
+            state.summary_times[channel] = entry.fetched_time
+            progress.fetched(channel, len(entry.messages))
+            messages_by_channel[channel] = entry.messages
+        return messages_by_channel
+    
+    def _create_fetch_client(self, slot: str = SessionPool.DEFAULT_SLOT):
+        """创建用于抓取的 Telegram Client（由账号的共享 Client 按需连接）"""
+        telethon = _lazy_import('telethon')
+        # flood_sleep_threshold=0：FloodWait 一律抛出，由调度逻辑暂停频道而不是阻塞整个循环
+        return telethon.TelegramClient(
+            self._session_file_for(slot), int(self.api_id), self.api_hash, flood_sleep_threshold=0
+        )
+    
+    async def _fetch_from_telegram(self, channels_to_fetch=None):
+        """从 Telegram 抓取消息（见 ``fetch_last_week_messages``）
+        
+        每个已登录账号使用各自的共享 Client：并发的抓取（例如不同频道的手动总结）共用同一连接，
+        只有登录等修改 session 的操作需要等待抓取结束。配置了多个账号时，
+        频道按 ``ShardPlanner`` 分配到各账号并行抓取。
+        """
+        logger.info("开始抓取频道消息")
+        
+        try:
+            errors = _lazy_import('telethon.errors')
+            current_time = datetime.now(timezone.utc)
+            messages_by_channel = {}  # 按频道分组的消息字典
+            
+            # 确定要抓取的频道
+            if channels_to_fetch and isinstance(channels_to_fetch, list):
+                # 只抓取指定的频道
+                channels = channels_to_fetch
+                logger.info(f"正在抓取指定的 {len(channels)} 个频道的消息")
+            else:
+                # 抓取所有配置的频道
+                if not self.channels:
+                    logger.warning("没有配置任何频道，无法抓取消息")
+                    return messages_by_channel
+                channels = self.channels
+                logger.info(f"正在抓取所有 {len(channels)} 个频道的消息")
+            
+            # 只清除本次抓取的频道的失败记录（同一运行中可能重新抓取部分频道）
+            failures = run_state.current().fetch_failures
+            for channel in channels:
+                failures.pop(channel, None)
+            
+            # 为每个频道确定独立的起始时间
+            fetches = []
+            for channel in channels:
+                if channel in self.last_summary_times and self.last_summary_times[channel]:
+                    start_time = self.last_summary_times[channel]
+                    fetch = self._new_channel_fetch(channel, start_time)
+                    # 有消息游标时从上次处理到的消息之后继续（min_id），不依赖时间边界
+                    cursor = await asyncio.to_thread(self.state_store.get_channel_cursor, channel)
+                    if cursor:
+                        fetch.cursor = cursor
+                        logger.info(f"频道 {channel} 从消息游标 {cursor} 之后继续抓取（上次总结时间: {start_time}）")
+                    else:
+                        logger.info(f"频道 {channel} 使用上次总结时间作为起始时间: {start_time}")
+                else:
+                    start_time = current_time - timedelta(days=self.DEFAULT_SUMMARY_DAYS)
+                    logger.info(f"频道 {channel} 没有上次总结时间，使用默认时间范围: 过去{self.DEFAULT_SUMMARY_DAYS}天 ({start_time})")
+                    fetch = self._new_channel_fetch(channel, start_time)
+                fetches.append(fetch)
+            
+            if replay.current() is None:
+                # 读取已总结消息的指纹：抓取窗口内内容未变的消息不再总结，复查窗口内的消息检查编辑与删除
+                recheck_since = current_time - timedelta(days=self.edit_recheck_days)
+                for fetch in fetches:
+                    known = await asyncio.to_thread(
+                        self.state_store.get_message_hashes, fetch.channel, min(fetch.start_time, recheck_since)
+                    )
+                    fetch.delta = ChannelDelta(known)
+            
+            run_progress.current().add_channels(channels)
+            
+            # 正在登录（持有或等待独占锁）的账号本次不参与抓取，其频道由其余账号承担；
+            # 所有账号都在登录时才等待登录结束
+            slots = await asyncio.to_thread(self._session_slots)
+            busy_slots = [slot for slot in slots if self._session_pool.lock(slot).exclusive_pending]
+            if busy_slots and len(busy_slots) < len(slots):
+                logger.info(f"账号 {', '.join(busy_slots)} 正在登录，本次不参与抓取")
+                slots = [slot for slot in slots if slot not in busy_slots]
+            
+            async with contextlib.AsyncExitStack() as stack:
+                # 连接所有已登录账号；个别账号不可用时由其余账号承担
+                clients = {}
+                for slot in slots:
+                    try:
+                        clients[slot] = await stack.enter_async_context(self._session_pool.client(slot).connect())
+                    except Exception as e:
+                        logger.warning(f"账号 {slot} 无法使用，本次不参与抓取: {type(e).__name__}: {e}")
+                if not clients:
+                    raise RuntimeError("没有可用的已登录账号")
+                
+                pacers = {}
+                for slot in clients:
+                    state_key = AdaptivePacer.state_key(None if slot == SessionPool.DEFAULT_SLOT else slot)
+                    pacers[slot] = AdaptivePacer.from_dict(
+                        await asyncio.to_thread(self.state_store.get_value, state_key)
+                    )
+                    logger.debug(f"账号 {slot} 分页参数: 每页 {pacers[slot].page_size} 条，请求间隔 {pacers[slot].wait_time:.2f}秒")
+                
+                planner = ShardPlanner(list(clients), fetches)
+                if len(clients) > 1:
+                    logger.info(f"使用 {len(clients)} 个账号并行抓取: {', '.join(clients)}")
+                await asyncio.gather(*(
+                    self._fetch_worker(slot, clients[slot], pacers[slot], planner, messages_by_channel, errors)
+                    for slot in clients
+                ))
+            
+            for slot, pacer in pacers.items():
+                state_key = AdaptivePacer.state_key(None if slot == SessionPool.DEFAULT_SLOT else slot)
+                await asyncio.to_thread(self.state_store.set_value, state_key, pacer.to_dict())
+                if pacer.flood_waits:
+                    logger.info(f"账号 {slot} 本次抓取共触发 {pacer.flood_waits} 次 FloodWait，累计 {pacer.flood_wait_seconds} 秒")
+            total_message_count = sum(fetch.processed for fetch in fetches)
+            failed_channels = [fetch.channel for fetch in fetches if fetch.error]
+            if failed_channels:
+                logger.warning(f"以下频道未能完整抓取，本次不做总结: {failed_channels}")
+            logger.info(f"所有指定频道消息抓取完成，共处理 {total_message_count} 条消息")
+            return messages_by_channel
+        
+        except Exception as e:
+            logger.error(f"Telegram客户端连接失败: {type(e).__name__}: {e}")
+            raise Exception(f"无法连接到Telegram: 请检查网络连接和登录状态") from e
+    
+    async def _fetch_worker(self, slot: str, client, pacer: AdaptivePacer, planner: ShardPlanner,
+                            messages_by_channel: dict, errors):
+        """单个账号的抓取协程：从调度器取频道抓取，直到所有频道完成
+        
+        Args:
+            slot: 账号槽位
+            client: 该账号的 Telegram Client
+            pacer: 该账号的自适应分页参数
+            planner: 多账号调度器
+            messages_by_channel: 结果字典
+            errors: telethon.errors 模块
+        """
+        while True:
+            entry = await planner.take(slot)
+            if entry is None:
+                return
+            fetch, delay = entry
+            if delay > 0:
+                logger.info(f"账号 {slot} 的待抓取频道都在等待 FloodWait，{delay:.0f} 秒后恢复频道 {fetch.channel}")
+                with tracing.span('fetch.flood_wait', channel=fetch.channel, account=slot, seconds=round(delay, 1)):
+                    await asyncio.sleep(delay)
+            
+            attempt_span = tracing.span(
+                'fetch.channel', channel=fetch.channel, account=slot, resume_cursor=fetch.cursor,
+                page_size=pacer.page_size, wait_time=pacer.wait_time
+            ).begin()
+            requeued = False
+            run_progress.current().fetching(fetch.channel, fetch.processed)
+            try:
+                await asyncio.wait_for(
+                    self._fetch_channel_pages(client, fetch, pacer), self.fetch_channel_timeout
+                )
+            except errors.FloodWaitError as e:
+                attempt_span.set(flood_wait=e.seconds)
+                pacer.on_flood_wait(e.seconds)
+                fetch.waited += e.seconds
+                if fetch.waited > self.FLOOD_WAIT_BUDGET:
+                    fetch.error = f"FloodWait 累计等待超过 {self.FLOOD_WAIT_BUDGET} 秒"
+                    logger.error(f"频道 {fetch.channel} {fetch.error}，本次放弃，保留上次总结时间")
+                else:
+                    target = await planner.park(slot, fetch, e.seconds)
+                    requeued = True
+                    if target is None:
+                        logger.warning(
+                            f"频道 {fetch.channel} 触发 FloodWait（{e.seconds}秒），已抓取 {fetch.processed} 条，"
+                            f"暂停并先抓取其他频道；调整为每页 {pacer.page_size} 条，间隔 {pacer.wait_time:.2f}秒"
+                        )
+                        run_progress.current().parked(fetch.channel, e.seconds)
+                    else:
+                        logger.warning(
+                            f"账号 {slot} 抓取频道 {fetch.channel} 时触发 FloodWait（{e.seconds}秒），"
+                            f"已抓取 {fetch.processed} 条，转交账号 {target} 从游标处继续"
+                        )
+            except asyncio.TimeoutError:
+                # 已抓取的部分保留并归档，但该频道本次不做总结
+                fetch.error = f"抓取超时（超过 {self.fetch_channel_timeout} 秒）"
+                logger.error(f"频道 {fetch.channel} {fetch.error}，已处理 {fetch.processed} 条，保留上次总结时间")
+                attempt_span.set(timeout=True)
+            except Exception as channel_error:
+                # 继续处理其他频道，不中断整个流程；其他账号可能有权限访问（例如私有频道）
+                attempt_span.fail(channel_error)
+                target = await planner.retry(slot, fetch)
+                if target is not None:
+                    requeued = True
+                    logger.warning(f"账号 {slot} 抓取频道 {fetch.channel} 时出错: {type(channel_error).__name__}: {channel_error}，改由账号 {target} 重试")
+                else:
+                    fetch.error = f"{type(channel_error).__name__}: {channel_error}"
+                    logger.error(f"抓取频道 {fetch.channel} 时出错: {fetch.error}")
+            finally:
+                attempt_span.set(processed=fetch.processed, messages=len(fetch.messages))
+                attempt_span.end()
+            
+            if not requeued:
+                try:
+                    await self._finish_channel_fetch(fetch, messages_by_channel)
+                finally:
+                    await planner.done(fetch)
+    
+    async def _fetch_channel_pages(self, client, fetch: ChannelFetch, pacer: AdaptivePacer):
+        """按页抓取单个频道的消息，直到没有更多消息
+        
+        每条消息处理后立即推进游标，FloodWait 中断后从游标处续传。
+        
+        Args:
+            client: Telegram Client
+            fetch: 频道抓取状态
+            pacer: 自适应分页参数
+        """
+        channel = fetch.channel
+        # 链接前缀与过滤规则在频道级别计算一次，避免逐条消息重复解析
+        link_prefix = self._channel_link_prefix(channel)
+        channel_filter = self.message_filter_engine.for_channel(channel)
+        recorder = replay.current()
+        if recorder is not None:
+            recorder.record_channel(channel)
+        
+        while True:
+            page_size = pacer.page_size
+            # 请求间隔只由 iter_messages 的 wait_time 控制（每页内部按 100 条一次请求）
+            kwargs = {'limit': page_size, 'reverse': True, 'wait_time': pacer.wait_time}
+            if fetch.cursor:
+                kwargs['min_id'] = fetch.cursor
+            else:
+                kwargs['offset_date'] = fetch.start_time
+            
+            page_count = 0
+            async for message in client.iter_messages(channel, **kwargs):
+                page_count += 1
+                fetch.processed += 1
+                fetch.cursor = message.id
+                if not message.text:
+                    continue
+                edited = False
+                if fetch.delta is not None:
+                    edited = fetch.delta.classify(message.id, message.text)
+                    if edited is None:
+                        continue
+                is_forwarded = getattr(message, 'fwd_from', None) is not None
+                has_buttons = getattr(message, 'reply_markup', None) is not None
+                engagement = Engagement.from_message(message)
+                if recorder is not None:
+                    recorder.record_message(channel, message.id, message.date, message.text, is_forwarded, has_buttons, engagement)
+                self._collect_message(
+                    fetch, channel_filter, link_prefix,
+                    message.id, message.date, message.text, is_forwarded, has_buttons, engagement, edited
+                )
+            
+            pacer.on_page()
+            run_progress.current().fetching(channel, fetch.processed)
+            # 每页写入一次归档：启用抽样时内存中只保留样本，不随频道消息量增长
+            rows, fetch.archive_rows = fetch.archive_rows, []
+            await self._archive_messages(channel, rows)
+            logger.debug(f"频道 {channel} 已处理 {fetch.processed} 条消息，其中 {len(fetch.messages)} 条有效")
+            if page_count < page_size:
+                break
+        
+        if fetch.delta is not None and self.edit_recheck_days and not fetch.delta.rechecked:
+            await self._recheck_summarized_messages(client, fetch, channel_filter, link_prefix)
+    
+    async def _recheck_summarized_messages(self, client, fetch: ChannelFetch, channel_filter, link_prefix: str):
+        """按ID复查已总结、但本次没有再抓取到的消息，识别编辑与删除
+        
+        Telethon 按 100 个ID一批请求，复查窗口内的消息数再多也只需少量请求。
+        FloodWait 中断时整批重新复查（分页游标已在末尾，续传时直接进入复查）。
+        
+        Args:
+            client: Telegram Client
+            fetch: 频道抓取状态
+            channel_filter: 频道过滤规则
+            link_prefix: 频道消息链接前缀
+        """
+        delta = fetch.delta
+        ids = delta.recheck_ids()
+        if ids:
+            with tracing.span('fetch.recheck', channel=fetch.channel, ids=len(ids)) as recheck_span:
+                messages = await client.get_messages(fetch.channel, ids=ids)
+                edited = 0
+                for message_id, message in zip(ids, messages):
+                    # 已删除的消息返回 None；正文被清空的消息同样不再有可总结的内容
+                    if message is None or not message.text:
+                        delta.mark_deleted(message_id)
+                        continue
+                    if delta.classify(message_id, message.text) is None:
+                        continue
+                    edited += 1
+                    self._collect_message(
+                        fetch, channel_filter, link_prefix,
+                        message_id, message.date, message.text,
+                        getattr(message, 'fwd_from', None) is not None,
+                        getattr(message, 'reply_markup', None) is not None,
+                        Engagement.from_message(message), True
+                    )
+                recheck_span.set(edited=edited, deleted=len(delta.deleted))
+            rows, fetch.archive_rows = fetch.archive_rows, []
+            await self._archive_messages(fetch.channel, rows)
+        delta.rechecked = True
+    
+    def _collect_message(self, fetch: ChannelFetch, channel_filter, link_prefix: str,
+                         message_id: int, date, text: str, is_forwarded: bool, has_buttons: bool, engagement,
+                         edited: bool = False):
+        """对一条文本消息应用过滤规则，保留的消息加入频道抓取结果"""
+        if not channel_filter.is_empty:
+            rule = channel_filter.check(text, is_forwarded=is_forwarded, has_buttons=has_buttons)
+            if rule:
+                fetch.filter_stats.record(rule, text)
+                return
+        record = MessageRecord(message_id, date, text, link_prefix, engagement, edited)
+        fetch.messages.append(record)
+        fetch.archive_rows.append(record.archive_row())
+    
+    def _new_channel_fetch(self, channel: str, start_time) -> ChannelFetch:
+        """创建频道抓取状态；配置了抽样上限时以蓄水池代替消息列表
+        
+        Args:
+            channel: 频道标识
+            start_time: 抓取起始时间（回放时为 None）
+        """
+        fetch = ChannelFetch(channel, start_time, FilterStats())
+        if self.sample_max_messages:
+            days = 0
+            if self.sample_stratify_by_day:
+                span_days = self.DEFAULT_SUMMARY_DAYS
+                if start_time is not None:
+                    span_days = max((datetime.now(timezone.utc) - start_time).days, 0)
+                # 窗口首尾的不完整日期各算一天
+                days = span_days + 1
+            # 以频道为种子：相同的消息序列得到相同的样本，回放结果可比
+            fetch.messages = ReservoirSampler(self.sample_max_messages, days, seed=channel)
+        return fetch
+    
+    async def _fetch_from_fixture(self, session: ReplaySession, channels_to_fetch=None) -> dict:
+        """回放模式：从夹具中还原消息，重新执行过滤、排序等抓取后处理
+        
+        Args:
+            session: 回放会话
+            channels_to_fetch: 可选，只回放指定频道
+        
+        Returns:
+            dict: 按频道分组的消息记录
+        """
+        messages_by_channel = {}
+        for channel, rows in session.channels.items():
+            if channels_to_fetch and channel not in channels_to_fetch:
+                continue
+            fetch = self._new_channel_fetch(channel, None)
+            link_prefix = self._channel_link_prefix(channel)
+            channel_filter = self.message_filter_engine.for_channel(channel)
+            run_progress.current().fetching(channel, 0)
+            for message_id, date, text, is_forwarded, has_buttons, engagement in session.iter_messages(rows):
+                fetch.processed += 1
+                fetch.cursor = message_id
+                self._collect_message(
+                    fetch, channel_filter, link_prefix,
+                    message_id, date, text, is_forwarded, has_buttons, engagement
+                )
+            fetch.error = session.fetch_failures.get(channel)
+            await self._finish_channel_fetch(fetch, messages_by_channel)
+        logger.info(f"回放模式：已从夹具还原 {len(messages_by_channel)} 个频道的消息")
+        return messages_by_channel
+    
+    async def _finish_channel_fetch(self, fetch: ChannelFetch, messages_by_channel: dict):
+        """收尾单个频道的抓取：归档、统计，完整抓取的频道加入结果
+        
+        Args:
+            fetch: 频道抓取状态
+            messages_by_channel: 结果字典
+        """
+        channel = fetch.channel
+        state = run_state.current()
+        run_progress.current().fetched(channel, len(fetch.messages), complete=not fetch.error)
+        # 已抓取的部分照常归档，便于检索；但不完整的频道不参与总结
+        rows, fetch.archive_rows = fetch.archive_rows, []
+        await self._archive_messages(channel, rows)
+        state.filter_stats[channel] = fetch.filter_stats
+        if fetch.filter_stats.total_messages:
+            logger.info(
+                f"频道 {channel} 过滤规则共移除 {fetch.filter_stats.total_messages} 条消息"
+                f"（约 {fetch.filter_stats.total_tokens} tokens）：\n{fetch.filter_stats.format()}"
+            )
+        
+        if fetch.error:
+            state.fetch_failures[channel] = fetch.error
+            state.cursors.pop(channel, None)
+            state.deltas.pop(channel, None)
+            return
+        
+        messages = fetch.messages
+        if isinstance(messages, ReservoirSampler):
+            messages = messages.result()
+            if fetch.messages.seen > len(messages):
+                state.sampling_stats[channel] = (len(messages), fetch.messages.seen)
+                logger.info(f"频道 {channel} 消息过多，从 {fetch.messages.seen} 条中抽样 {len(messages)} 条")
+            else:
+                state.sampling_stats.pop(channel, None)
+        else:
+            state.sampling_stats.pop(channel, None)
+        
+        # 按互动数据选出最重要的消息，控制 AI 上下文规模
+        messages_by_channel[channel] = self._rank_channel_messages(channel, messages)
+        if fetch.cursor and not replay.is_replaying():
+            state.cursors[channel] = fetch.cursor
+        delta = fetch.delta
+        if delta is not None:
+            # 只为最终进入总结的消息保存指纹，被过滤、抽样或筛选掉的消息下次仍按新消息处理
+            delta.record(messages_by_channel[channel])
+            state.deltas[channel] = delta
+            if delta.unchanged or delta.edited or delta.deleted:
+                logger.info(
+                    f"频道 {channel} 增量: {delta.unchanged} 条已总结且未变化的消息跳过，"
+                    f"{delta.edited} 条被编辑，{len(delta.deleted)} 条被删除"
+                )
+        # 只有复用缓存的手动总结写入缓存；定时任务的抓取结果总结后即过时
+        if state.use_cache:
+            self.fetch_cache.put(channel, CachedFetch(
+                messages_by_channel[channel], fetch.filter_stats,
+                state.ranking_stats.get(channel), state.sampling_stats.get(channel), fetch.cursor,
+                fetch.fetched_time, delta
+            ))
+        logger.info(f"频道 {channel} 抓取完成，共处理 {fetch.processed} 条消息，其中 {len(messages)} 条包含文本内容")
+    
+    def _rank_channel_messages(self, channel: str, messages: list) -> list:
+        """按互动重要度选出频道内最重要的消息
+        
+        未配置条数和 token 上限时原样返回。选中的消息保持时间顺序。
+        
+        Args:
+            channel: 频道标识
+            messages: 消息记录列表（MessageRecord）
+        
+        Returns:
+            list: 选中的消息
+        """
+        total = len(messages)
+        if not total or (self.rank_max_messages <= 0 and self.rank_max_tokens <= 0):
+            run_state.current().ranking_stats.pop(channel, None)
+            return messages
+        
+        scores = [message.engagement.score() for message in messages]
+        token_counts = None
+        if self.rank_max_tokens > 0:
+            token_counts = [estimate_tokens(message.text[:self.MESSAGE_TRUNCATE_LENGTH]) for message in messages]
+        selected = select_top(scores, self.rank_max_messages, token_counts, self.rank_max_tokens)
+        
+        run_state.current().ranking_stats[channel] = (len(selected), total)
+        if len(selected) < total:
+            logger.info(f"频道 {channel} 按互动重要度保留 {len(selected)}/{total} 条消息")
+        return [messages[i] for i in selected]
+    
+    def _delta_note(self, channel: str) -> str:
+        """频道有已总结消息被编辑或删除时附在报告末尾的说明（没有时为空字符串）"""
+        delta = run_state.current().deltas.get(channel)
+        return delta.note() if delta is not None else ""
+    
+    def _sampling_note(self, channel: str) -> str:
+        """频道被抽样时附在报告末尾的说明（未抽样时为空字符串）"""
+        sampled = run_state.current().sampling_stats.get(channel)
+        if not sampled:
+            return ""
+        return f"\n\n（本周共 {sampled[1]} 条消息，随机抽样 {sampled[0]} 条进行总结）"
+    
+    async def _archive_messages(self, channel: str, rows: list):
+        """将抓取到的消息写入全文检索归档
+        
+        Args:
+            channel: 频道标识
+            rows: (message_id, date, text, link) 元组列表
+        """
+        if not self.archive_enabled or not rows or replay.is_replaying():
+            return
+        try:
+            count = await asyncio.to_thread(self.message_archive.add_messages, channel, rows)
+            logger.debug(f"频道 {channel} 已归档 {count} 条消息")
+        except Exception as e:
+            logger.error(f"归档频道 {channel} 的消息失败: {type(e).__name__}: {e}")
+    
+    async def _record_summary(self, channel: str, summary: str):
+        """持久化一份新生成的周报
+        
+        周报写入状态数据库（供月报/季报合并使用），并写入全文检索归档。
+        覆盖区间为该频道上次总结时间至今，因此必须在更新上次总结时间之前调用。
+        
+        Args:
+            channel: 频道标识
+            summary: 总结文本
+        """
+        if not summary or replay.is_replaying():
+            return
+        period_end = datetime.now(timezone.utc)
+        period_start = self.last_summary_times.get(channel) or period_end - timedelta(days=self.DEFAULT_SUMMARY_DAYS)
+        try:
+            await asyncio.to_thread(self.state_store.add_summary, channel, 'weekly', period_start, period_end, summary)
+        except Exception as e:
+            logger.error(f"保存频道 {channel} 的周报失败: {type(e).__name__}: {e}")
+        
+        if not self.archive_enabled:
+            return
+        try:
+            entry = self.channel_registry.lookup(channel)
+            link = entry.url if entry else None
+            await asyncio.to_thread(self.message_archive.add_summary, channel, summary, None, link)
+        except Exception as e:
+            logger.error(f"归档频道 {channel} 的总结失败: {type(e).__name__}: {e}")
+    
+    async def _roll_cold_storage(self):
+        """将归档库中超出保留周数的消息迁入压缩冷存储（失败只记录日志）"""
+        if not self.archive_enabled or not self.cold_storage_hot_weeks or replay.current() is not None:
+            return
+        cutoff = week_start(datetime.now(timezone.utc), self.cold_storage_hot_weeks)
+        try:
+            with tracing.span('archive.roll', cutoff=cutoff.isoformat()) as roll_span:
+                moved = await asyncio.to_thread(self.cold_storage.roll, self.message_archive, cutoff)
+                roll_span.set(moved=moved)
+            if moved:
+                usage = await asyncio.to_thread(self.cold_storage.disk_usage)
+                logger.info(f"已将 {moved} 条 {cutoff:%Y-%m-%d} 之前的归档消息迁入冷存储，冷存储共占用 {usage / 1024:.0f} KB")
+        except Exception as e:
+            logger.error(f"迁移归档消息到冷存储时出错: {type(e).__name__}: {e}")
+    
+    def _topic_clustering_active(self, force: bool = False) -> bool:
+        """判断本次运行是否使用跨频道话题聚类
+        
+        Args:
+            force: 是否由命令参数强制启用
+        
+        Returns:
+            bool: 已启用且 NumPy/SciPy 可用时返回 True
+        """
+        if not (self.topic_clustering_enabled or force):
+            return False
+        from . import topic_cluster
+        if not topic_cluster.is_available():
+            logger.warning("话题聚类需要安装 numpy 与 scipy，已回退为按频道总结")
+            return False
+        return True
+    
+    async def _build_topic_digest(self, messages_by_channel: dict) -> tuple:
+        """对本次运行的所有消息做跨频道话题聚类并生成摘要
+        
+        话题按字符预算打包为批次，每个批次一次 AI 调用，
+        每段摘要末尾附上各话题的全部来源链接。
+        
+        Args:
+            messages_by_channel: 按频道分组的消息
+        
+        Returns:
+            tuple: (摘要分段列表（每个批次一段）, 所有批次均生成成功的频道集合)。
+            某频道的消息只要有一条落在生成失败的批次中，该频道就不在集合内，
+            调用方不应推进它的总结时间，以便下次运行重新纳入这些消息
+        """
+        from . import topic_cluster
+        
+        items = [
+            (channel, message)
+            for channel, messages in messages_by_channel.items()
+            for message in messages
+        ]
+        if not items:
+            logger.info("所有频道均无新消息，跳过话题聚类")
+            return [], set(messages_by_channel)
+        
+        progress = run_progress.current()
+        for channel in messages_by_channel:
+            progress.summarizing(channel)
+        
+        with tracing.span('topic_digest.cluster', messages=len(items)) as cluster_span:
+            topics = await asyncio.to_thread(
+                topic_cluster.cluster_texts, [message.text for _, message in items], self.topic_similarity_threshold
+            )
+            cluster_span.set(topics=len(topics))
+        logger.info(f"话题聚类完成：{len(items)} 条消息归并为 {len(topics)} 个话题")
+        
+        # 按字符预算将话题打包为批次，减少 AI 调用次数
+        batches, current, current_chars = [], [], 0
+        for number, members in enumerate(topics, 1):
+            sources = sorted({self._extract_channel_name(items[i][0]) for i in members})
+            block = f"【话题 {number}】来源频道: {', '.join(sources)}\n" + "\n\n".join(
+                items[i][1].render(self.MESSAGE_TRUNCATE_LENGTH) for i in members
+            )
+            if current and current_chars + len(block) > self.topic_batch_chars:
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append((number, members, block))
+            current_chars += len(block)
+        if current:
+            batches.append(current)
+        
+        sections = []
+        failed_channels = set()
+        for batch_index, batch in enumerate(batches, 1):
+            logger.info(f"开始生成话题摘要批次 {batch_index}/{len(batches)}，包含 {len(batch)} 个话题")
+            summary = await self.analyze_with_ai([block for _, _, block in batch])
+            if not summary or summary.startswith("AI 分析失败"):
+                failed_channels.update(items[i][0] for _, members, _ in batch for i in members)
+                logger.warning(f"话题摘要批次 {batch_index} 生成失败，已跳过")
+                continue
+            
+            link_lines = []
+            for number, members, _ in batch:
+                links = [items[i][1].link for i in members]
+                if links:
+                    link_lines.append(f"话题{number}: " + " ".join(links))
+            section = summary
+            if link_lines:
+                section += "\n\n📎 来源链接\n" + "\n".join(link_lines)
+            sections.append(section)
+            await self._record_summary(self.TOPIC_DIGEST_NAME, section)
+        if failed_channels:
+            logger.warning(f"以下频道有话题摘要批次生成失败，不推进总结时间: {', '.join(sorted(failed_channels))}")
+        return sections, set(messages_by_channel) - failed_channels
+    
+    async def analyze_with_ai(self, messages, instruction: str = None):
+        """调用 AI 进行总结
+        
+        Args:
+            messages: 待总结的消息记录（MessageRecord）或文本列表
+            instruction: 可选，替代当前提示词的指令（如月报合并指令）
+        """
+        logger.info("开始调用AI进行消息总结")
+        
+        if not messages:
+            logger.info("没有需要分析的消息，返回空结果")
             return "本周无新动态。"
 
-        context_text = "\n\n---\n\n".join(messages)
-        prompt = f"{self.current_prompt}{context_text}"
+        # 规则放入逐字节稳定的 system prompt（可命中提供商前缀缓存），消息内容放在其后
+        system_prompt = self._system_prompt_for(instruction or self.current_prompt)
+        context_text = render_messages(messages, self.MESSAGE_TRUNCATE_LENGTH)
+        prompt = f"{CONTEXT_HEADER}{context_text}"
         
-        logger.debug(f"AI请求配置: 提供商={self.ai_provider}, 提示词长度={len(self.current_prompt)}字符, 上下文长度={len(context_text)}字符")
-        logger.debug(f"AI请求总长度: {len(prompt)}字符")
+        logger.debug(f"AI请求配置: 提供商={self.ai_provider}, 固定前缀长度={len(system_prompt)}字符, 上下文长度={len(context_text)}字符")
         
+        ai_span = tracing.span(
+            'ai', messages=len(messages), prompt_chars=len(prompt), system_chars=len(system_prompt)
+        ).begin()
         try:
             start_time = datetime.now(timezone.utc)
             # 使用AstrBot框架提供的AI调用机制
-            response = await self.context.llm_generate(
-                chat_provider_id=self.ai_provider,
-                prompt=prompt,
-                system_prompt="你是一个专业的资讯摘要助手，擅长提取重点并保持客观。"
+            response = await asyncio.wait_for(
+                self._llm_generate(
+                    chat_provider_id=self.ai_provider,
+                    prompt=prompt,
+                    system_prompt=system_prompt
+                ),
+                self.ai_call_timeout
             )
             end_time = datetime.now(timezone.utc)
             
             processing_time = (end_time - start_time).total_seconds()
-            logger.info(f"AI分析完成，处理时间: {processing_time:.2f}秒")
+            usage = TokenUsage.from_response(response)
+            self.token_usage.record(usage)
+            ai_span.set(response_chars=len(response.completion_text or ''))
+            if usage is not None:
+                ai_span.set(**usage._asdict())
+                logger.info(f"AI分析完成，处理时间: {processing_time:.2f}秒，输入 {usage.input_tokens} tokens"
+                           f"（缓存命中 {usage.cached_tokens}），输出 {usage.output_tokens} tokens")
+            else:
+                logger.info(f"AI分析完成，处理时间: {processing_time:.2f}秒")
             logger.debug(f"AI响应长度: {len(response.completion_text)}字符")
             
             return response.completion_text
+        except asyncio.TimeoutError as e:
+            logger.error(f"AI分析失败: 调用超过 {self.ai_call_timeout} 秒未返回")
+            ai_span.fail(e)
+            return "AI 分析失败，请检查AI提供商配置和网络连接"
         except Exception as e:
             logger.error(f"AI分析失败: {type(e).__name__}: {e}", exc_info=True)
+            ai_span.fail(e)
             return "AI 分析失败，请检查AI提供商配置和网络连接"
+        finally:
+            ai_span.end()
+    
+    async def _llm_generate(self, **kwargs):
+        """调用 AstrBot 的 llm_generate；录制/回放模式下经由当前会话"""
+        session = replay.current()
+        if session is None:
+            return await self.context.llm_generate(**kwargs)
+        started = time.perf_counter()
+        try:
+            return await session.llm_generate(self.context, **kwargs)
+        finally:
+            session.add_timing('ai', time.perf_counter() - started)
+    
+    async def _send_message(self, umo: str, message_chain, text: str):
+        """发送消息；录制/回放模式下经由当前会话（回放时只记录不发送）"""
+        session = replay.current()
+        if session is None:
+            await self.context.send_message(umo, message_chain)
+            return
+        started = time.perf_counter()
+        try:
+            await session.send_message(self.context, umo, message_chain, text)
+        finally:
+            session.add_timing('push', time.perf_counter() - started)
+    
+    def _system_prompt_for(self, instruction: str) -> str:
+        """获取指令对应的固定前缀（按指令缓存，保证同一指令下的多次调用逐字节一致）"""
+        system_prompt = self._system_prompts.get(instruction)
+        if system_prompt is None:
+            system_prompt = self._system_prompts[instruction] = build_system_prompt(instruction)
+        return system_prompt
     
     def _parse_time_string(self, time_str: str) -> tuple:
         """解析时间字符串为星期和时间部分
@@ -986,6 +2272,9 @@ class TelegramSummaryPlugin(Star):
     async def _send_admin_alert(self, task_name: str, error: Exception, context: dict = None):
         """向管理员发送告警消息
         
+        同一任务、同一错误类型的告警在聚合窗口内只立即发送第一条，其余计数后并入汇总告警；
+        超出告警发送额度时同样并入汇总。
+        
         Args:
             task_name: 任务名称
             error: 异常对象
@@ -995,12 +2284,14 @@ class TelegramSummaryPlugin(Star):
             logger.warning("未配置管理员ID，无法发送告警")
             return
         
+        error_type = type(error).__name__
+        error_msg = str(error)
+        if not self.alerts.record(task_name, error_type, error_msg):
+            logger.info(f"告警 {task_name} - {error_type} 已合并，将在汇总告警中发送（待汇总 {self.alerts.pending} 条）")
+            return
+        
         try:
-            from astrbot.api.event import MessageChain
-            
             # 构建告警消息
-            error_type = type(error).__name__
-            error_msg = str(error)
             error_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
             
             alert_message = (
@@ -1024,20 +2315,40 @@ class TelegramSummaryPlugin(Star):
                     if value is not None:
                         alert_message += f"- {key}: {value}\n"
             
-            alert_message += "\n请检查日志获取详细信息"
-            
-            # 构建消息链
-            message_chain = MessageChain().message(alert_message)
-            
-            # 发送告警
-            admin_umo = f"QQ:FriendMessage:{self.admin_id}"
-            await self.context.send_message(admin_umo, message_chain)
+            alert_message += (
+                f"\n{self.alert_window_minutes} 分钟内的同类告警将合并为汇总发送\n"
+                "请检查日志获取详细信息"
+            )
             
+            await self._deliver_admin_message(alert_message)
             logger.info(f"已向管理员 {self.admin_id} 发送告警: {task_name} - {error_type}")
             
         except Exception as e:
             logger.error(f"发送管理员告警失败: {type(e).__name__}: {e}")
     
+    async def _flush_alert_digest(self):
+        """发送聚合窗口内被合并的重复告警汇总（由调度器定期执行）"""
+        if not self.admin_id:
+            return
+        digest = self.alerts.take_digest()
+        if digest is None:
+            if self.alerts.pending:
+                logger.warning(f"告警发送额度已用完，{self.alerts.pending} 条告警顺延到下一次汇总")
+            return
+        try:
+            await self._deliver_admin_message(digest.text)
+            logger.info(f"已向管理员 {self.admin_id} 发送告警汇总")
+        except Exception as e:
+            # 计数退回，并入下一次汇总
+            self.alerts.restore(digest)
+            logger.error(f"发送告警汇总失败，{self.alerts.pending} 条告警顺延到下一次汇总: {type(e).__name__}: {e}")
+    
+    async def _deliver_admin_message(self, text: str):
+        """发送一条消息给管理员"""
+        from astrbot.api.event import MessageChain
+        admin_umo = f"QQ:FriendMessage:{self.admin_id}"
+        await self._send_message(admin_umo, MessageChain().message(text), text)
+    
     def _parse_hour_minute(self, time_part: str) -> tuple:
         """解析时间部分为小时和分钟
         
@@ -1110,12 +2421,13 @@ class TelegramSummaryPlugin(Star):
             logger.error(f"解析时间配置失败: {type(e).__name__}: {e}，使用默认值")
             return 'mon', 9, 0
     
-    async def push_summary_to_targets(self, summary_text, channel_name):
+    async def push_summary_to_targets(self, summary_text, channel_name, title: str = None):
         """将总结推送到配置的目标
         
         Args:
             summary_text: 总结文本内容
             channel_name: 频道名称
+            title: 可选，直接指定标题（不使用标题模板），用于月报/季报等
         
         Returns:
             dict: 推送统计信息 {success: 成功数, fail: 失败数}
@@ -1136,7 +2448,8 @@ class TelegramSummaryPlugin(Star):
         footer_template = self.message_templates.get('summary_footer', '')
         
         # 格式化标题
-        title = title_template.format(channel_name=channel_name)
+        if title is None:
+            title = title_template.format(channel_name=channel_name)
         
         # 构建完整消息
         push_message = f"{title}\n\n{summary_text}"
@@ -1157,98 +2470,353 @@ class TelegramSummaryPlugin(Star):
             targets.append(f"QQ:FriendMessage:{user_id}")
         
         logger.info(f"准备推送到 {len(targets)} 个目标: {targets}")
+        push_span = tracing.span('push', title=title, targets=len(targets), chars=len(push_message)).begin()
         
         # 遍历所有推送目标
         for i, umo in enumerate(targets):
             try:
                 # 发送消息
-                await self.context.send_message(umo, message_chain)
+                with tracing.span('push.target', target=umo):
+                    await asyncio.wait_for(
+                        self._send_message(umo, message_chain, push_message), self.push_target_timeout
+                    )
                 logger.info(f"成功推送到目标 {umo}")
                 success_count += 1
                 
-                # 随机延迟，避免触发频率限制
-                if i < len(targets) - 1:
+                # 随机延迟，避免触发频率限制（回放时无需限速）
+                if i < len(targets) - 1 and not replay.is_replaying():
                     await asyncio.sleep(random.uniform(1, 3))
+            except asyncio.TimeoutError:
+                logger.error(f"推送到目标 {umo} 失败: 超过 {self.push_target_timeout} 秒未完成")
+                fail_count += 1
             except Exception as e:
                 logger.error(f"推送到目标 {umo} 失败: {type(e).__name__}: {e}")
                 fail_count += 1
         
         logger.info(f"推送完成: 成功 {success_count} 个, 失败 {fail_count} 个")
+        push_span.set(success=success_count, fail=fail_count)
+        push_span.end()
         return {
             'success': success_count,
             'fail': fail_count
         }
     
-    async def main_job(self):
-        """主定时任务：每周一生成频道消息总结"""
+    def _report_period(self, kind: str, now: datetime = None) -> tuple:
+        """计算月报/季报覆盖的最近一个完整自然周期
+        
+        Args:
+            kind: 报告类型（monthly / quarterly）
+            now: 参考时间，默认为当前本地时间
+        
+        Returns:
+            tuple: (start, end, label) start/end 为带时区的 UTC 时间，label 如 "2026年9月"
+        """
+        now = now or datetime.now().astimezone()
+        if kind == 'monthly':
+            end = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            start = (end - timedelta(days=1)).replace(day=1)
+            label = f"{start.year}年{start.month}月"
+        else:
+            quarter_start_month = (now.month - 1) // 3 * 3 + 1
+            end = now.replace(month=quarter_start_month, day=1, hour=0, minute=0, second=0, microsecond=0)
+            last_quarter_end = end - timedelta(days=1)
+            start = last_quarter_end.replace(month=(last_quarter_end.month - 1) // 3 * 3 + 1, day=1)
+            label = f"{start.year}年第{(start.month - 1) // 3 + 1}季度"
+        return start.astimezone(timezone.utc), end.astimezone(timezone.utc), label
+    
+    async def build_periodic_report(self, kind: str, channels: list = None) -> list:
+        """基于已保存的周报生成月报或季报
+        
+        只读取状态数据库中的周报，不重新抓取 Telegram 消息；
+        每个频道使用一次小型合并提示词调用 AI。
+        
+        Args:
+            kind: 报告类型（monthly / quarterly）
+            channels: 可选，限定频道；默认包含所有有周报的频道
+        
+        Returns:
+            list: [(channel, label, report_text)]
+        """
+        start, end, label = self._report_period(kind)
+        kind_label = self.PERIODIC_REPORT_LABELS[kind]
+        summaries = await asyncio.to_thread(self.state_store.get_summaries, 'weekly', start, end)
+        
+        by_channel = {}
+        for row in summaries:
+            if channels is None or row['channel'] in channels:
+                by_channel.setdefault(row['channel'], []).append(row)
+        logger.info(f"开始生成{label}{kind_label}：{len(by_channel)} 个频道，共 {len(summaries)} 份周报")
+        
+        instruction = self.PERIODIC_REPORT_PROMPT.format(label=label, kind_label=kind_label)
+        reports = []
+        for channel, rows in by_channel.items():
+            weekly_texts = [
+                f"【{row['period_start'][:10]} ~ {row['period_end'][:10]}】\n{row['text']}"
+                for row in rows
+            ]
+            report = await self.analyze_with_ai(weekly_texts, instruction=instruction)
+            if not report or report.startswith("AI 分析失败"):
+                logger.warning(f"频道 {channel} 的{label}{kind_label}生成失败，已跳过")
+                continue
+            reports.append((channel, label, report))
+            try:
+                await asyncio.to_thread(self.state_store.add_summary, channel, kind, start, end, report)
+            except Exception as e:
+                logger.error(f"保存频道 {channel} 的{kind_label}失败: {type(e).__name__}: {e}")
+        return reports
+    
+    async def periodic_report_job(self, kind: str):
+        """月报/季报定时任务：合并上一个自然周期的周报并推送
+        
+        Args:
+            kind: 报告类型（monthly / quarterly）
+        """
+        _, _, label = self._report_period(kind)
+        kind_label = self.PERIODIC_REPORT_LABELS[kind]
+        slot = f"{kind}-{label}"
+        if self._leader_lease:
+            claimed = await asyncio.to_thread(self._leader_lease.claim_slot, slot)
+            if not claimed:
+                logger.info(f"当前实例未认领时段 {slot}，跳过{kind_label}任务")
+                return
+        
+        root_span = self.tracer.trace('periodic_report_job', uuid.uuid4().hex[:12], kind=kind, period=label).begin()
+        try:
+            reports = await self.build_periodic_report(kind)
+            if not reports:
+                logger.info(f"{label}没有可合并的周报，跳过{kind_label}推送")
+                return
+            for channel, label, report in reports:
+                channel_name = self._extract_channel_name(channel)
+                await self.push_summary_to_targets(report, channel_name, title=f"【{label}{kind_label}】{channel_name}")
+            logger.info(f"{label}{kind_label}推送完成，共 {len(reports)} 个频道")
+        except Exception as e:
+            logger.error(f"{kind_label}任务执行失败: {type(e).__name__}: {e}", exc_info=True)
+            root_span.fail(e)
+            await self._send_admin_alert(task_name=f"{kind_label}定时任务", error=e, context={"周期": label})
+        finally:
+            if self._leader_lease:
+                await asyncio.to_thread(self._leader_lease.finish_slot, slot)
+            root_span.end()
+            await self._flush_traces()
+    
+    async def _record_run_start(self, kind: str) -> str:
+        """在运行历史中记录一次运行开始
+        
+        Args:
+            kind: 运行类型（scheduled / manual）
+        
+        Returns:
+            str: 运行ID
+        """
+        run_id = uuid.uuid4().hex[:12]
+        if replay.is_replaying():
+            return run_id
+        try:
+            await asyncio.to_thread(self.state_store.start_run, run_id, kind)
+        except Exception as e:
+            logger.warning(f"记录运行开始失败: {type(e).__name__}: {e}")
+        return run_id
+    
+    async def _record_run_finish(self, run_id: str, status: str, stats: dict = None):
+        """在运行历史中记录一次运行结束
+        
+        Args:
+            run_id: 运行ID
+            status: 结束状态（success / failed / cancelled）
+            stats: 运行统计信息
+        """
+        if replay.is_replaying():
+            return
+        try:
+            await asyncio.to_thread(self.state_store.finish_run, run_id, status, stats)
+        except Exception as e:
+            logger.warning(f"记录运行结束失败: {type(e).__name__}: {e}")
+    
+    async def _flush_traces(self):
+        """将本次运行的追踪数据写入 traces.jsonl"""
+        if not self.tracer.enabled or replay.is_replaying():
+            return
+        try:
+            await asyncio.to_thread(self.tracer.flush)
+        except Exception as e:
+            logger.warning(f"写入追踪数据失败: {type(e).__name__}: {e}")
+    
+    def _start_run_progress(self, run_id: str, kind: str) -> RunProgress:
+        """开始记录一次运行的实时进度（供 /tgstatus 查询），并登记当前任务（供 /summary cancel 取消）"""
+        progress = RunProgress(run_id, kind).begin()
+        self.active_runs[run_id] = progress
+        self._run_states[run_id] = run_state.RunState().begin()
+        self._run_tasks[run_id] = asyncio.current_task()
+        return progress
+    
+    def _finish_run_progress(self, progress: RunProgress):
+        """结束运行进度，保留为最近一次运行"""
+        progress.end()
+        state = self._run_states.pop(progress.run_id, None)
+        if state is not None:
+            state.end()
+        self.active_runs.pop(progress.run_id, None)
+        self._run_tasks.pop(progress.run_id, None)
+        self.last_run_progress = progress
+    
+    async def _cancel_runs(self, run_ids: list = None) -> list:
+        """取消运行中的任务，并等待其收尾
+        
+        取消会沿 await 链传递到正在进行的抓取、AI 调用或推送；
+        共享 Client 的使用计数随 ``async with`` 退出释放，已完成频道的总结时间此前已逐个落盘。
+        
+        Args:
+            run_ids: 可选，只取消指定的运行ID；默认取消全部
+        
+        Returns:
+            list: 已取消的运行ID
+        """
+        tasks = {}
+        for run_id, task in list(self._run_tasks.items()):
+            if run_ids and run_id not in run_ids:
+                continue
+            if task is None or task.done() or task is asyncio.current_task():
+                continue
+            task.cancel()
+            tasks[run_id] = task
+        if tasks:
+            _, pending = await asyncio.wait(tasks.values(), timeout=self.CANCEL_WAIT_SECONDS)
+            if pending:
+                logger.warning(f"{len(pending)} 个任务在 {self.CANCEL_WAIT_SECONDS:.0f} 秒内未完成收尾")
+        return list(tasks)
+    
+    async def main_job(self, resume_slot: str = None, channels: list = None, kind: str = 'scheduled'):
+        """主定时任务：每周一生成频道消息总结
+        
+        Args:
+            resume_slot: 可选，接管租约后需要补跑的时段标识
+            channels: 可选，只处理指定频道（启动补跑时使用）
+            kind: 运行类型；``catch_up`` 表示启动补跑，时段已由补跑逻辑统一认领
+        """
         start_time = datetime.now(timezone.utc)
         logger.info(f"定时任务启动: {start_time}")
         
-        # 检查session文件是否存在
-        if not os.path.exists(self.USER_SESSION_FILE):
-            logger.warning(f"用户会话文件不存在: {self.USER_SESSION_FILE}，跳过本次自动总结任务")
+        # 检查session文件是否存在（回放模式不访问 Telegram）
+        if not replay.is_replaying() and not self._session_slots():
+            logger.warning(f"没有已登录的账号（用户会话文件不存在: {self.USER_SESSION_FILE}），跳过本次自动总结任务")
             logger.info("请管理员使用 /tg_login 命令完成首次登录，之后将正常执行自动总结")
             return
         
+        # 多实例部署：只有认领到本时段的主节点才执行（录制/回放由命令触发，不占用时段）
+        slot = resume_slot or self._current_job_slot()
+        claim_slot = self._leader_lease is not None and replay.current() is None and kind != 'catch_up'
+        if claim_slot:
+            claimed = await asyncio.to_thread(self._leader_lease.claim_slot, slot, bool(resume_slot))
+            if not claimed:
+                logger.info(f"当前实例未认领时段 {slot}（非主节点或已执行），跳过本次自动总结任务")
+                return
+            logger.info(f"当前实例已认领时段 {slot}，开始执行自动总结任务")
+        
         # 统计信息
         total_channels = 0
         empty_channels = 0
         total_push_success = 0
         total_push_fail = 0
+        run_id = await self._record_run_start(kind)
+        run_status = 'failed'
+        run_filter_stats = FilterStats()
+        usage_before = self.token_usage.snapshot()
+        root_span = self.tracer.trace('main_job', run_id, slot=slot).begin()
+        progress = self._start_run_progress(run_id, kind)
+        state = run_state.current()
         
         try:
-            messages_by_channel = await self.fetch_last_week_messages()
+            messages_by_channel = await self.fetch_last_week_messages(channels)
+            
+            if state.fetch_failures:
+                # 未完整抓取的频道保留上次总结时间，下次运行时重新抓取
+                await self._send_admin_alert(
+                    task_name="自动总结定时任务（部分频道抓取不完整）",
+                    error=RuntimeError(f"{len(state.fetch_failures)} 个频道未能完整抓取，本次未总结"),
+                    context={self._extract_channel_name(c): reason for c, reason in state.fetch_failures.items()}
+                )
             
             if not messages_by_channel:
                 logger.info("没有需要处理的频道")
+                run_status = 'success'
                 return
             
-            # 按频道分别生成总结报告
-            for channel, messages in messages_by_channel.items():
-                logger.info(f"开始处理频道 {channel} 的消息")
-                total_channels += 1
+            for channel in messages_by_channel:
+                run_filter_stats.merge(state.filter_stats.get(channel, FilterStats()))
+            
+            if self._topic_clustering_active():
+                # 跨频道话题聚类：所有频道的消息合并为一份按话题组织的摘要
+                sections, completed_channels = await self._build_topic_digest(messages_by_channel)
+                for channel in messages_by_channel:
+                    progress.pushing(channel)
+                for section in sections:
+                    push_result = await self.push_summary_to_targets(section, self.TOPIC_DIGEST_NAME)
+                    total_push_success += push_result['success']
+                    total_push_fail += push_result['fail']
+                for channel, messages in messages_by_channel.items():
+                    total_channels += 1
+                    if not messages:
+                        empty_channels += 1
+                    if channel in completed_channels:
+                        await self._mark_channel_summarized(channel)
+            else:
+                # 按频道分别生成总结报告
+                for channel, messages in messages_by_channel.items():
+                    with tracing.span('summarize.channel', channel=channel, messages=len(messages)):
+                        logger.info(f"开始处理频道 {channel} 的消息")
+                        total_channels += 1
                 
-                # 检查是否有消息
-                if not messages:
-                    logger.info(f"频道 {channel} 本周无新消息，跳过AI分析和推送")
-                    empty_channels += 1
+                        # 检查是否有消息
+                        if not messages:
+                            delta = state.deltas.get(channel)
+                            if delta is not None and delta.changed:
+                                # 没有新消息，但有已总结的消息被删除：只推送说明，不调用AI
+                                logger.info(f"频道 {channel} 本周无新消息，推送已总结消息的删除说明")
+                                progress.pushing(channel)
+                                push_result = await self.push_summary_to_targets(
+                                    f"本周无新动态。{delta.note()}", self._extract_channel_name(channel)
+                                )
+                                total_push_success += push_result['success']
+                                total_push_fail += push_result['fail']
+                            else:
+                                logger.info(f"频道 {channel} 本周无新消息，跳过AI分析和推送")
+                                empty_channels += 1
                     
-                    # 更新该频道的上次总结时间（即使没有消息也要更新）
-                    current_utc_time = datetime.now(timezone.utc)
-                    self.last_summary_times[channel] = current_utc_time
-                    continue
+                            # 更新该频道的上次总结时间（即使没有消息也要更新）
+                            await self._mark_channel_summarized(channel)
+                            continue
                 
-                # 调用AI生成总结
-                summary = await self.analyze_with_ai(messages)
+                        # 调用AI生成总结
+                        progress.summarizing(channel)
+                        summary = await self.analyze_with_ai(messages)
                 
-                # 检查总结是否为空或失败
-                if not summary or summary.startswith("AI 分析失败"):
-                    logger.warning(f"频道 {channel} 总结生成失败或为空，跳过推送")
-                    total_push_fail += len(self.auto_push_groups) + len(self.auto_push_users)
+                        # 检查总结是否为空或失败
+                        if not summary or summary.startswith("AI 分析失败"):
+                            logger.warning(f"频道 {channel} 总结生成失败或为空，跳过推送")
+                            total_push_fail += len(self.auto_push_groups) + len(self.auto_push_users)
                     
-                    # 更新该频道的上次总结时间
-                    current_utc_time = datetime.now(timezone.utc)
-                    self.last_summary_times[channel] = current_utc_time
-                    continue
+                            # 更新该频道的上次总结时间
+                            await self._mark_channel_summarized(channel)
+                            continue
                 
-                # 获取频道名称用于报告标题
-                channel_name = channel.split('/')[-1]
+                        # 获取频道名称用于报告标题
+                        channel_name = self._extract_channel_name(channel)
                 
-                # 记录到日志
-                logger.info(f"频道 {channel} 总结已生成")
+                        # 记录到日志
+                        logger.info(f"频道 {channel} 总结已生成")
+                        await self._record_summary(channel, summary)
                 
-                # 自动推送到配置的目标
-                push_result = await self.push_summary_to_targets(summary, channel_name)
-                total_push_success += push_result['success']
-                total_push_fail += push_result['fail']
+                        # 自动推送到配置的目标
+                        progress.pushing(channel)
+                        push_result = await self.push_summary_to_targets(
+                            summary + self._sampling_note(channel) + self._delta_note(channel), channel_name
+                        )
+                        total_push_success += push_result['success']
+                        total_push_fail += push_result['fail']
                 
-                # 更新该频道的上次总结时间
-                current_utc_time = datetime.now(timezone.utc)
-                self.last_summary_times[channel] = current_utc_time
-            
-            # 保存所有频道的上次总结时间
-            self.save_last_summary_times(self.last_summary_times)
-            logger.info(f"已更新各频道的上次总结时间")
+                        # 更新该频道的上次总结时间
+                        await self._mark_channel_summarized(channel)
             
             end_time = datetime.now(timezone.utc)
             processing_time = (end_time - start_time).total_seconds()
@@ -1257,11 +2825,23 @@ class TelegramSummaryPlugin(Star):
             logger.info(f"【自动推送】总结完成。处理频道: {total_channels} 个，"
                        f"无消息频道: {empty_channels} 个，"
                        f"已推送至 {total_push_success} 个目标（群组和用户）。失败: {total_push_fail}。")
+            if run_filter_stats.total_messages:
+                logger.info(f"【消息过滤】本次共移除 {run_filter_stats.total_messages} 条消息"
+                           f"（约 {run_filter_stats.total_tokens} tokens）：\n{run_filter_stats.format()}")
+            logger.info(f"【Token 用量】{self.token_usage.since(usage_before).format()}")
             logger.info(f"定时任务完成: {end_time}，总处理时间: {processing_time:.2f}秒")
+            await self._roll_cold_storage()
+            run_status = 'success'
+        except asyncio.CancelledError:
+            logger.warning(f"定时任务 {run_id} 已被取消，已完成的频道进度已保存")
+            run_status = 'cancelled'
+            root_span.set(cancelled=True)
+            raise
         except Exception as e:
             end_time = datetime.now(timezone.utc)
             processing_time = (end_time - start_time).total_seconds()
             logger.error(f"定时任务执行失败: {type(e).__name__}: {e}，开始时间: {start_time}，结束时间: {end_time}，处理时间: {processing_time:.2f}秒")
+            root_span.fail(e)
             
             # 发送管理员告警
             await self._send_admin_alert(
@@ -1277,6 +2857,24 @@ class TelegramSummaryPlugin(Star):
                     "推送失败": total_push_fail
                 }
             )
+        finally:
+            await self._record_run_finish(run_id, run_status, {
+                "slot": slot,
+                "channels": total_channels,
+                "empty_channels": empty_channels,
+                "push_success": total_push_success,
+                "push_fail": total_push_fail,
+                "incomplete": dict(state.fetch_failures),
+                "token_usage": self.token_usage.since(usage_before).to_dict(),
+                "filtered": run_filter_stats.to_dict(),
+            })
+            if claim_slot:
+                await asyncio.to_thread(self._leader_lease.finish_slot, slot)
+            root_span.set(channels=total_channels, empty_channels=empty_channels,
+                          push_success=total_push_success, push_fail=total_push_fail)
+            root_span.end()
+            self._finish_run_progress(progress)
+            await self._flush_traces()
     
     # ========== 命令处理 ==========
     
@@ -1287,9 +2885,24 @@ class TelegramSummaryPlugin(Star):
         sender_id = event.get_sender_id()
         command = event.message_str
         logger.info(f"收到命令: {command}，发送者: {sender_id}")
+        await self._ensure_initialized()
+        
+        # /summary cancel [运行ID...]：取消运行中的总结任务
+        parts = command.split()
+        if len(parts) > 1 and parts[1].lower() == 'cancel':
+            cancelled = await self._cancel_runs(parts[2:])
+            if not cancelled:
+                yield event.plain_result("当前没有可取消的运行中任务（可用 /tgstatus 查看）")
+                return
+            lock_state = "已断开" if not self._session_pool.users else f"仍由 {self._session_pool.users} 个任务使用"
+            yield event.plain_result(
+                f"🛑 已取消 {len(cancelled)} 个任务: {', '.join(cancelled)}\n"
+                f"已完成的频道进度已保存，未完成的频道保留上次总结时间。共享 Telegram Client {lock_state}。"
+            )
+            return
         
         # 检查session文件是否存在
-        if not os.path.exists(self.USER_SESSION_FILE):
+        if not self._session_slots():
             logger.info(f"用户会话文件不存在: {self.USER_SESSION_FILE}，自动进入登录流程")
             yield event.plain_result(
                 "⚠️ **未检测到登录信息**\n\n"
@@ -1305,66 +2918,141 @@ class TelegramSummaryPlugin(Star):
         yield event.plain_result("正在为您生成本周总结...")
         logger.info(f"开始执行 {command} 命令")
         
+        run_id = await self._record_run_start('manual')
+        run_status = 'failed'
+        summarized_channels = 0
+        usage_before = self.token_usage.snapshot()
+        root_span = self.tracer.trace('manual_summary', run_id, command=command).begin()
+        progress = self._start_run_progress(run_id, 'manual')
+        state = run_state.current()
+        
         # 解析命令参数，支持指定频道
         try:
-            # 分割命令和参数
+            # 分割命令和参数：以 -- 开头的为选项，其余为频道
             parts = command.split()
-            if len(parts) > 1:
-                # 有指定频道参数
-                specified_channels = []
-                for part in parts[1:]:
-                    if part.startswith('http'):
-                        # 完整的频道URL
-                        specified_channels.append(part)
-                    else:
-                        # 频道名称
-                        specified_channels.append(part)
-                
-                # 验证指定的频道是否在配置中
+            flags = {part.lower() for part in parts[1:] if part.startswith('--')}
+            specified_channels = [part for part in parts[1:] if not part.startswith('--')]
+            
+            # --month / --quarter：基于已保存的周报生成月报/季报，不重新抓取
+            report_kind = 'monthly' if '--month' in flags else 'quarterly' if '--quarter' in flags else None
+            
+            if specified_channels:
+                # 验证指定的频道是否在配置中（注册表按规范键常数时间查找）
                 valid_channels = []
                 for channel in specified_channels:
-                    # 使用统一的 _match_channel 方法进行智能匹配
-                    matched = False
-                    for config_channel in self.channels:
-                        if self._match_channel(channel, config_channel):
-                            valid_channels.append(config_channel)
-                            matched = True
-                            break
-                    
-                    if not matched:
+                    entry = self.channel_registry.lookup(channel)
+                    if entry is None:
                         yield event.plain_result(f"频道 {channel} 不在配置列表中，将跳过")
+                        continue
+                    if entry.source not in valid_channels:
+                        valid_channels.append(entry.source)
                 
                 if not valid_channels:
                     yield event.plain_result("没有找到有效的指定频道")
                     return
-                
+            else:
+                valid_channels = None
+            
+            if report_kind:
+                reports = await self.build_periodic_report(report_kind, valid_channels)
+                kind_label = self.PERIODIC_REPORT_LABELS[report_kind]
+                if not reports:
+                    _, _, label = self._report_period(report_kind)
+                    yield event.plain_result(f"{label}没有已保存的周报，无法生成{kind_label}")
+                for channel, label, report in reports:
+                    yield event.plain_result(f"📚 {self._extract_channel_name(channel)} {label}{kind_label}\n\n{report}")
+                    summarized_channels += 1
+                run_status = 'success'
+                return
+            
+            # 有效期内抓取过的频道复用抓取结果（调整提示词后重新总结只需调用 AI），--refresh 强制重新抓取
+            use_cache = '--refresh' not in flags
+            if use_cache:
+                cached_ages = {
+                    channel: entry.age for channel in (valid_channels or self.channels)
+                    if (entry := self.fetch_cache.get(channel)) is not None
+                }
+                if cached_ages:
+                    oldest = max(cached_ages.values())
+                    yield event.plain_result(
+                        f"♻️ {len(cached_ages)} 个频道使用 {max(1, round(oldest / 60))} 分钟内的抓取结果，"
+                        "如需重新抓取请加 --refresh"
+                    )
+            
+            if valid_channels:
                 # 执行总结任务，只处理指定的有效频道
-                messages_by_channel = await self.fetch_last_week_messages(valid_channels)
+                messages_by_channel = await self.fetch_last_week_messages(valid_channels, use_cache=use_cache)
             else:
                 # 没有指定频道，处理所有配置的频道
-                messages_by_channel = await self.fetch_last_week_messages()
+                messages_by_channel = await self.fetch_last_week_messages(use_cache=use_cache)
+            
+            failures = state.fetch_failures
+            if failures:
+                failure_lines = "\n".join(
+                    f"- {self._extract_channel_name(c)}: {reason}" for c, reason in failures.items()
+                )
+                yield event.plain_result(f"⚠️ 以下频道未能完整抓取，本次跳过（上次总结时间保持不变）：\n{failure_lines}")
+            
+            # --topics：跨频道话题聚类，输出一份合并摘要
+            if '--topics' in flags and self._topic_clustering_active(force=True):
+                sections, completed_channels = await self._build_topic_digest(messages_by_channel)
+                if not sections:
+                    yield event.plain_result("本周无新动态。")
+                for section in sections:
+                    yield event.plain_result(f"✈️ {self.TOPIC_DIGEST_NAME}\n\n{section}")
+                for channel in completed_channels:
+                    await self._mark_channel_summarized(channel)
+                    summarized_channels += 1
+                messages_by_channel = {}
             
             # 按频道分别生成和发送总结报告
             for channel, messages in messages_by_channel.items():
-                logger.info(f"开始处理频道 {channel} 的消息")
-                summary = await self.analyze_with_ai(messages)
-                # 获取频道名称用于报告标题
-                channel_name = channel.split('/')[-1]
-                yield event.plain_result(f"✈️ {channel_name} 频道周报总结\n\n{summary}")
+                with tracing.span('summarize.channel', channel=channel, messages=len(messages)):
+                    logger.info(f"开始处理频道 {channel} 的消息")
+                    progress.summarizing(channel)
+                    summary = await self.analyze_with_ai(messages)
+                    if not summary or summary.startswith("AI 分析失败"):
+                        summary = summary or "AI 分析失败：AI 未返回内容"
+                    elif messages:
+                        await self._record_summary(channel, summary)
+                    # 获取频道名称用于报告标题
+                    channel_name = self._extract_channel_name(channel)
+                    report = f"✈️ {channel_name} 频道周报总结\n\n{summary}"
+                    channel_filter_stats = state.filter_stats.get(channel)
+                    if channel_filter_stats and channel_filter_stats.total_messages:
+                        report += (f"\n\n（过滤规则移除 {channel_filter_stats.total_messages} 条消息，"
+                                   f"约 {channel_filter_stats.total_tokens} tokens）")
+                    kept, total = state.ranking_stats.get(channel, (0, 0))
+                    if kept < total:
+                        report += f"\n（按互动重要度选取 {kept}/{total} 条消息）"
+                    report += self._sampling_note(channel) + self._delta_note(channel)
+                    yield event.plain_result(report)
                 
-                # 更新该频道的上次总结时间
-                current_utc_time = datetime.now(timezone.utc)
-                self.last_summary_times[channel] = current_utc_time
-                logger.info(f"已更新频道 {channel} 的上次总结时间: {current_utc_time}")
-            
-            # 保存所有频道的上次总结时间
-            self.save_last_summary_times(self.last_summary_times)
-            logger.info(f"已保存各频道的上次总结时间")
+                    # 更新该频道的上次总结时间
+                    await self._mark_channel_summarized(channel)
+                    summarized_channels += 1
             
             logger.info(f"命令 {command} 执行成功")
+            run_status = 'success'
+        except asyncio.CancelledError:
+            logger.warning(f"命令 {command}（运行 {run_id}）已被取消，已完成的频道进度已保存")
+            run_status = 'cancelled'
+            root_span.set(cancelled=True)
+            raise
         except Exception as e:
             logger.error(f"执行命令 {command} 时出错: {type(e).__name__}: {e}", exc_info=True)
+            root_span.fail(e)
             yield event.plain_result("❌ 生成总结时出错，请检查日志获取详细信息")
+        finally:
+            await self._record_run_finish(run_id, run_status, {
+                "command": command,
+                "channels": summarized_channels,
+                "token_usage": self.token_usage.since(usage_before).to_dict(),
+            })
+            root_span.set(channels=summarized_channels)
+            root_span.end()
+            self._finish_run_progress(progress)
+            await self._flush_traces()
     
     @filter.permission_type(filter.PermissionType.ADMIN)
     @filter.command("showprompt")
@@ -1386,6 +3074,7 @@ class TelegramSummaryPlugin(Star):
         sender_id = event.get_sender_id()
         command = event.message_str
         logger.info(f"收到命令: {command}，发送者: {sender_id}")
+        await self._ensure_initialized()
         
         # 使用锁保护共享状态
         async with self._setting_prompt_lock:
@@ -1413,8 +3102,8 @@ class TelegramSummaryPlugin(Star):
                 # 更新提示词
                 self.current_prompt = new_prompt
                 
-                # 保存到文件
-                self.save_prompt(new_prompt)
+                # 保存到状态数据库
+                await asyncio.to_thread(self.save_prompt, new_prompt)
                 
                 # 从正在设置提示词的集合中移除用户
                 if sender_id in self.setting_prompt_users:
@@ -1476,13 +3165,16 @@ class TelegramSummaryPlugin(Star):
                 yield event.plain_result("请提供有效的频道URL")
                 return
             
-            # 检查频道是否已存在
-            if channel_url in self.channels:
-                yield event.plain_result(f"频道 {channel_url} 已存在于列表中")
+            # 添加频道到注册表（任意写法指向已有频道时视为已存在）
+            existing = self.channel_registry.lookup(channel_url)
+            if existing is not None:
+                yield event.plain_result(f"频道 {channel_url} 已存在于列表中（{existing.source}）")
                 return
             
-            # 添加频道到列表
-            self.channels.append(channel_url)
+            if self.channel_registry.add(channel_url) is None:
+                yield event.plain_result("请提供有效的频道URL")
+                return
+            self.channels = self.channel_registry.sources
             
             # 保存到AstrBot配置系统
             self.config['channels'] = self.channels
@@ -1514,13 +3206,13 @@ class TelegramSummaryPlugin(Star):
                 yield event.plain_result("请提供有效的频道URL")
                 return
             
-            # 检查频道是否存在
-            if channel_url not in self.channels:
+            # 从注册表中删除频道（支持任意写法）
+            removed = self.channel_registry.remove(channel_url)
+            if removed is None:
                 yield event.plain_result(f"频道 {channel_url} 不在列表中")
                 return
-            
-            # 从列表中删除频道
-            self.channels.remove(channel_url)
+            self.channels = self.channel_registry.sources
+            channel_url = removed.source
             
             # 保存到AstrBot配置系统
             self.config['channels'] = self.channels
@@ -1543,33 +3235,460 @@ class TelegramSummaryPlugin(Star):
         sender_id = event.get_sender_id()
         command = event.message_str
         logger.info(f"收到命令: {command}，发送者: {sender_id}")
+        await self._ensure_initialized()
         
         try:
-            # 删除上次总结时间文件
-            if os.path.exists(self.LAST_SUMMARY_FILE):
-                os.remove(self.LAST_SUMMARY_FILE)
-                logger.info(f"已删除上次总结时间文件: {self.LAST_SUMMARY_FILE}")
+            # 清除状态数据库中的上次总结时间与消息游标
+            await asyncio.to_thread(self.state_store.clear_last_summary_times)
+            logger.info("已清除状态数据库中的上次总结时间记录")
             
             # 重置内存中的上次总结时间
             self.last_summary_times = {}
-            self.save_last_summary_times(self.last_summary_times)
+            for state in self._run_states.values():
+                state.discard_pending()
+            # 缓存的抓取结果基于旧的总结时间，不能再复用
+            self.fetch_cache.clear()
             
             yield event.plain_result("所有频道的上次总结时间记录已成功清除\n\n下次总结将使用默认时间范围（过去7天）")
         except Exception as e:
             logger.error(f"清除上次总结时间时出错: {type(e).__name__}: {e}", exc_info=True)
-            yield event.plain_result("❌ 清除记录失败，请检查文件权限")
+            yield event.plain_result("❌ 清除记录失败，请检查状态数据库")
+    
+    def _start_backfill(self):
+        """在后台启动（或继续）历史回填任务"""
+        self._backfill_task = asyncio.create_task(self._run_backfill())
+    
+    async def _save_backfill_state(self):
+        await asyncio.to_thread(self.state_store.set_value, BackfillState.STATE_KEY, self.backfill_state.to_dict())
+    
+    async def _run_backfill(self):
+        """历史回填后台任务
+        
+        使用 takeout 会话批量导入频道历史消息到本地归档。回填使用 session 文件的
+        独立副本，只在复制时短暂持有 session 独占锁，定时总结和手动总结可以同时运行。
+        每批消息写入归档后保存游标，中断后从游标处继续。
+        """
+        telethon = _lazy_import('telethon')
+        errors = _lazy_import('telethon.errors')
+        state = self.backfill_state
+        
+        # 在独占锁内复制 session 文件，避免复制到正在写入的文件
+        async with self._session_pool.lock().exclusive():
+            await asyncio.to_thread(self._copy_backfill_session)
+        
+        try:
+            async with telethon.TelegramClient(self.BACKFILL_SESSION_FILE, int(self.api_id), self.api_hash) as client:
+                async with client.takeout(finalize=True, channels=True, megagroups=True) as takeout:
+                    for progress in state.pending:
+                        await self._backfill_channel(takeout, progress, errors)
+            logger.info(f"历史回填完成，共导入 {state.total_imported} 条消息")
+            await self._notify_backfill(f"✅ 历史回填完成\n\n{state.format(self._extract_channel_name)}")
+            await self._roll_cold_storage()
+        except asyncio.CancelledError:
+            await self._save_backfill_state()
+            raise
+        except errors.TakeoutInitDelayError as e:
+            logger.warning(f"takeout 会话需要在 Telegram 中确认，{e.seconds} 秒后可重试")
+            await self._notify_backfill(
+                "⚠️ 历史回填需要先在 Telegram 官方客户端中确认数据导出请求，"
+                f"请确认后（或约 {e.seconds} 秒后）重新执行 /tgbackfill resume"
+            )
+        except Exception as e:
+            logger.error(f"历史回填任务失败: {type(e).__name__}: {e}", exc_info=True)
+            await self._send_admin_alert(task_name="历史回填", error=e, context={"已导入": state.total_imported})
+        finally:
+            await self._save_backfill_state()
+            await asyncio.to_thread(self._remove_backfill_session)
+    
+    def _copy_backfill_session(self):
+        shutil.copyfile(self.USER_SESSION_FILE, self.BACKFILL_SESSION_FILE)
+        os.chmod(self.BACKFILL_SESSION_FILE, 0o600)
+    
+    def _remove_backfill_session(self):
+        self._remove_session_file(self.BACKFILL_SESSION_FILE)
+    
+    @staticmethod
+    def _remove_session_file(session_file: str):
+        """删除 session 文件及其 SQLite 日志文件"""
+        for suffix in ('', '-journal'):
+            try:
+                os.remove(session_file + suffix)
+            except FileNotFoundError:
+                pass
+    
+    async def _backfill_channel(self, takeout, progress, errors):
+        """回填单个频道：从游标处按时间顺序分页导入，遇到 FloodWait 等待后继续
+        
+        Args:
+            takeout: takeout 会话客户端
+            progress: 频道进度（ChannelProgress）
+            errors: telethon.errors 模块
+        """
+        channel = progress.channel
+        link_prefix = self._channel_link_prefix(channel)
+        logger.info(f"开始回填频道 {channel}（游标: {progress.cursor}）")
+        
+        while not progress.done:
+            kwargs = {'reverse': True, 'wait_time': self.BACKFILL_WAIT_TIME}
+            if progress.cursor:
+                kwargs['min_id'] = progress.cursor
+            elif self.backfill_state.since:
+                kwargs['offset_date'] = self.backfill_state.since
+            
+            # 游标只在批次写入归档后推进；中断时已抓取但未写入的消息会在继续时重新抓取
+            batch, last_seen = [], None
+            try:
+                async for message in takeout.iter_messages(channel, **kwargs):
+                    if message.text:
+                        batch.append((message.id, message.date, message.text, f"{link_prefix}{message.id}"))
+                    last_seen = message.id
+                    if len(batch) >= self.BACKFILL_BATCH_SIZE:
+                        await self._commit_backfill_batch(progress, batch, last_seen)
+                        batch = []
+                await self._commit_backfill_batch(progress, batch, last_seen)
+                progress.done = True
+            except errors.FloodWaitError as e:
+                # 先保存已抓取的部分，等待结束后从游标处继续
+                await self._commit_backfill_batch(progress, batch, last_seen)
+                logger.warning(f"回填频道 {channel} 触发 FloodWait，等待 {e.seconds} 秒后继续")
+                await asyncio.sleep(e.seconds + 1)
+            except (ValueError, errors.RPCError) as e:
+                # 频道不存在或无权访问：记录错误，继续下一个频道
+                await self._commit_backfill_batch(progress, batch, last_seen)
+                progress.error = f"{type(e).__name__}: {e}"
+                progress.done = True
+                logger.error(f"回填频道 {channel} 失败: {progress.error}")
+        
+        await self._save_backfill_state()
+        logger.info(f"频道 {channel} 回填结束，共导入 {progress.imported} 条消息")
+    
+    async def _commit_backfill_batch(self, progress, batch: list, last_seen: int):
+        """写入一批回填消息，写入成功后将游标推进到 ``last_seen`` 并保存
+        
+        Args:
+            progress: 频道进度（ChannelProgress）
+            batch: (message_id, date, text, link) 元组列表
+            last_seen: 本批次覆盖到的最后一条消息ID（含无文本的消息）；None 表示没有抓取到消息
+        """
+        if batch:
+            await asyncio.to_thread(self.message_archive.add_messages, progress.channel, batch)
+            progress.imported += len(batch)
+            progress.last_date = batch[-1][1].isoformat()
+            logger.debug(f"频道 {progress.channel} 已回填 {progress.imported} 条消息（{self.backfill_state.rate:.1f} 条/秒）")
+        if last_seen is not None:
+            progress.cursor = last_seen
+        await self._save_backfill_state()
+    
+    async def _notify_backfill(self, text: str):
+        """向发起回填的会话发送通知"""
+        origin = self.backfill_state.origin if self.backfill_state else None
+        if not origin:
+            return
+        try:
+            from astrbot.api.event import MessageChain
+            await self.context.send_message(origin, MessageChain().message(text))
+        except Exception as e:
+            logger.error(f"发送回填通知失败: {type(e).__name__}: {e}")
+    
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("tgbackfill")
+    async def handle_backfill(self, event: AstrMessageEvent):
+        """批量回填频道历史消息到本地归档（后台执行，可续传）
+        
+        用法：
+        - /tgbackfill [频道...] [时间范围]：开始回填，默认全部频道、全部历史
+        - /tgbackfill status：查看进度
+        - /tgbackfill stop：暂停（进度已保存）
+        - /tgbackfill resume：继续未完成的任务
+        """
+        sender_id = event.get_sender_id()
+        command = event.message_str
+        logger.info(f"收到命令: {command}，发送者: {sender_id}")
+        await self._ensure_initialized()
+        
+        if not self.archive_enabled:
+            yield event.plain_result("消息归档未启用，请在插件配置中开启 archive_enabled")
+            return
+        
+        args = command.split()[1:]
+        action = args[0].lower() if args else ''
+        running = self._backfill_task is not None and not self._backfill_task.done()
+        
+        if action == 'status':
+            if self.backfill_state is None:
+                yield event.plain_result("当前没有历史回填任务")
+            else:
+                title = "⏳ 历史回填进行中" if running else "📦 历史回填任务（未运行）"
+                yield event.plain_result(f"{title}\n\n{self.backfill_state.format(self._extract_channel_name)}")
+            return
+        
+        if action == 'stop':
+            if not running:
+                yield event.plain_result("当前没有正在运行的历史回填任务")
+                return
+            self._backfill_task.cancel()
+            yield event.plain_result("已暂停历史回填，进度已保存，可使用 /tgbackfill resume 继续")
+            return
+        
+        if running:
+            yield event.plain_result("历史回填任务正在运行，可使用 /tgbackfill status 查看进度")
+            return
+        
+        if not os.path.exists(self.USER_SESSION_FILE):
+            yield event.plain_result("未检测到登录信息，请先使用 /tg_login 登录")
+            return
+        
+        if action == 'resume':
+            if self.backfill_state is None or self.backfill_state.finished:
+                yield event.plain_result("没有未完成的历史回填任务")
+                return
+            self.backfill_state.origin = event.unified_msg_origin
+        else:
+            channels, since, channel_specified = [], None, False
+            for part in args:
+                time_range = self._parse_search_range(part)
+                if time_range is not None:
+                    since = time_range[0]
+                    continue
+                channel_specified = True
+                entry = self.channel_registry.lookup(part)
+                if entry is None:
+                    yield event.plain_result(f"频道 {part} 不在配置列表中，将跳过")
+                elif entry.source not in channels:
+                    channels.append(entry.source)
+            if not channel_specified:
+                channels = list(self.channels)
+            if not channels:
+                yield event.plain_result("没有找到有效的频道")
+                return
+            self.backfill_state = BackfillState(channels, since, event.unified_msg_origin)
+            await self._save_backfill_state()
+        
+        self._start_backfill()
+        pending = len(self.backfill_state.pending)
+        yield event.plain_result(
+            f"📦 已在后台开始历史回填（{pending} 个频道），定时总结不受影响\n"
+            "使用 /tgbackfill status 查看进度，完成后会通知您"
+        )
+    
+    def _parse_search_range(self, token: str):
+        """解析检索时间范围参数
+        
+        支持的格式：
+        - 相对范围：``7d``（天）、``4w``（周）、``3m``（月，按30天）、``1y``（年，按365天）
+        - 单日/单月：``2026-01-15``、``2026-01``
+        - 区间：``2026-01-01~2026-02-01``
+        
+        Args:
+            token: 命令参数
+        
+        Returns:
+            tuple | None: (since, until)，不是时间范围参数时返回 None
+        """
+        unit_days = {'d': 1, 'w': 7, 'm': 30, 'y': 365}
+        token = token.strip().lower()
+        if len(token) >= 2 and token[:-1].isdigit() and token[-1] in unit_days:
+            since = datetime.now(timezone.utc) - timedelta(days=int(token[:-1]) * unit_days[token[-1]])
+            return since, None
+        
+        def parse_day(value: str):
+            for fmt, span in (('%Y-%m-%d', 'day'), ('%Y-%m', 'month')):
+                try:
+                    start = datetime.strptime(value, fmt).replace(tzinfo=timezone.utc)
+                except ValueError:
+                    continue
+                if span == 'day':
+                    return start, start + timedelta(days=1)
+                next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+                return start, next_month
+            return None
+        
+        if '~' in token:
+            left, right = token.split('~', 1)
+            left_range, right_range = parse_day(left), parse_day(right)
+            if left_range and right_range:
+                return left_range[0], right_range[1]
+            return None
+        return parse_day(token)
+    
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("tgsearch")
+    async def handle_search(self, event: AstrMessageEvent):
+        """检索已归档的频道消息与总结（离线，不调用 Telegram 和 AI）"""
+        sender_id = event.get_sender_id()
+        command = event.message_str
+        logger.info(f"收到命令: {command}，发送者: {sender_id}")
+        await self._ensure_initialized()
+        
+        if not self.archive_enabled:
+            yield event.plain_result("消息归档未启用，请在插件配置中开启 archive_enabled")
+            return
+        
+        # 解析参数：已配置的频道 -> 频道过滤；时间范围 -> 时间过滤；其余为关键词
+        keywords, channel, since, until = [], None, None, None
+        for part in command.split()[1:]:
+            entry = self.channel_registry.lookup(part)
+            if entry is not None and channel is None:
+                channel = entry.source
+                continue
+            time_range = self._parse_search_range(part)
+            if time_range is not None:
+                since, until = time_range
+                continue
+            keywords.append(part)
+        
+        if not keywords:
+            yield event.plain_result(
+                "请提供检索关键词，例如：\n"
+                "/tgsearch 关键词\n"
+                "/tgsearch 关键词 频道名 30d\n"
+                "/tgsearch 关键词 2026-01-01~2026-02-01"
+            )
+            return
+        
+        try:
+            search_start = time.perf_counter()
+            hits = await asyncio.to_thread(self.message_archive.search, keywords, channel, since, until, self.SEARCH_RESULT_LIMIT)
+            if len(hits) < self.SEARCH_RESULT_LIMIT:
+                # 归档库结果不足时继续在冷存储中按时间倒序检索更早的消息
+                hits += await asyncio.to_thread(
+                    self.cold_storage.search, keywords, channel, since, until, self.SEARCH_RESULT_LIMIT - len(hits)
+                )
+            elapsed_ms = (time.perf_counter() - search_start) * 1000
+            logger.info(f"检索 {keywords} 完成，命中 {len(hits)} 条，耗时 {elapsed_ms:.1f}ms")
+            
+            if not hits:
+                yield event.plain_result(f"🔍 未找到与「{' '.join(keywords)}」相关的归档内容")
+                return
+            
+            result_msg = f"🔍 「{' '.join(keywords)}」检索结果（{len(hits)} 条，{elapsed_ms:.0f}ms）：\n\n"
+            for i, hit in enumerate(hits, 1):
+                kind_label = "总结" if hit.kind == 'summary' else "消息"
+                result_msg += f"{i}. [{kind_label}] {self._extract_channel_name(hit.channel)} {hit.date[:10]}\n"
+                result_msg += f"   {hit.snippet}\n"
+                if hit.link:
+                    result_msg += f"   {hit.link}\n"
+            yield event.plain_result(result_msg)
+        except Exception as e:
+            logger.error(f"检索归档时出错: {type(e).__name__}: {e}", exc_info=True)
+            yield event.plain_result("❌ 检索失败，请检查日志获取详细信息")
+    
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("tgstatus")
+    async def handle_status(self, event: AstrMessageEvent):
+        """查看运行中任务的实时进度"""
+        logger.info(f"收到命令: {event.message_str}，发送者: {event.get_sender_id()}")
+        
+        sections = [
+            f"⏳ 运行中\n{progress.format(self._extract_channel_name)}"
+            for progress in list(self.active_runs.values())
+        ]
+        if not sections:
+            if self.last_run_progress is not None:
+                sections.append(f"当前没有运行中的任务。最近一次运行：\n{self.last_run_progress.format(self._extract_channel_name)}")
+            else:
+                sections.append("当前没有运行中的任务")
+        if self._backfill_task is not None and not self._backfill_task.done() and self.backfill_state:
+            sections.append(f"📥 历史回填进行中\n{self.backfill_state.format(self._extract_channel_name)}")
+        slots = await asyncio.to_thread(self._session_slots)
+        sections.append(f"👤 已登录账号 {len(slots)} 个: {', '.join(slots) or '无'}")
+        yield event.plain_result("\n\n".join(sections))
+    
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("tgreplay")
+    async def handle_replay(self, event: AstrMessageEvent):
+        """录制与离线回放定时任务
+        
+        用法：
+        - /tgreplay record：立即执行一次完整的定时任务（真实抓取与推送），并录制为夹具
+        - /tgreplay list：列出已录制的夹具
+        - /tgreplay <夹具名>：离线回放夹具，对比耗时与输出（不访问 Telegram、不调用 AI、不推送）
+        """
+        sender_id = event.get_sender_id()
+        command = event.message_str
+        logger.info(f"收到命令: {command}，发送者: {sender_id}")
+        await self._ensure_initialized()
+        
+        args = command.split()[1:]
+        action = args[0] if args else 'list'
+        
+        if action == 'list':
+            fixtures = await asyncio.to_thread(
+                lambda: sorted(p.stem for p in self.FIXTURES_DIR.glob("run-*.json")) if self.FIXTURES_DIR.exists() else []
+            )
+            if not fixtures:
+                yield event.plain_result("还没有录制的夹具，使用 /tgreplay record 录制一次运行")
+            else:
+                yield event.plain_result("📼 已录制的夹具：\n" + "\n".join(f"- {name}" for name in fixtures))
+            return
+        
+        if action == 'record':
+            name = f"run-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            yield event.plain_result(f"⏺️ 开始录制完整定时任务（将真实推送）：{name}")
+            recorder = RunRecorder()
+            with recorder:
+                await self.main_job()
+            await asyncio.to_thread(recorder.save, self.FIXTURES_DIR / f"{name}.json")
+            yield event.plain_result(
+                f"✅ 录制完成：{name}\n"
+                f"频道 {len(recorder.channels)} 个，AI 调用 {len(recorder.llm_calls)} 次，"
+                f"推送 {len(recorder.pushes)} 条，耗时 {recorder.timings.get('total', 0):.1f}秒"
+            )
+            return
+        
+        fixture_path = self.FIXTURES_DIR / f"{Path(action).stem}.json"
+        try:
+            session = await asyncio.to_thread(ReplaySession.load, fixture_path)
+        except FileNotFoundError:
+            yield event.plain_result(f"未找到夹具 {action}，使用 /tgreplay list 查看")
+            return
+        except ValueError as e:
+            yield event.plain_result(f"❌ 夹具无法回放: {e}")
+            return
+        
+        with session:
+            await self.main_job()
+        report = session.report()
+        report_path = self.FIXTURES_DIR / f"{fixture_path.stem}.replay-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        await asyncio.to_thread(
+            report_path.write_text, json.dumps({**report, "pushes_text": session.pushes}, ensure_ascii=False, indent=1), "utf-8"
+        )
+        
+        timing_lines = []
+        for stage, values in report['timings'].items():
+            recorded = values['recorded']
+            recorded_text = f"{recorded:.2f}秒" if recorded is not None else "-"
+            timing_lines.append(f"- {stage}: 录制 {recorded_text} → 回放 {values['replayed']:.2f}秒")
+        yield event.plain_result(
+            f"▶️ 回放完成：{fixture_path.stem}（录制于 {report['recorded_at']}）\n\n"
+            f"AI 调用: 录制 {report['llm_calls']['recorded']} 次 → 回放 {report['llm_calls']['replayed']} 次，"
+            f"提示词变化 {report['changed_prompts']} 次\n"
+            f"推送: 录制 {report['pushes']['recorded']} 条 → 回放 {report['pushes']['replayed']} 条，"
+            f"{'内容一致' if report['pushes']['identical'] else '内容有变化'}\n"
+            f"耗时:\n" + "\n".join(timing_lines) + f"\n\n完整报告: {report_path.name}"
+        )
     
     @filter.permission_type(filter.PermissionType.ADMIN)
     @filter.command("tg_login")
     async def handle_tg_login(self, event: AstrMessageEvent):
         """开始Telegram交互式登录流程
         
-        使用状态机模式实现多步交互。
+        使用状态机模式实现多步交互。``/tg_login <槽位名>`` 登录额外的账号，
+        抓取负载分摊到所有已登录账号。
         """
         from astrbot.core.utils.session_waiter import session_waiter, SessionController
         
         sender_id = event.get_sender_id()
-        logger.info(f"用户 {sender_id} 请求进行Telegram登录")
+        
+        # 账号槽位：仅 /tg_login 命令本身可指定（/summary 未登录时也会进入此流程）
+        parts = event.message_str.split()
+        slot = SessionPool.DEFAULT_SLOT
+        if len(parts) > 1 and parts[0].lstrip('/') == 'tg_login':
+            slot = parts[1]
+            if not self.SESSION_SLOT_PATTERN.match(slot):
+                yield event.plain_result("账号槽位名只能包含字母、数字、下划线和连字符（最多 32 个字符）")
+                return
+        logger.info(f"用户 {sender_id} 请求进行Telegram登录，账号槽位: {slot}")
         
         # 使用锁保护登录状态
         async with self._login_states_lock:
@@ -1583,12 +3702,15 @@ class TelegramSummaryPlugin(Star):
                 'stage': 'phone',
                 'phone': None,
                 'client': None,
-                'session_file': None
+                'session_file': None,
+                'slot': slot
             }
         
         # 提示用户输入手机号
+        slot_hint = "" if slot == SessionPool.DEFAULT_SLOT else f"账号槽位：`{slot}`\n"
         yield event.plain_result(
             "🚀 **开始 Telegram 登录流程**\n\n"
+            f"{slot_hint}"
             "请输入您的手机号（必须带国家代码）\n"
             "示例：`+8613812345678`\n\n"
             "⏱️ 会话将在 120 秒后超时"
@@ -1639,19 +3761,13 @@ class TelegramSummaryPlugin(Star):
         try:
             await tg_login_session(event)
         except TimeoutError:
-            # 清理登录状态
-            if sender_id in self.login_states and self.login_states[sender_id].get('client'):
-                await self.login_states[sender_id]['client'].disconnect()
-            if sender_id in self.login_states:
-                del self.login_states[sender_id]
+            # 清理登录状态（同时释放 session 独占锁）
+            await self._cleanup_login_session(sender_id)
             yield event.plain_result("⏱️ 登录会话已超时，请使用 `/tg_login` 重新开始")
         except Exception as e:
             logger.error(f"tg_login会话异常: {type(e).__name__}: {e}", exc_info=True)
-            # 清理登录状态
-            if sender_id in self.login_states and self.login_states[sender_id].get('client'):
-                await self.login_states[sender_id]['client'].disconnect()
-            if sender_id in self.login_states:
-                del self.login_states[sender_id]
+            # 清理登录状态（同时释放 session 独占锁）
+            await self._cleanup_login_session(sender_id)
             yield event.plain_result("❌ 登录过程出错，请检查网络连接和账号信息")
         finally:
             event.stop_event()
@@ -1661,3 +3777,14 @@ class TelegramSummaryPlugin(Star):
         if hasattr(self, 'scheduler'):
             self.scheduler.shutdown()
             logger.info("调度器已停止")
+        if self._backfill_task is not None and not self._backfill_task.done():
+            self._backfill_task.cancel()
+            logger.info("历史回填任务已暂停，下次启动时继续")
+        if self._catch_up_task is not None and not self._catch_up_task.done():
+            self._catch_up_task.cancel()
+        if getattr(self, '_leader_lease', None):
+            await asyncio.to_thread(self._leader_lease.release)
+        if hasattr(self, 'state_store'):
+            self.state_store.close()
+        if hasattr(self, 'message_archive'):
+            self.message_archive.close()
@@ -0,0 +1,286 @@
+"""本地消息与总结归档（SQLite FTS5 全文索引）
+
+每次抓取到的频道消息和生成的总结都会写入归档库，
+管理员可以通过 ``/tgsearch`` 离线检索，无需再次访问 Telegram 或调用 AI。
+
+中文文本没有空格分词，优先使用 FTS5 的 trigram 分词器（SQLite 3.34+），
+支持任意 3 个字符以上的子串检索；更短的关键词回退为 LIKE 匹配。
+"""
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from astrbot.api import logger
+
+from .state_store import SQLiteDatabase
+
+
+class SearchHit:
+    """一条检索结果"""
+
+    __slots__ = ("kind", "channel", "date", "snippet", "link", "score")
+
+    def __init__(self, kind: str, channel: str, date: str, snippet: str, link: str, score: float):
+        self.kind = kind
+        """结果类型：message（消息）/ summary（总结）"""
+        self.channel = channel
+        self.date = date
+        self.snippet = snippet
+        self.link = link
+        self.score = score
+        """相关度得分（bm25，越小越相关）"""
+
+
+class MessageArchive(SQLiteDatabase):
+    """消息与总结的全文检索归档"""
+
+    DISPLAY_NAME: str = "归档数据库"
+
+    SNIPPET_TOKENS: int = 24
+    """检索结果摘要的最大长度（分词单位）"""
+
+    VACUUM_FREE_RATIO: float = 0.25
+    """空闲页占比达到此值时才执行 VACUUM（VACUUM 会重写整个数据库）"""
+
+    def __init__(self, db_file):
+        super().__init__(db_file)
+        self.tokenizer = "unicode61"
+
+    def _create_schema(self):
+        """创建归档表、FTS5 索引及同步触发器（幂等）"""
+        with self._lock:
+            self.tokenizer = "trigram" if self._supports_trigram() else "unicode61"
+            if self.tokenizer != "trigram":
+                logger.warning("当前 SQLite 不支持 trigram 分词器，中文检索将按词边界匹配")
+            self._conn.executescript(
+                f"""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    ref_id INTEGER,
+                    date TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    link TEXT
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_ref
+                    ON documents(kind, channel, ref_id) WHERE ref_id IS NOT NULL;
+                CREATE INDEX IF NOT EXISTS idx_documents_channel_date ON documents(channel, date);
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                    text, content='documents', content_rowid='id', tokenize='{self.tokenizer}'
+                );
+                CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+                    INSERT INTO documents_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+                    INSERT INTO documents_fts(documents_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE OF text ON documents BEGIN
+                    INSERT INTO documents_fts(documents_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                    INSERT INTO documents_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                """
+            )
+
+    def _supports_trigram(self) -> bool:
+        try:
+            self._conn.execute("CREATE VIRTUAL TABLE temp._trigram_probe USING fts5(x, tokenize='trigram')")
+            self._conn.execute("DROP TABLE temp._trigram_probe")
+            return True
+        except Exception:
+            return False
+
+    # ========== 写入 ==========
+
+    def add_messages(self, channel: str, messages: Iterable[tuple]) -> int:
+        """批量归档频道消息（同一消息重复写入时更新文本）
+
+        Args:
+            channel: 频道标识
+            messages: 可迭代的 (message_id, date, text, link) 元组
+
+        Returns:
+            int: 写入的消息条数
+        """
+        rows = [
+            (channel, message_id, _to_iso(date), text, link)
+            for message_id, date, text, link in messages
+        ]
+        if not rows:
+            return 0
+        with self._transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO documents(kind, channel, ref_id, date, text, link)
+                VALUES ('message', ?, ?, ?, ?, ?)
+                ON CONFLICT(kind, channel, ref_id) WHERE ref_id IS NOT NULL
+                DO UPDATE SET text = excluded.text, date = excluded.date, link = excluded.link
+                WHERE documents.text != excluded.text
+                """,
+                rows
+            )
+        return len(rows)
+
+    def add_summary(self, channel: str, text: str, created_at: Optional[datetime] = None, link: Optional[str] = None):
+        """归档一份生成的总结
+
+        Args:
+            channel: 频道标识
+            text: 总结文本
+            created_at: 生成时间，默认为当前 UTC 时间
+            link: 可选，频道链接
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO documents(kind, channel, ref_id, date, text, link) VALUES ('summary', ?, NULL, ?, ?, ?)",
+                (channel, _to_iso(created_at or datetime.now(timezone.utc)), text, link)
+            )
+
+    # ========== 冷存储迁移 ==========
+
+    def message_channels_before(self, cutoff: datetime) -> list:
+        """有早于 ``cutoff`` 的归档消息的频道"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT channel FROM documents WHERE kind = 'message' AND date < ?", (_to_iso(cutoff),)
+            ).fetchall()
+        return [row["channel"] for row in rows]
+
+    def messages_before(self, channel: str, cutoff: datetime, limit: int) -> list:
+        """读取频道中最早的一批早于 ``cutoff`` 的归档消息
+
+        Returns:
+            list: 按时间排序的 (id, message_id, date, text, link) 元组
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT id, ref_id, date, text, link FROM documents
+                WHERE kind = 'message' AND channel = ? AND date < ?
+                ORDER BY date LIMIT ?
+                """,
+                (channel, _to_iso(cutoff), limit)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def delete_documents(self, ids: list):
+        """删除归档文档（全文索引由触发器同步删除）"""
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in ids])
+
+    def compact(self) -> bool:
+        """空闲页足够多时合并全文索引并回收已删除文档占用的空间
+
+        删除的文档留下的空闲页会被之后的写入复用；只有空闲页占比达到
+        ``VACUUM_FREE_RATIO`` 时才值得重写整个数据库。
+
+        Returns:
+            bool: 是否执行了 VACUUM
+        """
+        with self._lock:
+            free_pages = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            total_pages = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            if not total_pages or free_pages < total_pages * self.VACUUM_FREE_RATIO:
+                return False
+            self._conn.execute("INSERT INTO documents_fts(documents_fts) VALUES ('optimize')")
+            self._conn.execute("VACUUM")
+            # WAL 模式下 VACUUM 写入日志文件，检查点后主文件才会缩小
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return True
+
+    # ========== 检索 ==========
+
+    def search(
+        self,
+        keywords: list,
+        channel: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 10,
+    ) -> list:
+        """全文检索归档的消息与总结
+
+        Args:
+            keywords: 关键词列表（全部匹配）
+            channel: 可选，限定频道
+            since: 可选，起始时间（含）
+            until: 可选，结束时间（不含）
+            limit: 最多返回条数
+
+        Returns:
+            list[SearchHit]: 按相关度排序的检索结果
+        """
+        keywords = [k for k in keywords if k]
+        if not keywords:
+            return []
+
+        filters, params = [], []
+        if channel:
+            filters.append("d.channel = ?")
+            params.append(channel)
+        if since:
+            filters.append("d.date >= ?")
+            params.append(_to_iso(since))
+        if until:
+            filters.append("d.date < ?")
+            params.append(_to_iso(until))
+
+        # trigram 分词器无法匹配少于 3 个字符的词，这些词回退为 LIKE 过滤
+        min_len = 3 if self.tokenizer == "trigram" else 1
+        fts_terms = [k for k in keywords if len(k) >= min_len]
+        like_terms = [k for k in keywords if len(k) < min_len]
+        for term in like_terms:
+            filters.append("d.text LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(term)}%")
+        where = f" AND {' AND '.join(filters)}" if filters else ""
+
+        with self._lock:
+            if fts_terms:
+                match = " AND ".join(_quote_fts(term) for term in fts_terms)
+                rows = self._conn.execute(
+                    f"""
+                    SELECT d.kind, d.channel, d.date, d.link,
+                           snippet(documents_fts, 0, '【', '】', '…', {self.SNIPPET_TOKENS}) AS snippet,
+                           bm25(documents_fts) AS score
+                    FROM documents_fts
+                    JOIN documents d ON d.id = documents_fts.rowid
+                    WHERE documents_fts MATCH ?{where}
+                    ORDER BY score
+                    LIMIT ?
+                    """,
+                    [match, *params, limit]
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    f"""
+                    SELECT d.kind, d.channel, d.date, d.link,
+                           substr(d.text, 1, 80) AS snippet, 0.0 AS score
+                    FROM documents d
+                    WHERE 1 = 1{where}
+                    ORDER BY d.date DESC
+                    LIMIT ?
+                    """,
+                    [*params, limit]
+                ).fetchall()
+
+        return [
+            SearchHit(row["kind"], row["channel"], row["date"], row["snippet"], row["link"], row["score"])
+            for row in rows
+        ]
+
+
+def _to_iso(value) -> str:
+    """将时间统一转换为 UTC ISO 字符串，保证按字符串比较即按时间排序"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat()
+    return str(value)
+
+
+def _quote_fts(term: str) -> str:
+    """将关键词转义为 FTS5 短语，避免用户输入中的运算符被解析"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -0,0 +1,87 @@
+"""按内容指纹识别频道消息的增量
+
+每条参与过总结的消息在状态数据库中保存一个内容指纹（正文哈希）与发布时间。
+被过滤规则、抽样或重要度筛选移除的消息没有进入总结，不保存指纹。
+下一次抓取时：
+
+- 抓取窗口内已有指纹且内容未变的消息不再进入总结（例如清除/回退总结时间后的重叠部分）
+- 指纹不一致的消息视为被编辑，重新进入总结并标注“已编辑”
+- 复查窗口内、本次没有再抓取到的已总结消息按ID批量重新获取：
+  获取不到的视为已删除，内容变化的视为已编辑
+
+因此一次运行的 AI 输入只包含新增与编辑过的消息，没有任何变化的频道不调用 AI。
+"""
+import hashlib
+from typing import Optional
+
+
+def content_hash(text: str) -> str:
+    """消息正文的内容指纹"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class ChannelDelta:
+    """单个频道在一次抓取中的增量"""
+
+    __slots__ = ("known", "seen", "hashes", "edited", "unchanged", "deleted", "rechecked")
+
+    def __init__(self, known: dict):
+        """初始化
+
+        Args:
+            known: 状态数据库中已总结消息的指纹 {message_id: hash}
+        """
+        self.known = known
+        self.seen = set()
+        """本次抓取或复查到的消息ID"""
+        self.hashes = {}
+        """需要落盘的、本次进入总结的新增/编辑消息指纹 {message_id: (hash, date)}"""
+        self.edited = 0
+        self.unchanged = 0
+        self.deleted = []
+        """已总结但已被删除的消息ID"""
+        self.rechecked = False
+
+    def classify(self, message_id: int, text: str) -> Optional[bool]:
+        """登记一条抓取到的文本消息
+
+        Returns:
+            bool | None: None 表示内容未变（不再总结）；True 表示已编辑；False 表示新消息
+        """
+        self.seen.add(message_id)
+        previous = self.known.get(message_id)
+        if previous is None:
+            return False
+        if previous == content_hash(text):
+            self.unchanged += 1
+            return None
+        return True
+
+    def record(self, messages: list):
+        """记录最终进入总结的消息（MessageRecord）的指纹"""
+        for message in messages:
+            self.hashes[message.id] = (content_hash(message.text), message.date)
+            if message.edited:
+                self.edited += 1
+
+    def recheck_ids(self) -> list:
+        """本次没有抓取到、需要按ID复查的已总结消息"""
+        return sorted(message_id for message_id in self.known if message_id not in self.seen)
+
+    def mark_deleted(self, message_id: int):
+        self.seen.add(message_id)
+        self.deleted.append(message_id)
+
+    @property
+    def changed(self) -> bool:
+        """是否有新增、编辑或删除的消息"""
+        return bool(self.hashes or self.deleted)
+
+    def note(self) -> str:
+        """附在报告末尾的编辑/删除说明（没有时为空字符串）"""
+        parts = []
+        if self.edited:
+            parts.append(f"{self.edited} 条已总结的消息被编辑，已重新纳入总结")
+        if self.deleted:
+            parts.append(f"{len(self.deleted)} 条已总结的消息已被删除")
+        return f"\n\n（{'；'.join(parts)}）" if parts else ""
@@ -0,0 +1,278 @@
+"""消息过滤规则引擎
+
+在抓取循环中按频道过滤广告、推广、过短或转发消息，避免无用内容进入 AI 上下文。
+
+- 关键词列表编译为一个 Aho-Corasick 自动机，一次扫描即可匹配全部关键词，
+  耗时与文本长度线性相关，与关键词数量无关
+- 正则列表合并为一个带命名分组的正则，同样只扫描一次
+- 每条规则移除的消息数与估算 token 数都会计入统计
+"""
+import re
+from collections import deque
+from typing import Optional
+
+from .channel_registry import ChannelRegistry
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数
+
+    中日韩字符按每字 1 个 token 计算，其余字符按每 4 个字符 1 个 token 计算。
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的 token 数
+    """
+    cjk = sum(1 for ch in text if "\u3000" <= ch <= "\u9fff" or "\uac00" <= ch <= "\ud7af" or "\uff00" <= ch <= "\uffef")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式匹配自动机（大小写不敏感）"""
+
+    __slots__ = ("patterns", "_goto", "_fail", "_output")
+
+    def __init__(self, patterns):
+        """构建自动机
+
+        Args:
+            patterns: 关键词列表
+        """
+        self.patterns = [p for p in dict.fromkeys(p.lower() for p in patterns if p)]
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] = self._output[state] + (index,)
+
+        # 广度优先构建失败指针，并把失败链上的输出合并到当前状态
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def find_first(self, text: str) -> Optional[str]:
+        """返回文本中最先出现的关键词
+
+        Args:
+            text: 待匹配文本
+
+        Returns:
+            str | None: 命中的关键词，未命中返回 None
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                return self.patterns[output[state][0]]
+        return None
+
+
+class FilterStats:
+    """过滤统计：每条规则移除的消息数与估算 token 数"""
+
+    __slots__ = ("removed",)
+
+    def __init__(self):
+        self.removed = {}
+        """{规则名: [消息数, token 数]}"""
+
+    def record(self, rule: str, text: str):
+        entry = self.removed.setdefault(rule, [0, 0])
+        entry[0] += 1
+        entry[1] += estimate_tokens(text)
+
+    def merge(self, other: "FilterStats"):
+        for rule, (messages, tokens) in other.removed.items():
+            entry = self.removed.setdefault(rule, [0, 0])
+            entry[0] += messages
+            entry[1] += tokens
+
+    @property
+    def total_messages(self) -> int:
+        return sum(messages for messages, _ in self.removed.values())
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(tokens for _, tokens in self.removed.values())
+
+    def to_dict(self) -> dict:
+        return {rule: {"messages": m, "tokens": t} for rule, (m, t) in self.removed.items()}
+
+    def format(self) -> str:
+        """格式化为可读文本（按移除消息数降序）"""
+        lines = [
+            f"{rule}: {messages} 条 / 约 {tokens} tokens"
+            for rule, (messages, tokens) in sorted(self.removed.items(), key=lambda item: -item[1][0])
+        ]
+        return "\n".join(lines)
+
+
+class CompiledFilter:
+    """编译后的单频道过滤规则"""
+
+    RULE_KEYS: tuple = (
+        "include_keywords", "exclude_keywords", "include_regex", "exclude_regex",
+        "min_length", "skip_forwarded", "skip_with_buttons",
+    )
+    """支持的规则键"""
+
+    def __init__(self, rules: dict):
+        """编译过滤规则
+
+        Args:
+            rules: 规则字典，键见 ``RULE_KEYS``
+
+        Raises:
+            re.error: 正则表达式无效时
+        """
+        self.min_length = int(rules.get("min_length") or 0)
+        self.skip_forwarded = bool(rules.get("skip_forwarded", False))
+        self.skip_with_buttons = bool(rules.get("skip_with_buttons", False))
+        self.include_keywords = AhoCorasick(rules.get("include_keywords") or [])
+        self.exclude_keywords = AhoCorasick(rules.get("exclude_keywords") or [])
+        self.include_regex = self._compile_regex(rules.get("include_regex") or [])
+        self.exclude_regex = self._compile_regex(rules.get("exclude_regex") or [])
+        self._exclude_regex_sources = [p for p in rules.get("exclude_regex") or [] if p]
+        self.has_include_rules = bool(self.include_keywords) or self.include_regex is not None
+
+    @staticmethod
+    def _compile_regex(patterns: list):
+        """将多个正则合并为一个带命名分组的正则，只需扫描一次文本"""
+        patterns = [p for p in patterns if p]
+        if not patterns:
+            return None
+        for pattern in patterns:
+            re.compile(pattern)
+        return re.compile("|".join(f"(?P<r{i}>{p})" for i, p in enumerate(patterns)), re.IGNORECASE)
+
+    @property
+    def is_empty(self) -> bool:
+        """是否没有任何生效规则"""
+        return not (
+            self.min_length or self.skip_forwarded or self.skip_with_buttons
+            or self.has_include_rules or self.exclude_keywords or self.exclude_regex is not None
+        )
+
+    def check(self, text: str, is_forwarded: bool = False, has_buttons: bool = False) -> Optional[str]:
+        """检查一条消息是否应被过滤
+
+        Args:
+            text: 消息文本
+            is_forwarded: 是否为转发消息
+            has_buttons: 是否带有内联按钮
+
+        Returns:
+            str | None: 移除该消息的规则名；应保留时返回 None
+        """
+        if self.min_length and len(text.strip()) < self.min_length:
+            return "min_length"
+        if self.skip_forwarded and is_forwarded:
+            return "skip_forwarded"
+        if self.skip_with_buttons and has_buttons:
+            return "skip_with_buttons"
+        if self.exclude_keywords:
+            keyword = self.exclude_keywords.find_first(text)
+            if keyword is not None:
+                return f"exclude_keywords:{keyword}"
+        if self.exclude_regex is not None:
+            match = self.exclude_regex.search(text)
+            if match:
+                for i, source in enumerate(self._exclude_regex_sources):
+                    if match.group(f"r{i}") is not None:
+                        return f"exclude_regex:{source}"
+        if self.has_include_rules:
+            if self.include_keywords and self.include_keywords.find_first(text) is not None:
+                return None
+            if self.include_regex is not None and self.include_regex.search(text):
+                return None
+            return "include_rules"
+        return None
+
+
+class MessageFilterEngine:
+    """按频道管理编译后的过滤规则
+
+    配置格式（JSON）::
+
+        {
+            "default": {"exclude_keywords": ["广告"], "min_length": 10},
+            "channels": {
+                "channel_name": {"skip_forwarded": true, "exclude_regex": ["t\\\\.me/\\\\+"]}
+            }
+        }
+
+    频道规则在默认规则基础上按键覆盖。
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        """初始化并编译所有规则
+
+        Args:
+            config: 过滤规则配置
+
+        Raises:
+            ValueError: 规则配置格式无效时
+        """
+        config = config or {}
+        if not isinstance(config, dict):
+            raise ValueError("过滤规则必须是 JSON 对象")
+        default_rules = config.get("default") or {}
+        channel_rules = config.get("channels") or {}
+        if not isinstance(default_rules, dict) or not isinstance(channel_rules, dict):
+            raise ValueError("default 与 channels 必须是 JSON 对象")
+
+        for rules in [default_rules, *channel_rules.values()]:
+            unknown = set(rules) - set(CompiledFilter.RULE_KEYS)
+            if unknown:
+                raise ValueError(f"未知的过滤规则: {', '.join(sorted(unknown))}")
+
+        try:
+            self._default = CompiledFilter(default_rules)
+            self._by_channel = {
+                ChannelRegistry.normalize(channel): CompiledFilter({**default_rules, **rules})
+                for channel, rules in channel_rules.items()
+            }
+        except re.error as e:
+            raise ValueError(f"过滤规则中的正则表达式无效: {e}") from e
+
+    @property
+    def is_empty(self) -> bool:
+        """是否没有任何频道配置了生效规则"""
+        return self._default.is_empty and all(f.is_empty for f in self._by_channel.values())
+
+    def for_channel(self, channel: str) -> CompiledFilter:
+        """获取频道对应的过滤规则
+
+        Args:
+            channel: 频道标识（任意写法）
+
+        Returns:
+            CompiledFilter: 频道规则，未单独配置时返回默认规则
+        """
+        return self._by_channel.get(ChannelRegistry.normalize(channel), self._default)
@@ -0,0 +1,67 @@
+"""抓取结果的紧凑消息记录
+
+抓取阶段只保存结构化字段（消息ID、时间、正文、频道链接前缀、互动数据），
+不再为每条消息预先拼接提示词文本。排序、归档、聚类直接使用这些字段，
+只有在组装 AI 提示词时才渲染为文本。
+"""
+from typing import Iterable
+
+from .ranking import Engagement
+
+
+MESSAGE_SEPARATOR = "\n\n---\n\n"
+"""提示词中消息之间的分隔符"""
+
+
+class MessageRecord:
+    """一条频道消息
+
+    链接前缀由同一频道的所有消息共享（来自频道注册表），
+    完整链接在需要时才拼接。
+    """
+
+    __slots__ = ("id", "date", "text", "link_prefix", "engagement", "edited")
+
+    def __init__(self, message_id: int, date, text: str, link_prefix: str, engagement: Engagement,
+                 edited: bool = False):
+        self.id = message_id
+        self.date = date
+        self.text = text
+        """完整正文（截断只在渲染时进行）"""
+        self.link_prefix = link_prefix
+        self.engagement = engagement
+        self.edited = edited
+        """已总结过、之后被编辑的消息"""
+
+    @property
+    def link(self) -> str:
+        return f"{self.link_prefix}{self.id}"
+
+    def archive_row(self) -> tuple:
+        """归档库使用的 (message_id, date, text, link) 元组"""
+        return self.id, self.date, self.text, self.link
+
+    def render(self, max_chars: int) -> str:
+        """渲染为提示词中的消息文本
+
+        Args:
+            max_chars: 正文最大字符数
+        """
+        label = "内容（已编辑）" if self.edited else "内容"
+        return f"{label}: {self.text[:max_chars]}\n链接: {self.link}"
+
+
+def render_messages(messages: Iterable, max_chars: int) -> str:
+    """将消息列表渲染为提示词上下文
+
+    Args:
+        messages: ``MessageRecord`` 或已是文本的条目（如周报、话题块）
+        max_chars: 每条消息正文的最大字符数
+
+    Returns:
+        str: 以分隔符连接的上下文文本
+    """
+    return MESSAGE_SEPARATOR.join(
+        message if isinstance(message, str) else message.render(max_chars)
+        for message in messages
+    )
@@ -0,0 +1,123 @@
+"""提示词布局与 token 用量统计
+
+支持前缀缓存的 AI 提供商（OpenAI、Anthropic、DeepSeek 等）会缓存请求开头字节完全相同的部分。
+提示词因此分为两段：
+
+- 固定前缀（system prompt）：角色设定 + 总结规则，同一指令下逐字节不变
+- 可变内容（user prompt）：本次需要总结的消息
+
+同一次运行中按频道、按话题批次的多次调用共享同一前缀，可以命中提供商缓存。
+每次调用的输入、缓存命中与输出 token 数都会被记录。
+"""
+from typing import NamedTuple, Optional
+
+
+BASE_SYSTEM_PROMPT = "你是一个专业的资讯摘要助手，擅长提取重点并保持客观。"
+"""角色设定（固定前缀的开头）"""
+
+CONTEXT_HEADER = "以下是需要总结的内容：\n\n"
+"""可变内容的开头"""
+
+
+def build_system_prompt(instruction: str) -> str:
+    """构建固定前缀：角色设定 + 总结规则
+
+    结果只取决于指令文本，不包含时间、频道名等可变信息，保证逐字节稳定。
+
+    Args:
+        instruction: 总结规则（当前提示词或月报合并指令）
+
+    Returns:
+        str: system prompt
+    """
+    return f"{BASE_SYSTEM_PROMPT}\n\n{instruction.strip()}\n"
+
+
+class TokenUsage(NamedTuple):
+    """单次 AI 调用的 token 用量"""
+
+    input_tokens: int = 0
+    """输入 token 总数（含缓存命中部分）"""
+    cached_tokens: int = 0
+    """命中提供商缓存的输入 token 数"""
+    output_tokens: int = 0
+
+    @classmethod
+    def from_response(cls, response) -> Optional["TokenUsage"]:
+        """从 AstrBot 的 LLMResponse 中提取 token 用量
+
+        优先使用 AstrBot 归一化后的 ``usage``（input_other / input_cached / output），
+        否则读取原始响应中 OpenAI（prompt_tokens_details.cached_tokens）或
+        Anthropic（cache_read_input_tokens）格式的用量字段。
+
+        Returns:
+            TokenUsage | None: 提供商未返回用量时为 None
+        """
+        usage = getattr(response, "usage", None)
+        if usage is not None and hasattr(usage, "input_cached"):
+            cached = usage.input_cached or 0
+            return cls(cached + (getattr(usage, "input_other", 0) or 0), cached, getattr(usage, "output", 0) or 0)
+
+        raw_usage = getattr(getattr(response, "raw_completion", None), "usage", None)
+        if raw_usage is None:
+            return None
+        if hasattr(raw_usage, "prompt_tokens"):
+            details = getattr(raw_usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", 0) or 0
+            return cls(raw_usage.prompt_tokens or 0, cached, getattr(raw_usage, "completion_tokens", 0) or 0)
+        if hasattr(raw_usage, "input_tokens"):
+            cached = getattr(raw_usage, "cache_read_input_tokens", 0) or 0
+            created = getattr(raw_usage, "cache_creation_input_tokens", 0) or 0
+            return cls((raw_usage.input_tokens or 0) + cached + created, cached, getattr(raw_usage, "output_tokens", 0) or 0)
+        return None
+
+
+class TokenUsageStats:
+    """累计 token 用量"""
+
+    __slots__ = ("calls", "reported_calls", "input_tokens", "cached_tokens", "output_tokens")
+
+    def __init__(self):
+        self.calls = 0
+        self.reported_calls = 0
+        """返回了用量信息的调用次数"""
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+
+    def record(self, usage: Optional[TokenUsage]):
+        self.calls += 1
+        if usage is None:
+            return
+        self.reported_calls += 1
+        self.input_tokens += usage.input_tokens
+        self.cached_tokens += usage.cached_tokens
+        self.output_tokens += usage.output_tokens
+
+    def snapshot(self) -> "TokenUsageStats":
+        copy = TokenUsageStats()
+        for slot in self.__slots__:
+            setattr(copy, slot, getattr(self, slot))
+        return copy
+
+    def since(self, earlier: "TokenUsageStats") -> "TokenUsageStats":
+        """返回相对于较早快照的增量"""
+        delta = TokenUsageStats()
+        for slot in self.__slots__:
+            setattr(delta, slot, getattr(self, slot) - getattr(earlier, slot))
+        return delta
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def format(self) -> str:
+        if not self.reported_calls:
+            return f"AI 调用 {self.calls} 次（提供商未返回 token 用量）"
+        return (
+            f"AI 调用 {self.calls} 次，输入 {self.input_tokens} tokens"
+            f"（缓存命中 {self.cached_tokens}，{self.cache_hit_ratio:.0%}），输出 {self.output_tokens} tokens"
+        )
@@ -0,0 +1,90 @@
+"""基于互动数据的消息重要度排序
+
+Telethon 消息自带浏览量、转发数、回复数和表情回应数。排序阶段根据这些数据
+计算重要度得分，用堆在 O(n log k) 时间内选出每个频道最重要的消息，
+在条数或 token 预算内控制 AI 调用的成本与延迟。
+"""
+import heapq
+import math
+from typing import NamedTuple, Optional
+
+
+class Engagement(NamedTuple):
+    """消息互动数据（紧凑元组）"""
+
+    views: int = 0
+    forwards: int = 0
+    replies: int = 0
+    reactions: int = 0
+
+    @classmethod
+    def from_message(cls, message) -> "Engagement":
+        """从 Telethon 消息对象提取互动数据
+
+        Args:
+            message: Telethon Message 对象
+
+        Returns:
+            Engagement: 互动数据，缺失字段记为 0
+        """
+        replies = getattr(message, "replies", None)
+        reactions = getattr(message, "reactions", None)
+        reaction_count = 0
+        if reactions is not None:
+            reaction_count = sum(getattr(r, "count", 0) or 0 for r in getattr(reactions, "results", None) or ())
+        return cls(
+            views=getattr(message, "views", None) or 0,
+            forwards=getattr(message, "forwards", None) or 0,
+            replies=(getattr(replies, "replies", None) or 0) if replies is not None else 0,
+            reactions=reaction_count,
+        )
+
+    def score(self) -> float:
+        """计算重要度得分
+
+        各项取对数以抑制头部消息的极端值；转发、回复和表情回应代表主动互动，
+        权重高于被动浏览。
+        """
+        return (
+            math.log1p(self.views)
+            + 3.0 * math.log1p(self.forwards)
+            + 2.0 * math.log1p(self.replies)
+            + 2.0 * math.log1p(self.reactions)
+        )
+
+
+def select_top(scores: list, max_count: int = 0, token_counts: Optional[list] = None, max_tokens: int = 0) -> list:
+    """按得分选出最重要的消息
+
+    Args:
+        scores: 每条消息的得分
+        max_count: 最多保留条数，0 表示不限
+        token_counts: 每条消息的 token 数（按 token 预算选择时必需）
+        max_tokens: token 预算，0 表示不限
+
+    Returns:
+        list[int]: 被选中消息的下标，按原始顺序（时间顺序）排列
+    """
+    n = len(scores)
+    if n == 0:
+        return []
+    limit = max_count if max_count > 0 else n
+
+    if max_tokens <= 0 or token_counts is None:
+        if limit >= n:
+            return list(range(n))
+        return sorted(heapq.nlargest(limit, range(n), key=scores.__getitem__))
+
+    # token 预算：建堆 O(n)，按得分从高到低弹出，放不下的消息跳过，直到条数或预算用尽
+    heap = [(-score, index) for index, score in enumerate(scores)]
+    heapq.heapify(heap)
+    selected, used = [], 0
+    while heap and len(selected) < limit:
+        _, index = heapq.heappop(heap)
+        cost = token_counts[index]
+        if used + cost > max_tokens:
+            continue
+        selected.append(index)
+        used += cost
+    selected.sort()
+    return selected
@@ -0,0 +1,185 @@
+"""总结流程的录制与回放
+
+录制模式在一次真实运行中保存抓取到的消息、每次 AI 调用的提示词与响应、
+以及推送内容，写入 JSON 夹具文件。回放模式离线执行完整的 ``main_job`` 流程：
+消息来自夹具，``llm_generate`` 返回录制的响应，``send_message`` 只记录不发送，
+状态数据库与归档不会被修改。回放报告给出各阶段耗时以及提示词、推送内容与录制时的差异，
+便于在真实数据上逐次比较性能与输出变化。
+
+当前会话保存在 ``ContextVar`` 中，只对发起录制/回放的任务可见，
+同时运行的定时任务不受影响。
+"""
+import hashlib
+import json
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from .ranking import Engagement
+
+
+FIXTURE_VERSION = 1
+
+_current: ContextVar = ContextVar("telegram_summary_replay_session", default=None)
+
+
+def current():
+    """当前任务中的录制/回放会话（没有时为 None）"""
+    return _current.get()
+
+
+def is_replaying() -> bool:
+    """当前任务是否处于回放模式（不得产生任何外部副作用）"""
+    return isinstance(_current.get(), ReplaySession)
+
+
+def prompt_key(system_prompt: str, prompt: str) -> str:
+    """提示词指纹，用于将回放中的调用与录制的响应对应"""
+    digest = hashlib.sha256()
+    digest.update(system_prompt.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class _Session:
+    """录制与回放会话的公共部分"""
+
+    def __init__(self):
+        self.channels = {}
+        """{channel: [message dict]}"""
+        self.fetch_failures = {}
+        self.llm_calls = []
+        self.pushes = []
+        self.timings = {}
+        self._token = None
+        self._started = None
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timings["total"] = time.perf_counter() - self._started
+        _current.reset(self._token)
+        return False
+
+    def add_timing(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+
+class RunRecorder(_Session):
+    """录制一次真实运行"""
+
+    def record_channel(self, channel: str):
+        """登记一个被抓取的频道（没有文本消息的频道也需要回放）"""
+        self.channels.setdefault(channel, [])
+
+    def record_message(self, channel: str, message_id: int, date, text: str,
+                       is_forwarded: bool, has_buttons: bool, engagement: Engagement):
+        """记录一条抓取到的文本消息（过滤前，回放时重新执行过滤与排序）"""
+        self.channels.setdefault(channel, []).append({
+            "id": message_id,
+            "date": date.isoformat() if date else None,
+            "text": text,
+            "is_forwarded": is_forwarded,
+            "has_buttons": has_buttons,
+            "engagement": list(engagement),
+        })
+
+    async def llm_generate(self, context, **kwargs):
+        started = time.perf_counter()
+        response = await context.llm_generate(**kwargs)
+        self.llm_calls.append({
+            "key": prompt_key(kwargs.get("system_prompt", ""), kwargs.get("prompt", "")),
+            "system_prompt": kwargs.get("system_prompt", ""),
+            "prompt": kwargs.get("prompt", ""),
+            "response": response.completion_text,
+            "elapsed": time.perf_counter() - started,
+        })
+        return response
+
+    async def send_message(self, context, umo: str, message_chain, text: str):
+        await context.send_message(umo, message_chain)
+        self.pushes.append({"target": umo, "text": text})
+
+    def save(self, path: Path):
+        """写入夹具文件"""
+        fixture = {
+            "version": FIXTURE_VERSION,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "channels": self.channels,
+            "fetch_failures": self.fetch_failures,
+            "llm_calls": self.llm_calls,
+            "pushes": self.pushes,
+            "timings": self.timings,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(fixture, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp_path.replace(path)
+
+
+class ReplaySession(_Session):
+    """离线回放一份夹具"""
+
+    def __init__(self, fixture: dict):
+        super().__init__()
+        if fixture.get("version") != FIXTURE_VERSION:
+            raise ValueError(f"不支持的夹具版本: {fixture.get('version')}")
+        self.fixture = fixture
+        self.channels = fixture.get("channels", {})
+        self.fetch_failures = fixture.get("fetch_failures", {})
+        self._pending_calls = list(fixture.get("llm_calls", []))
+        """尚未被回放使用的录制调用（按录制顺序）"""
+        self.changed_prompts = 0
+        """提示词与录制时不一致（按顺序回退匹配）的调用次数"""
+
+    @classmethod
+    def load(cls, path: Path) -> "ReplaySession":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    @staticmethod
+    def iter_messages(rows: list):
+        """将夹具中的消息还原为 (id, date, text, is_forwarded, has_buttons, engagement)"""
+        for row in rows:
+            date = datetime.fromisoformat(row["date"]) if row.get("date") else None
+            yield (row["id"], date, row["text"], row["is_forwarded"], row["has_buttons"],
+                   Engagement(*row["engagement"]))
+
+    async def llm_generate(self, context, **kwargs):
+        """返回录制的响应：优先按提示词指纹匹配，提示词变化时按调用顺序回退"""
+        key = prompt_key(kwargs.get("system_prompt", ""), kwargs.get("prompt", ""))
+        index = next((i for i, call in enumerate(self._pending_calls) if call["key"] == key), None)
+        if index is None:
+            self.changed_prompts += 1
+            index = 0 if self._pending_calls else None
+        text = self._pending_calls.pop(index)["response"] if index is not None else ""
+        self.llm_calls.append({"key": key, "prompt_chars": len(kwargs.get("prompt", "")), "response": text})
+        return SimpleNamespace(completion_text=text, usage=None, raw_completion=None)
+
+    async def send_message(self, context, umo: str, message_chain, text: str):
+        self.pushes.append({"target": umo, "text": text})
+
+    def report(self) -> dict:
+        """回放结果与录制结果的对比"""
+        recorded_pushes = [push["text"] for push in self.fixture.get("pushes", [])]
+        replayed_pushes = [push["text"] for push in self.pushes]
+        recorded_timings = self.fixture.get("timings", {})
+        return {
+            "recorded_at": self.fixture.get("recorded_at"),
+            "llm_calls": {"recorded": len(self.fixture.get("llm_calls", [])), "replayed": len(self.llm_calls)},
+            "changed_prompts": self.changed_prompts,
+            "pushes": {
+                "recorded": len(recorded_pushes),
+                "replayed": len(replayed_pushes),
+                "identical": recorded_pushes == replayed_pushes,
+            },
+            "timings": {
+                stage: {"recorded": recorded_timings.get(stage), "replayed": seconds}
+                for stage, seconds in self.timings.items()
+            },
+        }
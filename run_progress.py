@@ -0,0 +1,223 @@
+"""运行中任务的实时进度
+
+定时任务与 ``/summary`` 运行时，抓取、AI 总结和推送阶段都会更新共享的内存进度，
+``/tgstatus`` 据此显示每个频道所处阶段、已抓取消息数、抓取速度和预计剩余时间。
+
+当前运行的进度对象保存在 ``ContextVar`` 中，各阶段无需层层传参即可更新；
+并发运行的任务各自维护自己的进度。
+"""
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+
+_current: ContextVar = ContextVar("telegram_summary_run_progress", default=None)
+
+
+def current():
+    """当前任务的运行进度（不在运行中时返回空进度，所有更新均被忽略）"""
+    return _current.get() or NOOP_PROGRESS
+
+
+class ChannelStatus:
+    """单个频道的进度"""
+
+    __slots__ = ("channel", "stage", "fetched", "messages", "resume_at",
+                 "fetch_started", "fetch_finished", "summary_started", "finished")
+
+    STAGE_LABELS: dict = {
+        "pending": "等待抓取",
+        "fetching": "抓取中",
+        "parked": "FloodWait 等待中",
+        "fetched": "等待总结",
+        "summarizing": "AI 总结中",
+        "pushing": "推送中",
+        "done": "完成",
+        "failed": "抓取不完整",
+    }
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.stage = "pending"
+        self.fetched = 0
+        """已抓取（处理）的消息数"""
+        self.messages = 0
+        """进入总结的消息数"""
+        self.resume_at = None
+        self.fetch_started = None
+        self.fetch_finished = None
+        self.summary_started = None
+        self.finished = None
+
+
+class RunProgress:
+    """一次运行的进度"""
+
+    def __init__(self, run_id: str, kind: str):
+        self.run_id = run_id
+        self.kind = kind
+        self.started = time.monotonic()
+        self.finished = None
+        self.channels = {}
+        self._token = None
+
+    def begin(self) -> "RunProgress":
+        """设为当前任务的进度"""
+        self._token = _current.set(self)
+        return self
+
+    def end(self):
+        """结束运行（幂等）"""
+        if self.finished is not None:
+            return
+        self.finished = time.monotonic()
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            _current.set(None)
+
+    # ========== 更新 ==========
+
+    def _status(self, channel: str) -> ChannelStatus:
+        status = self.channels.get(channel)
+        if status is None:
+            status = self.channels[channel] = ChannelStatus(channel)
+        return status
+
+    def add_channels(self, channels):
+        for channel in channels:
+            self._status(channel)
+
+    def fetching(self, channel: str, fetched: int):
+        status = self._status(channel)
+        if status.fetch_started is None:
+            status.fetch_started = time.monotonic()
+        status.stage = "fetching"
+        status.fetched = fetched
+        status.resume_at = None
+
+    def parked(self, channel: str, seconds: float):
+        status = self._status(channel)
+        status.stage = "parked"
+        status.resume_at = time.monotonic() + seconds
+
+    def fetched(self, channel: str, messages: int, complete: bool = True):
+        status = self._status(channel)
+        status.stage = "fetched" if complete else "failed"
+        status.messages = messages
+        status.fetch_finished = time.monotonic()
+        if not complete:
+            status.finished = status.fetch_finished
+
+    def summarizing(self, channel: str):
+        status = self._status(channel)
+        status.stage = "summarizing"
+        status.summary_started = time.monotonic()
+
+    def pushing(self, channel: str):
+        self._status(channel).stage = "pushing"
+
+    def done(self, channel: str):
+        status = self._status(channel)
+        status.stage = "done"
+        status.finished = time.monotonic()
+
+    # ========== 统计 ==========
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def total_fetched(self) -> int:
+        return sum(status.fetched for status in self.channels.values())
+
+    def fetch_rate(self) -> float:
+        """抓取速度（条/秒），按已开始抓取的频道的抓取耗时计算"""
+        now = time.monotonic()
+        seconds = sum(
+            (status.fetch_finished or now) - status.fetch_started
+            for status in self.channels.values() if status.fetch_started is not None
+        )
+        return self.total_fetched / seconds if seconds > 0 else 0.0
+
+    def eta(self) -> Optional[float]:
+        """按当前速度外推的剩余秒数；尚无足够数据时返回 None"""
+        if self.finished is not None:
+            return 0.0
+        now = time.monotonic()
+        statuses = list(self.channels.values())
+        if not statuses:
+            return None
+
+        fetched = [s for s in statuses if s.fetch_finished is not None and s.fetch_started is not None]
+        unfetched = [s for s in statuses if s.fetch_finished is None]
+        remaining = 0.0
+        if unfetched:
+            if not fetched:
+                return None
+            avg_fetch = sum(s.fetch_finished - s.fetch_started for s in fetched) / len(fetched)
+            remaining += avg_fetch * len(unfetched)
+            parked_wait = max((s.resume_at - now for s in unfetched if s.resume_at), default=0.0)
+            remaining = max(remaining, parked_wait)
+
+        summarized = [s for s in statuses if s.stage == "done" and s.summary_started is not None]
+        unsummarized = [s for s in statuses if s.stage not in ("done", "failed")]
+        if unsummarized:
+            if not summarized:
+                return None
+            avg_summary = sum(s.finished - s.summary_started for s in summarized) / len(summarized)
+            remaining += avg_summary * len(unsummarized)
+        return remaining
+
+    def format(self, name_of=str) -> str:
+        """格式化为可读文本
+
+        Args:
+            name_of: 频道标识 -> 显示名称的函数
+        """
+        done = sum(1 for s in self.channels.values() if s.stage in ("done", "failed"))
+        eta = self.eta()
+        eta_text = "估算中" if eta is None else f"约 {_format_seconds(eta)}"
+        lines = [
+            f"运行ID: {self.run_id}（{self.kind}）",
+            f"进度: {done}/{len(self.channels)} 个频道，已运行 {_format_seconds(self.elapsed)}，剩余 {eta_text}",
+            f"已抓取 {self.total_fetched} 条消息（{self.fetch_rate():.1f} 条/秒）",
+        ]
+        now = time.monotonic()
+        for status in self.channels.values():
+            stage = ChannelStatus.STAGE_LABELS.get(status.stage, status.stage)
+            if status.stage == "parked" and status.resume_at:
+                stage += f"（{max(status.resume_at - now, 0):.0f}秒后恢复）"
+            counts = f"抓取 {status.fetched} 条"
+            if status.fetch_finished is not None:
+                counts += f"，总结 {status.messages} 条"
+            lines.append(f"- {name_of(status.channel)}: {stage}，{counts}")
+        return "\n".join(lines)
+
+
+class _NoopProgress:
+    """不在运行中时使用的空进度"""
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        return _noop
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+NOOP_PROGRESS = _NoopProgress()
+
+
+def _format_seconds(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}秒"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}分{seconds}秒"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}小时{minutes}分"
@@ -0,0 +1,68 @@
+"""一次运行的抓取结果状态
+
+抓取阶段产生的失败记录、过滤/抽样/重要度统计，以及随总结时间一并落盘的消息游标与增量，
+只属于发起抓取的那次运行。定时任务与手动总结可能同时运行，这些状态不能放在插件实例上共享，
+否则一次运行会覆盖或清空另一次运行的结果。
+
+当前运行的状态保存在 ``ContextVar`` 中，与 ``run_progress`` 一样，各阶段无需层层传参即可读写。
+"""
+from contextvars import ContextVar
+
+
+_current: ContextVar = ContextVar("telegram_summary_run_state", default=None)
+
+
+def current() -> "RunState":
+    """当前任务的运行状态（不在运行中时为当前任务新建一个）"""
+    state = _current.get()
+    if state is None:
+        state = RunState()
+        _current.set(state)
+    return state
+
+
+class RunState:
+    """一次运行的抓取结果"""
+
+    __slots__ = ("fetch_failures", "filter_stats", "ranking_stats", "sampling_stats", "cursors", "deltas",
+                 "summary_times", "use_cache", "_token")
+
+    def __init__(self):
+        self.fetch_failures = {}
+        """未能完整抓取的频道 {channel: 原因}"""
+        self.filter_stats = {}
+        """各频道的过滤统计 {channel: FilterStats}"""
+        self.ranking_stats = {}
+        """各频道的重要度筛选统计 {channel: (保留数, 总数)}"""
+        self.sampling_stats = {}
+        """被抽样的频道 {channel: (样本数, 总数)}"""
+        self.cursors = {}
+        """各频道抓取到的最大消息ID，随总结时间一并落盘"""
+        self.deltas = {}
+        """各频道的消息增量（ChannelDelta），指纹随总结时间一并落盘"""
+        self.summary_times = {}
+        """复用缓存的频道的总结时间（缓存的抓取时间），默认为标记时的当前时间"""
+        self.use_cache = False
+        """本次运行是否复用并写入抓取缓存（仅手动总结）"""
+        self._token = None
+
+    def begin(self) -> "RunState":
+        """设为当前任务的运行状态"""
+        self._token = _current.set(self)
+        return self
+
+    def end(self):
+        """结束运行（幂等）"""
+        if self._token is None:
+            return
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            _current.set(None)
+        self._token = None
+
+    def discard_pending(self):
+        """丢弃尚未落盘的游标与增量（上次总结时间被清除后不应再写回）"""
+        self.cursors.clear()
+        self.deltas.clear()
+        self.summary_times.clear()
@@ -0,0 +1,73 @@
+"""高频频道的有界抽样
+
+部分频道每周发布数千条消息，全部抓取后交给 AI 会让提示词无限膨胀。
+配置每频道上限后，抓取循环在遍历消息的同时做蓄水池抽样（Algorithm R）：
+无论频道消息量多大，内存中保留的消息条数与提示词规模都有固定上限，
+且每条消息被选中的概率相同。
+
+可选按天分层：每天各自维护一个蓄水池，避免消息集中的某一天挤占整周的样本。
+"""
+import random
+from typing import Optional
+
+
+class ReservoirSampler:
+    """流式蓄水池抽样，可按天分层
+
+    实现 ``append`` 与 ``len``，可直接替代频道抓取结果列表，抓取结束后用 ``result()`` 取出样本。
+    """
+
+    __slots__ = ("capacity", "seen", "_day_capacity", "_reservoirs", "_seen_by_key", "_random")
+
+    def __init__(self, capacity: int, days: int = 0, seed: Optional[str] = None):
+        """初始化
+
+        Args:
+            capacity: 最多保留的消息条数
+            days: 按天分层时抓取窗口覆盖的天数，每天的名额为 ``capacity // days``（至少 1）；
+                0 表示不分层
+            seed: 随机种子；相同的消息序列得到相同的样本，便于录制回放时比较输出
+        """
+        self.capacity = capacity
+        self.seen = 0
+        """已遍历的消息条数"""
+        self._day_capacity = max(capacity // days, 1) if days > 0 else 0
+        self._reservoirs = {}
+        self._seen_by_key = {}
+        self._random = random.Random(seed)
+
+    @property
+    def stratified(self) -> bool:
+        return self._day_capacity > 0
+
+    def append(self, record):
+        """遍历一条消息（MessageRecord）"""
+        self.seen += 1
+        if self.stratified:
+            key = record.date.date() if record.date else None
+            capacity = self._day_capacity
+        else:
+            key, capacity = None, self.capacity
+        reservoir = self._reservoirs.setdefault(key, [])
+        seen = self._seen_by_key[key] = self._seen_by_key.get(key, 0) + 1
+        if len(reservoir) < capacity:
+            reservoir.append(record)
+            return
+        # 第 seen 条消息以 capacity/seen 的概率替换池中随机一条
+        slot = self._random.randrange(seen)
+        if slot < capacity:
+            reservoir[slot] = record
+
+    def __len__(self) -> int:
+        return min(sum(len(reservoir) for reservoir in self._reservoirs.values()), self.capacity)
+
+    def result(self) -> list:
+        """抽样结果，按消息ID（时间）顺序排列
+
+        分层时窗口首尾的不完整日期也各占一份名额，总数超过上限时再均匀抽取到上限。
+        """
+        records = [record for reservoir in self._reservoirs.values() for record in reservoir]
+        if len(records) > self.capacity:
+            records = self._random.sample(records, self.capacity)
+        records.sort(key=lambda record: record.id)
+        return records
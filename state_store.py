@@ -0,0 +1,492 @@
+"""插件状态存储（SQLite WAL 模式）
+
+替代原有的 JSON/文本文件，集中保存：
+- 各频道上次总结时间与消息游标（按频道原子更新）
+- 已总结消息的内容指纹（用于识别编辑与删除）
+- 提示词、AI 配置等键值数据
+- 定时任务/手动总结的运行历史
+
+所有方法都是同步的，内部使用线程锁串行化连接访问，
+在异步代码中应通过 ``asyncio.to_thread`` 调用，避免阻塞事件循环。
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from astrbot.api import logger
+
+
+class SQLiteDatabase:
+    """WAL 模式 SQLite 数据库的公共基类
+
+    负责连接管理、线程锁与写事务，子类实现 ``_create_schema`` 定义表结构。
+    """
+
+    DISPLAY_NAME: str = "数据库"
+    """日志中显示的数据库名称"""
+
+    def __init__(self, db_file: Path):
+        """初始化数据库
+
+        Args:
+            db_file: SQLite 数据库文件路径
+        """
+        self.db_file = Path(db_file)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def open(self):
+        """打开数据库连接并初始化表结构"""
+        with self._lock:
+            if self._conn is not None:
+                return
+            self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._create_schema()
+            logger.info(f"{self.DISPLAY_NAME}已打开: {self.db_file}")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                logger.info(f"{self.DISPLAY_NAME}已关闭")
+
+    @property
+    def is_open(self) -> bool:
+        """数据库连接是否已打开"""
+        return self._conn is not None
+
+    def _transaction(self):
+        """返回一个事务上下文（BEGIN IMMEDIATE ... COMMIT/ROLLBACK）"""
+        return _Transaction(self)
+
+    def _create_schema(self):
+        """创建表结构（幂等），由子类实现"""
+        raise NotImplementedError
+
+
+class StateStore(SQLiteDatabase):
+    """基于 SQLite 的事务性状态存储"""
+
+    DISPLAY_NAME: str = "状态数据库"
+
+    SCHEMA_VERSION: int = 1
+    """数据库结构版本，用于后续结构升级"""
+
+    LEGACY_MIGRATED_KEY: str = "legacy_files_migrated"
+    """记录旧版 JSON/文本文件是否已迁移的元数据键"""
+
+    def _create_schema(self):
+        """创建表结构（幂等）"""
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS kv (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS channel_state (
+                    channel TEXT PRIMARY KEY,
+                    last_summary_time TEXT,
+                    last_message_id INTEGER,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS run_history (
+                    run_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT,
+                    status TEXT NOT NULL,
+                    stats TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_run_history_started ON run_history(started_at);
+                CREATE TABLE IF NOT EXISTS summaries (
+                    id INTEGER PRIMARY KEY,
+                    channel TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    period_start TEXT NOT NULL,
+                    period_end TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_summaries_kind_end ON summaries(kind, period_end);
+                CREATE TABLE IF NOT EXISTS message_hashes (
+                    channel TEXT NOT NULL,
+                    message_id INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    PRIMARY KEY (channel, message_id)
+                ) WITHOUT ROWID;
+                """
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO meta(key, value) VALUES ('schema_version', ?)",
+                (str(self.SCHEMA_VERSION),)
+            )
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    # ========== 旧版文件迁移 ==========
+
+    def migrate_legacy_files(self, prompt_file: str, config_file: str, last_summary_file: str):
+        """一次性迁移旧版 JSON/文本文件
+
+        每个文件在各自的事务中迁移，并在元数据中记录该文件的迁移标记；
+        迁移成功的旧文件会被重命名为 ``*.migrated`` 保留备份。
+        迁移失败的文件保持原样，下次启动时重试；所有文件都迁移完成后
+        才记录总的迁移标记，之后不再检查。
+
+        Args:
+            prompt_file: 旧版提示词文件路径
+            config_file: 旧版 AI 配置文件路径
+            last_summary_file: 旧版上次总结时间文件路径
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (self.LEGACY_MIGRATED_KEY,)).fetchone()
+            if row:
+                return
+
+            complete = True
+            for path, migrate in (
+                (last_summary_file, self._migrate_last_summary_file),
+                (config_file, self._migrate_config_file),
+                (prompt_file, self._migrate_prompt_file),
+            ):
+                file_key = f"{self.LEGACY_MIGRATED_KEY}:{os.path.basename(path)}"
+                if not os.path.exists(path):
+                    continue
+                if self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (file_key,)).fetchone():
+                    # 已迁移但重命名失败的文件不再重复迁移，以免覆盖之后的修改
+                    continue
+                try:
+                    with self._transaction() as conn:
+                        migrate(conn, path)
+                        conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (file_key, self._now()))
+                except Exception as e:
+                    complete = False
+                    logger.error(f"迁移旧版文件 {path} 失败，下次启动时重试: {type(e).__name__}: {e}")
+                    continue
+                try:
+                    os.replace(path, f"{path}.migrated")
+                except OSError as e:
+                    logger.warning(f"重命名已迁移文件 {path} 失败: {type(e).__name__}: {e}")
+
+            if complete:
+                with self._transaction() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)",
+                        (self.LEGACY_MIGRATED_KEY, self._now())
+                    )
+
+    def _migrate_last_summary_file(self, conn, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for channel, time_str in data.items():
+            if time_str:
+                last_time = datetime.fromisoformat(time_str).replace(tzinfo=timezone.utc)
+                self._upsert_channel(conn, channel, last_time, None)
+        logger.info(f"已迁移上次总结时间文件，共 {len(data)} 个频道")
+
+    def _migrate_config_file(self, conn, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        self._set_value(conn, "config", config)
+        logger.info(f"已迁移配置文件，配置项数量: {len(config)}")
+
+    def _migrate_prompt_file(self, conn, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            prompt = f.read().strip()
+        if prompt:
+            self._set_value(conn, "prompt", prompt)
+        logger.info(f"已迁移提示词文件，长度: {len(prompt)}字符")
+
+    # ========== 频道状态 ==========
+
+    @staticmethod
+    def _upsert_channel(conn, channel: str, last_summary_time: Optional[datetime], last_message_id: Optional[int]):
+        conn.execute(
+            """
+            INSERT INTO channel_state(channel, last_summary_time, last_message_id, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(channel) DO UPDATE SET
+                last_summary_time = COALESCE(excluded.last_summary_time, channel_state.last_summary_time),
+                last_message_id = COALESCE(excluded.last_message_id, channel_state.last_message_id),
+                updated_at = excluded.updated_at
+            """,
+            (
+                channel,
+                last_summary_time.isoformat() if last_summary_time else None,
+                last_message_id,
+                datetime.now(timezone.utc).isoformat(),
+            )
+        )
+
+    def get_last_summary_times(self) -> dict:
+        """读取各频道上次总结时间
+
+        Returns:
+            dict: {channel: datetime(UTC)}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT channel, last_summary_time FROM channel_state WHERE last_summary_time IS NOT NULL"
+            ).fetchall()
+        last_times = {}
+        for row in rows:
+            last_time = datetime.fromisoformat(row["last_summary_time"])
+            if last_time.tzinfo is None:
+                last_time = last_time.replace(tzinfo=timezone.utc)
+            last_times[row["channel"]] = last_time
+        return last_times
+
+    def set_last_summary_time(self, channel: str, last_summary_time: datetime, last_message_id: Optional[int] = None):
+        """原子更新单个频道的上次总结时间（及可选的消息游标）
+
+        Args:
+            channel: 频道标识
+            last_summary_time: 上次总结时间
+            last_message_id: 可选，本次总结处理到的最大消息ID
+        """
+        with self._transaction() as conn:
+            self._upsert_channel(conn, channel, last_summary_time, last_message_id)
+
+    def clear_last_summary_times(self):
+        """清除所有频道的上次总结时间、消息游标与内容指纹"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM channel_state")
+            conn.execute("DELETE FROM message_hashes")
+
+    def get_channel_cursor(self, channel: str) -> Optional[int]:
+        """读取频道的消息游标（上次处理到的最大消息ID）
+
+        Args:
+            channel: 频道标识
+
+        Returns:
+            int | None: 消息ID，未记录时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_message_id FROM channel_state WHERE channel = ?", (channel,)
+            ).fetchone()
+        return row["last_message_id"] if row else None
+
+    # ========== 内容指纹 ==========
+
+    def get_message_hashes(self, channel: str, since: datetime) -> dict:
+        """读取频道内发布时间不早于 ``since`` 的已总结消息指纹
+
+        Args:
+            channel: 频道标识
+            since: 起始时间
+
+        Returns:
+            dict: {message_id: hash}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message_id, hash FROM message_hashes WHERE channel = ? AND date >= ?",
+                (channel, _utc_iso(since))
+            ).fetchall()
+        return {row["message_id"]: row["hash"] for row in rows}
+
+    def update_message_hashes(self, channel: str, hashes: dict, deleted: list, prune_before: datetime):
+        """在一个事务中写入新增/编辑消息的指纹、移除已删除消息，并淘汰过期指纹
+
+        Args:
+            channel: 频道标识
+            hashes: {message_id: (hash, date)}
+            deleted: 已删除的消息ID
+            prune_before: 发布时间早于此时间的指纹不再需要复查，一并删除
+        """
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO message_hashes(channel, message_id, hash, date) VALUES (?, ?, ?, ?)",
+                [(channel, message_id, digest, _utc_iso(date)) for message_id, (digest, date) in hashes.items()]
+            )
+            conn.executemany(
+                "DELETE FROM message_hashes WHERE channel = ? AND message_id = ?",
+                [(channel, message_id) for message_id in deleted]
+            )
+            conn.execute(
+                "DELETE FROM message_hashes WHERE channel = ? AND date < ?", (channel, _utc_iso(prune_before))
+            )
+
+    # ========== 键值数据 ==========
+
+    @staticmethod
+    def _set_value(conn, key: str, value):
+        conn.execute(
+            "INSERT OR REPLACE INTO kv(key, value, updated_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), datetime.now(timezone.utc).isoformat())
+        )
+
+    def get_value(self, key: str, default=None):
+        """读取键值数据
+
+        Args:
+            key: 键
+            default: 键不存在时的默认值
+
+        Returns:
+            反序列化后的值
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        return json.loads(row["value"])
+
+    def set_value(self, key: str, value):
+        """写入键值数据（JSON 序列化）
+
+        Args:
+            key: 键
+            value: 可 JSON 序列化的值
+        """
+        with self._transaction() as conn:
+            self._set_value(conn, key, value)
+
+    # ========== 总结存档 ==========
+
+    def add_summary(self, channel: str, kind: str, period_start: datetime, period_end: datetime, text: str):
+        """保存一份总结，供月报/季报等上层报告复用
+
+        Args:
+            channel: 频道标识
+            kind: 总结类型（weekly / monthly / quarterly）
+            period_start: 总结覆盖的起始时间
+            period_end: 总结覆盖的结束时间
+            text: 总结文本
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO summaries(channel, kind, period_start, period_end, created_at, text)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (channel, kind, _utc_iso(period_start), _utc_iso(period_end), self._now(), text)
+            )
+
+    def get_summaries(self, kind: str, since: datetime, until: datetime, channel: Optional[str] = None) -> list:
+        """读取结束时间落在指定区间内的总结
+
+        Args:
+            kind: 总结类型
+            since: 区间起始（含）
+            until: 区间结束（不含）
+            channel: 可选，限定频道
+
+        Returns:
+            list[dict]: 按频道、结束时间排序的总结记录
+        """
+        sql = "SELECT channel, period_start, period_end, text FROM summaries WHERE kind = ? AND period_end >= ? AND period_end < ?"
+        params = [kind, _utc_iso(since), _utc_iso(until)]
+        if channel is not None:
+            sql += " AND channel = ?"
+            params.append(channel)
+        sql += " ORDER BY channel, period_end"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    # ========== 运行历史 ==========
+
+    def start_run(self, run_id: str, kind: str):
+        """记录一次运行开始
+
+        Args:
+            run_id: 运行ID
+            kind: 运行类型（scheduled / manual 等）
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO run_history(run_id, kind, started_at, status) VALUES (?, ?, ?, 'running')",
+                (run_id, kind, self._now())
+            )
+
+    def finish_run(self, run_id: str, status: str, stats: Optional[dict] = None):
+        """记录一次运行结束
+
+        Args:
+            run_id: 运行ID
+            status: 结束状态（success / failed 等）
+            stats: 可选，运行统计信息
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE run_history SET finished_at = ?, status = ?, stats = ? WHERE run_id = ?",
+                (self._now(), status, json.dumps(stats or {}, ensure_ascii=False, default=str), run_id)
+            )
+
+    def last_run_started(self, kinds: tuple = (), statuses: tuple = ()) -> Optional[datetime]:
+        """最近一次符合条件的运行的开始时间
+
+        Args:
+            kinds: 可选，限定运行类型
+            statuses: 可选，限定结束状态
+
+        Returns:
+            datetime | None: 开始时间（UTC），没有符合条件的运行时返回 None
+        """
+        sql, params = "SELECT MAX(started_at) FROM run_history WHERE 1 = 1", []
+        for column, values in (("kind", kinds), ("status", statuses)):
+            if values:
+                sql += f" AND {column} IN ({', '.join('?' * len(values))})"
+                params.extend(values)
+        with self._lock:
+            started_at = self._conn.execute(sql, params).fetchone()[0]
+        return datetime.fromisoformat(started_at) if started_at else None
+
+
+def _utc_iso(value: datetime) -> str:
+    """将时间统一转换为 UTC ISO 字符串，保证按字符串比较即按时间排序"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+class _Transaction:
+    """SQLiteDatabase 的写事务上下文
+
+    持有数据库的线程锁，使用 BEGIN IMMEDIATE 立即获取写锁，
+    正常退出时提交，异常时回滚。
+    """
+
+    def __init__(self, store: SQLiteDatabase):
+        self._store = store
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._store._lock.acquire()
+        try:
+            self._store._conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self._store._lock.release()
+            raise
+        return self._store._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._store._conn.execute("COMMIT")
+            else:
+                self._store._conn.execute("ROLLBACK")
+        finally:
+            self._store._lock.release()
+        return False
@@ -0,0 +1,162 @@
+"""共享 Telegram Client 与 session 读写锁
+
+抓取消息只读取 session（授权信息），多个任务可以同时进行；登录、重新授权等
+修改 session 文件的操作必须独占。因此：
+
+- ``SessionLock``：读写锁，抓取等只读操作持有共享锁，登录持有独占锁；
+  有独占请求在等待时不再放行新的共享请求，避免登录被持续的抓取饿死
+- ``SharedClient``：持有共享锁的使用者共用同一个已连接的 Client，
+  第一个使用者连接，最后一个使用者离开时断开，独占操作开始前 session 文件不会被占用
+- ``SessionPool``：多账号时每个账号（session 槽位）各有一把读写锁和一个共享 Client
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class SessionNotAuthorizedError(RuntimeError):
+    """session 未登录或授权已失效"""
+
+
+class SessionLock:
+    """session 文件读写锁（写优先）
+
+    独占锁不绑定任务：登录流程跨多条消息进行，可以在一个事件中获取、在另一个事件中释放。
+    """
+
+    def __init__(self):
+        self._cond = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def locked(self) -> bool:
+        """是否有任务正在使用 session"""
+        return self._writer or self._readers > 0
+
+    @property
+    def exclusive_pending(self) -> bool:
+        """是否有独占操作正在进行或等待中（此时新的共享请求会被挡住）"""
+        return self._writer or self._waiting_writers > 0
+
+    async def acquire_shared(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+
+    async def release_shared(self):
+        async with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    async def acquire_exclusive(self):
+        async with self._cond:
+            self._waiting_writers += 1
+            try:
+                await self._cond.wait_for(lambda: not self._writer and not self._readers)
+            finally:
+                self._waiting_writers -= 1
+                # 放弃等待时唤醒被写优先挡住的共享请求
+                self._cond.notify_all()
+            self._writer = True
+
+    async def release_exclusive(self):
+        async with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def shared(self):
+        await self.acquire_shared()
+        try:
+            yield
+        finally:
+            await self.release_shared()
+
+    @asynccontextmanager
+    async def exclusive(self):
+        await self.acquire_exclusive()
+        try:
+            yield
+        finally:
+            await self.release_exclusive()
+
+
+class SharedClient:
+    """由多个只读任务共用的已连接 Telegram Client"""
+
+    def __init__(self, factory, lock: SessionLock):
+        """初始化
+
+        Args:
+            factory: 创建（未连接的）TelegramClient 的函数
+            lock: session 读写锁
+        """
+        self._factory = factory
+        self.lock = lock
+        self._client = None
+        self._users = 0
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def users(self) -> int:
+        """当前使用共享 Client 的任务数"""
+        return self._users
+
+    @asynccontextmanager
+    async def connect(self):
+        """获取共享 Client（持有共享锁期间有效）
+
+        Raises:
+            SessionNotAuthorizedError: session 未登录或授权已失效
+        """
+        async with self.lock.shared():
+            async with self._connect_lock:
+                if self._client is None:
+                    client = self._factory()
+                    await client.connect()
+                    if not await client.is_user_authorized():
+                        await client.disconnect()
+                        raise SessionNotAuthorizedError("Telegram 会话未登录或授权已失效，请使用 /tg_login 重新登录")
+                    self._client = client
+                self._users += 1
+            try:
+                yield self._client
+            finally:
+                async with self._connect_lock:
+                    self._users -= 1
+                    if not self._users and self._client is not None:
+                        client, self._client = self._client, None
+                        await client.disconnect()
+
+
+class SessionPool:
+    """多账号 session 池：按槽位名管理各账号的读写锁与共享 Client"""
+
+    DEFAULT_SLOT: str = "default"
+    """默认槽位（原有的 user_session.session）"""
+
+    def __init__(self, factory):
+        """初始化
+
+        Args:
+            factory: 槽位名 -> 创建（未连接的）TelegramClient 的函数
+        """
+        self._factory = factory
+        self._clients = {}
+
+    def client(self, slot: str = DEFAULT_SLOT) -> SharedClient:
+        """获取槽位的共享 Client（首次使用时创建）"""
+        shared = self._clients.get(slot)
+        if shared is None:
+            shared = self._clients[slot] = SharedClient(lambda: self._factory(slot), SessionLock())
+        return shared
+
+    def lock(self, slot: str = DEFAULT_SLOT) -> SessionLock:
+        """获取槽位的 session 读写锁"""
+        return self.client(slot).lock
+
+    @property
+    def users(self) -> int:
+        """所有账号上正在使用共享 Client 的任务数"""
+        return sum(shared.users for shared in self._clients.values())
@@ -0,0 +1,117 @@
+"""跨频道话题聚类（向量化 TF-IDF）
+
+多个新闻频道经常转发同一事件。聚类阶段把本次运行的所有消息转换为
+稀疏 TF-IDF 向量，按余弦相似度把相似消息合并为话题，之后按话题而不是按频道
+调用 AI，减少重复内容带来的 token 消耗和推送条数。
+
+依赖 NumPy 与 SciPy（可选依赖）。未安装时 ``is_available()`` 返回 False，
+插件会回退为按频道总结。本模块只在启用聚类时才被导入。
+"""
+import math
+import re
+from collections import Counter
+
+try:
+    import numpy as np
+    from scipy import sparse
+    from scipy.sparse.csgraph import connected_components
+except ImportError:  # pragma: no cover - 可选依赖
+    np = None
+    sparse = None
+    connected_components = None
+
+
+_LATIN_WORD_RE = re.compile(r"[a-z0-9][a-z0-9_\-]+")
+_CJK_RUN_RE = re.compile("[\u3400-\u9fff]+")
+
+
+def is_available() -> bool:
+    """NumPy 与 SciPy 是否可用"""
+    return np is not None
+
+
+def tokenize(text: str) -> list:
+    """切分文本为特征词
+
+    英文/数字按单词切分；中文没有空格分词，使用相邻二字组（bigram），
+    无需额外的分词词典即可较好地刻画话题相似度。
+
+    Args:
+        text: 消息文本
+
+    Returns:
+        list[str]: 特征词列表
+    """
+    text = text.lower()
+    tokens = _LATIN_WORD_RE.findall(text)
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def build_tfidf(texts: list):
+    """构建按行 L2 归一化的稀疏 TF-IDF 矩阵
+
+    Args:
+        texts: 文本列表
+
+    Returns:
+        scipy.sparse.csr_matrix: 形状为 (len(texts), 词表大小) 的矩阵
+    """
+    vocabulary = {}
+    indices, data, indptr = [], [], [0]
+    for text in texts:
+        counts = Counter(tokenize(text))
+        for token, count in counts.items():
+            indices.append(vocabulary.setdefault(token, len(vocabulary)))
+            data.append(1.0 + math.log(count))
+        indptr.append(len(indices))
+
+    n_docs, n_terms = len(texts), max(len(vocabulary), 1)
+    matrix = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int32)),
+        shape=(n_docs, n_terms)
+    )
+
+    # 平滑 IDF：只在一篇文档中出现的词权重最高，所有文档都出现的词权重最低
+    doc_freq = np.bincount(matrix.indices, minlength=n_terms)
+    idf = np.log((1.0 + n_docs) / (1.0 + doc_freq)).astype(np.float32) + 1.0
+    matrix.data *= idf[matrix.indices]
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+
+def cluster_texts(texts: list, threshold: float) -> list:
+    """按余弦相似度对文本聚类
+
+    相似度不低于阈值的文本之间连边，连通分量即为一个话题。
+
+    Args:
+        texts: 文本列表
+        threshold: 余弦相似度阈值（0~1），越高话题越细
+
+    Returns:
+        list[list[int]]: 话题列表，每个话题是文本下标列表；
+            按话题大小降序、首次出现位置升序排列
+    """
+    if not texts:
+        return []
+    if len(texts) == 1:
+        return [[0]]
+
+    matrix = build_tfidf(texts)
+    similarity = (matrix @ matrix.T).tocsr()
+    similarity.data[similarity.data < threshold] = 0
+    similarity.eliminate_zeros()
+
+    n_topics, labels = connected_components(similarity, directed=False)
+    topics = [[] for _ in range(n_topics)]
+    for index, label in enumerate(labels):
+        topics[label].append(index)
+    topics.sort(key=lambda members: (-len(members), members[0]))
+    return topics
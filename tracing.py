@@ -0,0 +1,188 @@
+"""轻量级运行追踪（span）
+
+每次运行（定时任务、手动总结等）是一条 trace，trace ID 与运行历史中的运行ID一致。
+运行中的各个阶段（抓取、逐频道抓取、AI 调用、推送等）是嵌套的 span，
+记录开始时间、耗时和属性（消息数、提示词字符数、推送目标等）。
+
+运行结束后，所有 span 以 JSON Lines 格式追加到本地文件，每行一个 span，
+可以离线转换为火焰图或瀑布图。当前 span 保存在 ``ContextVar`` 中，
+并发运行的任务各自独立。
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+
+_current_span: ContextVar = ContextVar("telegram_summary_current_span", default=None)
+
+
+class Span:
+    """一个追踪区间，作为上下文管理器使用"""
+
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "attrs",
+                 "start", "_perf_start", "duration_ms", "status", "_token")
+
+    def __init__(self, tracer: "Tracer", trace_id: str, parent_id: Optional[str], name: str, attrs: dict):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+        self._perf_start = None
+        self.duration_ms = None
+        self.status = "ok"
+        self._token = None
+
+    def set(self, **attrs):
+        """设置属性"""
+        self.attrs.update(attrs)
+
+    def fail(self, error: BaseException):
+        """标记为失败"""
+        self.status = "error"
+        self.attrs.setdefault("error", f"{type(error).__name__}: {error}")
+
+    def begin(self) -> "Span":
+        """开始 span 并设为当前 span（不便使用 with 语句时与 ``end()`` 配对使用）"""
+        self.start = time.time()
+        self._perf_start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __enter__(self) -> "Span":
+        return self.begin()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.duration_ms is None:
+            self.fail(exc)
+        self.end()
+        return False
+
+    def end(self):
+        """结束 span（幂等）。根 span 可以提前结束，以便在运行收尾时导出"""
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._perf_start) * 1000
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # 在其他上下文中结束（例如跨任务）时直接清空当前 span
+            _current_span.set(None)
+        self.tracer._finish(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    """未处于追踪中时使用的空 span"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def fail(self, error):
+        pass
+
+    def begin(self):
+        return self
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attrs):
+    """在当前 trace 中创建子 span；不在追踪中时返回空 span
+
+    Args:
+        name: span 名称，例如 "fetch.channel"
+        **attrs: 初始属性
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.tracer, parent.trace_id, parent.span_id, name, attrs)
+
+
+def current_span():
+    """当前 span（不在追踪中时为空 span）"""
+    return _current_span.get() or NOOP_SPAN
+
+
+class Tracer:
+    """追踪导出器：缓存已结束的 span，运行结束后批量写入 JSON Lines 文件"""
+
+    MAX_FILE_BYTES: int = 10 * 1024 * 1024
+    """文件超过此大小时轮转为 ``*.1``（只保留一个旧文件）"""
+
+    def __init__(self, trace_file: Optional[Path]):
+        """初始化
+
+        Args:
+            trace_file: 导出文件路径；为 None 时禁用追踪
+        """
+        self.trace_file = Path(trace_file) if trace_file else None
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.trace_file is not None
+
+    def trace(self, name: str, trace_id: str, **attrs):
+        """开始一条 trace 的根 span
+
+        Args:
+            name: 根 span 名称，例如 "main_job"
+            trace_id: trace ID（运行ID）
+            **attrs: 初始属性
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, trace_id, None, name, attrs)
+
+    def _finish(self, finished: Span):
+        with self._lock:
+            self._buffer.append(finished.to_dict())
+
+    def flush(self):
+        """将缓存的 span 追加写入文件（阻塞 I/O，应在线程池中调用）"""
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if not records or not self.enabled:
+            return
+        self.trace_file.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if self.trace_file.stat().st_size > self.MAX_FILE_BYTES:
+                os.replace(self.trace_file, self.trace_file.with_name(self.trace_file.name + ".1"))
+        except FileNotFoundError:
+            pass
+        with open(self.trace_file, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")